@@ -1,6 +1,9 @@
+import copy
 import json
 import time
 import os
+import threading
+from collections import deque
 from typing import List, Dict, Any, Callable, Optional
 
 class AgentInterceptor:
@@ -8,16 +11,43 @@ class AgentInterceptor:
     代理拦截器类，用于捕获和广播代理之间的交互
     """
 
-    def __init__(self):
-        """初始化拦截器"""
+    def __init__(self, max_queue: int = 1000, batch_size: int = 50, batch_interval: float = 0.05):
+        """
+        初始化拦截器
+
+        参数:
+        max_queue: 待发送事件队列上限，超出时合并或丢弃最旧事件
+        batch_size: 每帧最多合并的事件数
+        batch_interval: 攒批等待时间(秒)
+        """
         self.clients = []  # 存储客户端连接ID
         self._broadcast_func = None  # 广播函数
-        self.messages = []  # 存储消息历史
-        self.api_calls = []  # 存储API调用历史
         self.max_history = 100  # 最大历史记录数
+        self.messages = deque(maxlen=self.max_history)  # 存储消息历史
+        self.api_calls = deque(maxlen=self.max_history)  # 存储API调用历史
         # 加载延时配置
         self.delay_time = self._load_delay_config()
 
+        # 事件总线：代理线程只负责入队，由专门的分发线程格式化、攒批并广播
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._dispatcher = None
+        self._pending = 0
+        self.stats = {"enqueued": 0, "delivered": 0, "dropped": 0, "coalesced": 0}
+
+    def set_broadcast_func(self, func: Optional[Callable[[str], Any]]):
+        """
+        设置广播函数并启动分发线程
+
+        参数:
+        func: 接收一帧JSON字符串(事件数组)的广播函数
+        """
+        self._broadcast_func = func
+        self._ensure_dispatcher()
+
     def _load_delay_config(self) -> float:
         """加载延时配置"""
         delay_time = 0.0
@@ -78,20 +108,11 @@ class AgentInterceptor:
             "type": message_type,
             "source": source_agent,
             "target": target_agent,
-            "content": self._format_content(message),
+            "content": self._snapshot(message),
             "timestamp": time.time()
         }
 
-        # 保存消息历史
-        self.messages.append(message_data)
-        if len(self.messages) > self.max_history:
-            self.messages.pop(0)
-
-        self._broadcast(message_data)
-        
-        # 添加延时
-        if self.delay_time > 0:
-            time.sleep(self.delay_time)
+        self._enqueue(message_data, self.messages)
 
     def intercept_api_call(self, agent_name: str, api_type: str, endpoint: str, params: Dict[str, Any]):
         """
@@ -113,21 +134,12 @@ class AgentInterceptor:
             "content": {
                 "api_type": api_type,
                 "endpoint": endpoint,
-                "params": clean_params
+                "params": self._snapshot(clean_params)
             },
             "timestamp": time.time()
         }
 
-        # 保存API调用历史
-        self.api_calls.append(api_call_data)
-        if len(self.api_calls) > self.max_history:
-            self.api_calls.pop(0)
-
-        self._broadcast(api_call_data)
-        
-        # 添加延时
-        if self.delay_time > 0:
-            time.sleep(self.delay_time)
+        self._enqueue(api_call_data, self.api_calls)
 
     def intercept_api_response(self, agent_name: str, api_type: str, response: Any):
         """
@@ -144,21 +156,12 @@ class AgentInterceptor:
             "target": agent_name,
             "content": {
                 "api_type": api_type,
-                "response": self._format_content(response)
+                "response": self._snapshot(response)
             },
             "timestamp": time.time()
         }
 
-        # 保存API响应历史
-        self.api_calls.append(api_response_data)
-        if len(self.api_calls) > self.max_history:
-            self.api_calls.pop(0)
-
-        self._broadcast(api_response_data)
-        
-        # 添加延时
-        if self.delay_time > 0:
-            time.sleep(self.delay_time)
+        self._enqueue(api_response_data, self.api_calls)
 
     def get_messages(self) -> List[Dict[str, Any]]:
         """
@@ -167,7 +170,7 @@ class AgentInterceptor:
         返回:
         List[Dict[str, Any]]: 消息历史记录
         """
-        return self.messages
+        return list(self.messages)
 
     def get_api_calls(self) -> List[Dict[str, Any]]:
         """
@@ -176,25 +179,132 @@ class AgentInterceptor:
         返回:
         List[Dict[str, Any]]: API调用历史记录
         """
-        return self.api_calls
+        return list(self.api_calls)
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """
+        等待队列中的事件全部发送完毕
+
+        返回:
+        bool: 是否在超时前发送完毕
+        """
+        deadline = time.time() + timeout
+        with self._cond:
+            while self._queue or self._pending:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def _enqueue(self, event: Dict[str, Any], history: deque):
+        """
+        非阻塞地把事件放入发送队列
+
+        参数:
+        event: 事件数据
+        history: 事件发送后写入的历史记录
+        """
+        with self._cond:
+            if len(self._queue) >= self.max_queue:
+                last_event, last_history = self._queue[-1]
+                if (last_event["type"] == event["type"] and last_event["source"] == event["source"]
+                        and last_event["target"] == event["target"]):
+                    # 与队尾同类事件合并，只保留最新内容
+                    self._queue[-1] = (event, history)
+                    self.stats["coalesced"] += 1
+                    return
+                self._queue.popleft()
+                self.stats["dropped"] += 1
+            self._queue.append((event, history))
+            self.stats["enqueued"] += 1
+            self._cond.notify()
+        self._ensure_dispatcher()
+
+    def _ensure_dispatcher(self):
+        """按需启动分发线程"""
+        if self._dispatcher is None or not self._dispatcher.is_alive():
+            with self._cond:
+                if self._dispatcher is None or not self._dispatcher.is_alive():
+                    self._dispatcher = threading.Thread(target=self._dispatch_loop, name="interceptor-dispatcher")
+                    self._dispatcher.daemon = True
+                    self._dispatcher.start()
+
+    def _dispatch_loop(self):
+        """分发循环：攒批、格式化、写历史并广播，可视化节奏延时只作用于此线程"""
+        while True:
+            with self._cond:
+                while not self._queue:
+                    self._cond.wait()
+                # 短暂等待以便攒批
+                if len(self._queue) < self.batch_size and self.batch_interval > 0:
+                    self._cond.wait(self.batch_interval)
+                # 设置了可视化延时时逐条发送，保持原有的动画节奏
+                limit = 1 if self.delay_time > 0 else self.batch_size
+                batch = [self._queue.popleft() for _ in range(min(limit, len(self._queue)))]
+                self._pending = len(batch)
+
+            frame = []
+            for event, history in batch:
+                event = self._format_event(event)
+                history.append(event)
+                frame.append(event)
+
+            self._broadcast(frame)
+
+            with self._cond:
+                self.stats["delivered"] += len(frame)
+                self._pending = 0
+                self._cond.notify_all()
+
+            if self.delay_time > 0:
+                time.sleep(self.delay_time)
+
+    def _format_event(self, event: Dict[str, Any]) -> Dict[str, Any]:
+        """在分发线程中格式化事件内容"""
+        event = dict(event)
+        if event["type"] == "api_response":
+            content = dict(event["content"])
+            content["response"] = self._format_content(content["response"])
+            event["content"] = content
+        elif event["type"] != "api_call":
+            event["content"] = self._format_content(event["content"])
+        return event
 
     def _broadcast(self, message: Any):
         """
         广播消息给所有客户端
 
         参数:
-        message: 消息内容
+        message: 消息内容(单个事件或一帧事件数组)
         """
         if self._broadcast_func:
             try:
                 # 确保消息是JSON格式
-                if isinstance(message, dict):
+                if isinstance(message, (dict, list)):
                     self._broadcast_func(json.dumps(message))
                 else:
                     self._broadcast_func(message)
             except Exception as e:
                 print(f"广播消息时出错: {str(e)}")
 
+    def _snapshot(self, content: Any) -> Any:
+        """
+        入队时复制事件内容，调用方之后修改原对象不影响待发送的事件
+
+        参数:
+        content: 原始内容
+
+        返回:
+        Any: 内容的深拷贝，无法复制时为格式化后的字符串
+        """
+        if isinstance(content, str):
+            return content
+        try:
+            return copy.deepcopy(content)
+        except Exception:
+            return self._format_content(content)
+
     def _format_content(self, content: Any) -> str:
         """
         格式化消息内容
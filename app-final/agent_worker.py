@@ -0,0 +1,45 @@
+import sys
+from api_caller import load_config
+from main import initialize_agents, print_banner, AGENT_CLASSES
+from transport import run_broker, serve_agent
+from agent_interceptor import interceptor
+
+def main():
+    """
+    多进程部署入口:
+    python agent_worker.py broker           运行消息broker
+    python agent_worker.py <代理键名>        在独立进程中运行一个代理，如 data_clean_agent
+    """
+    if len(sys.argv) != 2:
+        print(main.__doc__)
+        sys.exit(1)
+    
+    config = load_config()
+    target = sys.argv[1]
+    
+    if target == "broker":
+        run_broker(
+            config.get("AGENT_BROKER_FRONTEND_BIND", "tcp://*:5555"),
+            config.get("AGENT_BROKER_BACKEND_BIND", "tcp://*:5556")
+        )
+        return
+    
+    if target not in AGENT_CLASSES:
+        print(f"❌ 未知的代理: {target}，可选: {', '.join(AGENT_CLASSES)}")
+        sys.exit(1)
+    
+    print_banner(f"启动代理worker: {target}")
+    # worker中代理的交互事件经Socket.IO消息队列转发给Web进程的客户端
+    message_queue = config.get("SOCKETIO_MESSAGE_QUEUE")
+    if message_queue:
+        from flask_socketio import SocketIO
+        emitter = SocketIO(message_queue=message_queue)
+        interceptor.set_broadcast_func(lambda frame: emitter.emit('message', frame))
+    
+    agents = initialize_agents(serve_key=target)
+    serve_agent(agents[target], config.get("AGENT_BROKER_BACKEND", "tcp://127.0.0.1:5556"),
+                max_workers=int(config.get("AGENT_SERVE_WORKERS", "4")),
+                reply_timeout=float(config.get("AGENT_RPC_TIMEOUT", "120")))
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,11 @@
 from base_agent import BaseAgent
+from rate_limiter import background_priority
+from alarm_engine import AlarmScheduler, compile_condition, build_group_query, build_max_rowid_query
+from registry_store import RegistryStore
+from concurrent.futures import ThreadPoolExecutor
 import time
 import threading
+from collections import OrderedDict
 
 class AlarmAgent(BaseAgent):
     def __init__(self):
@@ -10,12 +15,74 @@ class AlarmAgent(BaseAgent):
         self.monitoring_tasks = {}  # 监控任务列表
         self.monitoring_running = False
         self.monitoring_thread = None
-        self.monitoring_interval = 300  # 默认5分钟检查一次
+        self.monitoring_interval = 300  # 默认5分钟检查一次(未单独设置间隔的警报)
+        self.scheduler = AlarmScheduler()
+        self.check_workers = int(self.config.get("ALARM_WORKERS", "4"))
+        self.executor = None
+        self._group_queries = OrderedDict()  # (表名, 警报ID元组) -> 合并后的检查语句
+        self._group_queries_lock = threading.Lock()
+        self.push_enabled = False  # 是否订阅了DataCleanAgent的写入事件
+        self._trigger_lock = threading.Lock()
+        # 持久化注册表在首次访问警报时才加载
+        self.registry = None
+        self._loaded = False
+        self._load_lock = threading.Lock()
+        self._registry_lock = threading.Lock()
+        self._dirty = set()  # 状态有变化、等待写回注册表的警报ID
+        self.state_flush_interval = float(self.config.get("ALARM_STATE_FLUSH_INTERVAL", "10"))
+    
+    def _ensure_loaded(self):
+        """首次访问时从注册表恢复警报，检查从持久化的游标继续而不是重新扫描历史数据"""
+        if self._loaded:
+            return
+        with self._load_lock:
+            if self._loaded:
+                return
+            self.registry = RegistryStore(self.api_caller)
+            restored = 0
+            for alarm_id, stored in self.registry.load_alarms().items():
+                if alarm_id in self.monitoring_tasks:
+                    continue
+                alarm_data = self._new_alarm(stored["condition"], stored["description"], stored["interval"] or self.monitoring_interval,
+                                             stored["cooldown"], stored["debounce"], stored["created_at"])
+                for field in ("last_triggered", "trigger_count", "hits", "suppressed", "cursor"):
+                    alarm_data[field] = stored[field]
+                self.monitoring_tasks[alarm_id] = alarm_data
+                restored += 1
+            self._loaded = True
+        if restored:
+            self.log_action("恢复警报", f"从注册表恢复了 {restored} 个警报")
+    
+    def _mark_dirty(self, alarm_ids):
+        with self._registry_lock:
+            self._dirty.update(alarm_ids)
+    
+    def flush_state(self):
+        """把有变化的警报状态(触发记录、游标)批量写回注册表"""
+        if self.registry is None:
+            return
+        with self._registry_lock:
+            dirty, self._dirty = self._dirty, set()
+            alarms = [(alarm_id, self.monitoring_tasks[alarm_id]) for alarm_id in dirty if alarm_id in self.monitoring_tasks]
+            if alarms:
+                self.registry.save_alarms(alarms)
+    
+    def resume_monitoring(self):
+        """加载注册表，存在已保存的警报时恢复监控"""
+        self._ensure_loaded()
+        if not self.monitoring_tasks:
+            return {"status": "success", "message": "没有需要恢复的警报"}
+        return self.start_monitoring()
     
     def set_agents(self, info_process_agent, data_clean_agent):
         """设置关联的其他代理"""
         self.info_process_agent = info_process_agent
         self.data_clean_agent = data_clean_agent
+        # 同进程的DataCleanAgent写入新行时直接推送，简单条件在内存中立即检查；
+        # 远程代理无法订阅，仍然依赖周期性的SQL检查
+        if hasattr(data_clean_agent, "subscribe_inserts"):
+            data_clean_agent.subscribe_inserts(self.on_rows_inserted)
+            self.push_enabled = True
     
     def set_monitoring_interval(self, seconds):
         """设置监控间隔"""
@@ -68,33 +135,65 @@ class AlarmAgent(BaseAgent):
         if not self._is_valid_sql_condition(condition):
             return {"status": "error", "message": "无效的SQL条件"}
         
-        # 添加到监控任务
-        self.monitoring_tasks[alarm_id] = {
-            "condition": condition,
-            "description": description,
-            "created_at": time.time(),
-            "last_triggered": None,
-            "trigger_count": 0
-        }
+        try:
+            interval = float(params.get("interval") or self.monitoring_interval)
+            cooldown = float(params.get("cooldown") or self.config.get("ALARM_DEFAULT_COOLDOWN", "0"))
+            debounce = int(float(params.get("debounce") or 1))
+        except (TypeError, ValueError):
+            return {"status": "error", "message": "无效的检查间隔、冷却时间或去抖次数"}
+        if interval <= 0 or cooldown < 0 or debounce < 1:
+            return {"status": "error", "message": "检查间隔必须大于0，冷却时间不能为负，去抖次数至少为1"}
+        
+        # 添加到监控任务并写入注册表
+        self._ensure_loaded()
+        alarm_data = self._new_alarm(condition, description, interval, cooldown, debounce)
+        with self._registry_lock:
+            self.monitoring_tasks[alarm_id] = alarm_data
+            self._dirty.discard(alarm_id)
+            self.registry.save_alarms([(alarm_id, alarm_data)])
         
-        # 如果监控未运行，自动启动
+        # 如果监控未运行，自动启动(启动时安排所有警报)，否则立即安排首次检查
         if not self.monitoring_running:
             self.start_monitoring()
+        else:
+            self.scheduler.schedule(alarm_id, alarm_data, time.time())
         
         return {
             "status": "success",
             "message": f"已设置警报 {alarm_id}"
         }
     
+    def _new_alarm(self, condition, description, interval, cooldown, debounce, created_at=None):
+        """构建警报数据，条件只在这里编译一次"""
+        return {
+            "condition": condition,
+            "description": description,
+            "created_at": created_at or time.time(),
+            "last_triggered": None,
+            "trigger_count": 0,
+            "interval": interval,  # 检查间隔(秒)
+            "cooldown": cooldown,  # 触发后的冷却时间(秒)，期间不再重复触发
+            "debounce": debounce,  # 连续命中多少次检查才触发
+            "hits": 0,  # 当前连续命中次数
+            "suppressed": 0,  # 冷却期内被抑制的触发次数
+            "plan": compile_condition(condition),
+            "cursor": 0,  # 已检查过的最大rowid，首次检查覆盖表中已有的数据；写入事件同样按它去重
+            "swept": False  # 可推送的警报是否完成了对已有数据的补查，之后只在内存中检查
+        }
+    
     def remove_alarm(self, params):
         """移除警报"""
         if "id" not in params:
             return {"status": "error", "message": "缺少警报ID"}
         
         alarm_id = params["id"]
+        self._ensure_loaded()
         
         if alarm_id in self.monitoring_tasks:
-            del self.monitoring_tasks[alarm_id]
+            with self._registry_lock:
+                del self.monitoring_tasks[alarm_id]
+                self._dirty.discard(alarm_id)
+                self.registry.delete_alarm(alarm_id)
             return {
                 "status": "success",
                 "message": f"已移除警报 {alarm_id}"
@@ -107,6 +206,7 @@ class AlarmAgent(BaseAgent):
     
     def list_alarms(self):
         """列出所有警报"""
+        self._ensure_loaded()
         alarms = []
         for alarm_id, alarm_data in self.monitoring_tasks.items():
             alarms.append({
@@ -115,7 +215,13 @@ class AlarmAgent(BaseAgent):
                 "condition": alarm_data["condition"],
                 "created_at": alarm_data["created_at"],
                 "last_triggered": alarm_data["last_triggered"],
-                "trigger_count": alarm_data["trigger_count"]
+                "trigger_count": alarm_data["trigger_count"],
+                "interval": alarm_data["interval"],
+                "cooldown": alarm_data["cooldown"],
+                "debounce": alarm_data["debounce"],
+                "suppressed": alarm_data["suppressed"],
+                "incremental": alarm_data["plan"]["incremental"],
+                "push": self.push_enabled and alarm_data["plan"]["predicate"] is not None
             })
         
         return {
@@ -128,7 +234,14 @@ class AlarmAgent(BaseAgent):
         if self.monitoring_running:
             return {"status": "warning", "message": "监控已经在运行"}
         
+        self._ensure_loaded()
         self.monitoring_running = True
+        self.executor = ThreadPoolExecutor(max_workers=self.check_workers, thread_name_prefix="alarm")
+        # 所有警报立即安排一次检查
+        self.scheduler.clear()
+        now = time.time()
+        for alarm_id, alarm_data in list(self.monitoring_tasks.items()):
+            self.scheduler.schedule(alarm_id, alarm_data, now)
         self.monitoring_thread = threading.Thread(target=self._monitoring_loop)
         self.monitoring_thread.daemon = True
         self.monitoring_thread.start()
@@ -141,58 +254,291 @@ class AlarmAgent(BaseAgent):
             return {"status": "warning", "message": "监控未在运行"}
         
         self.monitoring_running = False
+        # 停止期间的写入事件不会被检查，重新启动时从游标补查
+        for alarm_data in list(self.monitoring_tasks.values()):
+            alarm_data["swept"] = False
+        self.scheduler.wake()
         if self.monitoring_thread and self.monitoring_thread.is_alive():
             self.monitoring_thread.join(timeout=1.0)
+        if self.executor:
+            self.executor.shutdown(wait=False)
+            self.executor = None
+        self.flush_state()
         
         return {"status": "success", "message": "监控已停止"}
     
     def _monitoring_loop(self):
-        """监控循环"""
+        """调度循环：取出到期的警报交给检查线程池，自身不执行查询"""
+        next_snapshot_at = 0
+        next_flush_at = time.time() + self.state_flush_interval
         while self.monitoring_running:
-            # 首先更新市场信息
-            if self.info_process_agent:
-                update_message = self.create_mcp_message("request_info_update", {})
-                self.send_message(self.info_process_agent, update_message)
+            now = time.time()
+            # 定期把触发状态和游标写回注册表
+            if now >= next_flush_at:
+                next_flush_at = now + self.state_flush_interval
+                self.executor.submit(self._run_checks, lambda tasks: self.flush_state(), [])
+            # 市场信息快照过期时才刷新(后台刷新通常已经保持其新鲜)
+            if self.info_process_agent and now >= next_snapshot_at:
+                next_snapshot_at = now + self.monitoring_interval
+                self.executor.submit(self._run_checks, self._request_snapshot, [])
+            
+            next_wakeup = min(next_snapshot_at, next_flush_at) if self.info_process_agent else next_flush_at
+            wait = max(next_wakeup - now, 0.1)
+            due = self.scheduler.pop_due(timeout=wait)
+            if self.monitoring_running:
+                self._dispatch(due)
+    
+    def _dispatch(self, due):
+        """
+        分发到期的警报：同一张表的增量警报合并为一个检查任务，
+        复杂条件各自一个任务，慢查询不会拖延其他警报
+        """
+        by_table = {}
+        pushed_by_table = {}
+        for alarm_id, alarm_data in due:
+            # 已被移除或替换的警报
+            if self.monitoring_tasks.get(alarm_id) is not alarm_data:
+                continue
+            plan = alarm_data["plan"]
+            if self._is_pushed(alarm_data):
+                # 由写入事件检查，只需推进游标以便重启后从这里继续
+                pushed_by_table.setdefault(plan["table"], []).append((alarm_id, alarm_data))
+            elif self.push_enabled and plan["predicate"] is not None:
+                # 可推送的警报首次(或重启后)补查游标之后已有的行
+                self.executor.submit(self._run_checks, self._catch_up_pushed_alarms, [(alarm_id, alarm_data)])
+            elif plan["incremental"]:
+                by_table.setdefault(plan["table"], []).append((alarm_id, alarm_data))
+            else:
+                self.executor.submit(self._run_checks, self._check_full_alarms, [(alarm_id, alarm_data)])
+        for tasks in by_table.values():
+            self.executor.submit(self._run_checks, self._check_incremental_alarms, tasks)
+        for tasks in pushed_by_table.values():
+            self.executor.submit(self._run_checks, self._checkpoint_pushed_alarms, tasks)
+    
+    def _run_checks(self, check, tasks):
+        """在检查线程中执行检查，完成后按各警报的间隔重新安排"""
+        try:
+            # 后台检查的上游调用让位于用户的交互请求
+            with background_priority():
+                check(tasks)
+        except Exception as e:
+            print(f"检查警报 {[alarm_id for alarm_id, _ in tasks]} 时出错: {str(e)}")
+        finally:
+            self._mark_dirty(alarm_id for alarm_id, _ in tasks)
+            now = time.time()
+            for alarm_id, alarm_data in tasks:
+                if self.monitoring_running and self.monitoring_tasks.get(alarm_id) is alarm_data:
+                    self.scheduler.schedule(alarm_id, alarm_data, now + alarm_data["interval"])
+    
+    def _request_snapshot(self, tasks):
+        """请求InfoProcessAgent确保市场信息快照新鲜"""
+        snapshot_message = self.create_mcp_message("request_info_snapshot", {})
+        self.send_message(self.info_process_agent, snapshot_message)
+    
+    def _check_full_alarms(self, tasks):
+        for alarm_id, alarm_data in tasks:
+            self._check_alarm(alarm_id, alarm_data)
+    
+    def _query(self, sql, params=None):
+        """通过DataCleanAgent执行查询，失败时返回None"""
+        message = self.create_mcp_message("sql_query", {"query": sql, "params": params or []})
+        result = self.send_message(self.data_clean_agent, message)
+        if result.get("status") == "success" and isinstance(result.get("result"), list):
+            return result["result"]
+        print(f"警报检查查询失败: {result.get('result', result.get('message'))}")
+        return None
+    
+    def _check_incremental_alarms(self, tasks):
+        """
+        增量检查：每张表先取一次当前最大rowid，没有新行的表直接跳过；
+        同一张表上的警报合并为一条语句，只扫描各自游标之后新插入的行
+        """
+        if not self.data_clean_agent or not tasks:
+            return
+        
+        by_table = {}
+        for alarm_id, alarm_data in tasks:
+            by_table.setdefault(alarm_data["plan"]["table"], []).append((alarm_id, alarm_data))
+        
+        rows = self._query(build_max_rowid_query(by_table.keys()))
+        if not rows:
+            return
+        max_rowids = rows[0]
+        
+        for table, table_tasks in by_table.items():
+            high = max_rowids.get(table) or 0
+            for _, alarm_data in table_tasks:
+                # 表被清空或rowid回退(保留期清理删除了最新的行)时从头检查
+                if alarm_data["cursor"] > high:
+                    alarm_data["cursor"] = 0
+            if all(alarm_data["cursor"] == high for _, alarm_data in table_tasks):
+                for alarm_id, alarm_data in table_tasks:
+                    self._record_result(alarm_id, alarm_data, 0)
+                continue
             
-            # 检查所有警报
-            for alarm_id, alarm_data in list(self.monitoring_tasks.items()):
-                try:
-                    self._check_alarm(alarm_id, alarm_data)
-                except Exception as e:
-                    print(f"检查警报 {alarm_id} 时出错: {str(e)}")
+            params = []
+            for _, alarm_data in table_tasks:
+                params.extend([alarm_data["cursor"], high])
+            counts = self._query(self._group_query(table, table_tasks), params)
+            if counts is None:
+                continue
             
-            # 等待下一个检查周期
-            time.sleep(self.monitoring_interval)
+            for row in counts:
+                alarm_id, alarm_data = table_tasks[row["slot"]]
+                alarm_data["cursor"] = high
+                self._record_result(alarm_id, alarm_data, row["count"])
+    
+    def _max_rowid(self, table):
+        """表当前的最大rowid，查询失败时返回None"""
+        rows = self._query(build_max_rowid_query([table]))
+        if not rows:
+            return None
+        return rows[0].get(table) or 0
+    
+    def _catch_up_pushed_alarms(self, tasks):
+        """
+        补查可推送的警报：检查游标之后已有的行，直到游标追上表的最大rowid，
+        此后改由写入事件检查。补查完成前推送来的行会被忽略，由补查覆盖
+        """
+        if not self.data_clean_agent or not tasks:
+            return
+        table = tasks[0][1]["plan"]["table"]
+        for alarm_id, alarm_data in tasks:
+            while True:
+                high = self._max_rowid(table)
+                if high is None:
+                    break
+                if alarm_data["cursor"] > high:
+                    alarm_data["cursor"] = 0
+                if alarm_data["cursor"] < high:
+                    matches = self._query(alarm_data["plan"]["hash_sql"], [alarm_data["cursor"], high])
+                    if matches is None:
+                        break
+                    alarm_data["cursor"] = high
+                    self._record_result(alarm_id, alarm_data, len(matches))
+                # 写入事件在持有写锁时按提交顺序推送，并需要获取_trigger_lock：
+                # 在锁内确认没有新行后再切换，之后提交的行都会经由写入事件检查
+                with self._trigger_lock:
+                    if self._max_rowid(table) == alarm_data["cursor"]:
+                        alarm_data["swept"] = True
+                        break
+    
+    def _checkpoint_pushed_alarms(self, tasks):
+        """
+        由写入事件检查的警报的游标随推送推进，定期写回注册表(由_run_checks标记)；
+        表被清空或rowid回退时把游标退回到当前最大rowid
+        """
+        if not self.data_clean_agent or not tasks:
+            return
+        high = self._max_rowid(tasks[0][1]["plan"]["table"])
+        if high is None:
+            return
+        with self._trigger_lock:
+            for _, alarm_data in tasks:
+                if alarm_data["cursor"] > high:
+                    alarm_data["cursor"] = high
+    
+    def _group_query(self, table, table_tasks):
+        """
+        获取同一张表上一组警报的合并检查语句；同一组警报(通常是间隔相同的警报)
+        复用同一条语句文本，sqlite的语句缓存只编译一次
+        """
+        key = (table, tuple(alarm_id for alarm_id, _ in table_tasks))
+        with self._group_queries_lock:
+            sql = self._group_queries.get(key)
+            if sql is None:
+                sql = build_group_query([alarm_data["plan"] for _, alarm_data in table_tasks])
+                self._group_queries[key] = sql
+                while len(self._group_queries) > 128:
+                    self._group_queries.popitem(last=False)
+            else:
+                self._group_queries.move_to_end(key)
+            return sql
+    
+    def _is_pushed(self, alarm_data):
+        """警报是否已由写入事件在内存中检查(完成首次SQL检查之后)"""
+        return self.push_enabled and alarm_data["plan"]["predicate"] is not None and alarm_data["swept"]
+    
+    def on_rows_inserted(self, table, rows):
+        """
+        DataCleanAgent写入新行后的回调：对该表上可编译为内存谓词的警报逐行求值，
+        按交易哈希去重后立即触发
+        
+        参数:
+        table (str): 写入的表
+        rows (list): 新插入的行(dict，含rowid)，按提交顺序推送
+        """
+        if not self.monitoring_running:
+            return
+        triggered = False
+        for alarm_id, alarm_data in list(self.monitoring_tasks.items()):
+            plan = alarm_data["plan"]
+            if plan["table"] != table or plan["predicate"] is None:
+                continue
+            try:
+                # 按rowid游标去重：游标之前的行已检查过；未完成补查的警报由补查覆盖这些行
+                with self._trigger_lock:
+                    if not alarm_data["swept"]:
+                        continue
+                    new_rows = [row for row in rows if row["rowid"] > alarm_data["cursor"]]
+                    if not new_rows:
+                        continue
+                    alarm_data["cursor"] = max(row["rowid"] for row in new_rows)
+                matched = sum(1 for row in new_rows if plan["predicate"](row))
+                before = alarm_data["trigger_count"]
+                self._record_result(alarm_id, alarm_data, matched)
+                self._mark_dirty([alarm_id])
+                triggered = triggered or alarm_data["trigger_count"] != before
+            except Exception as e:
+                print(f"检查警报 {alarm_id} 时出错: {str(e)}")
+        # 触发后尽快写回游标，重启后不会对同一批行再次触发
+        executor = self.executor
+        if triggered and executor:
+            try:
+                executor.submit(self._run_checks, lambda tasks: self.flush_state(), [])
+            except RuntimeError:
+                # 监控已停止，stop_monitoring会写回状态
+                pass
     
     def _check_alarm(self, alarm_id, alarm_data):
-        """检查单个警报"""
+        """全量检查单个警报"""
         if not self.data_clean_agent:
             return
         
-        # 构建SQL查询
-        condition = alarm_data["condition"]
-        sql_query = f"SELECT COUNT(*) as count FROM ({condition}) as subquery"
-        
-        # 执行查询
-        message = self.create_mcp_message("sql_query", {"query": sql_query})
+        # 执行编译好的计数查询
+        message = self.create_mcp_message("sql_query", {"query": alarm_data["plan"]["sql"]})
         result = self.send_message(self.data_clean_agent, message)
         
         # 检查是否触发警报
         if result.get("status") == "success" and "result" in result:
             result_data = result["result"]
             if result_data and isinstance(result_data, list) and len(result_data) > 0:
-                count = result_data[0].get("count", 0)
-                
-                if count > 0:
-                    # 触发警报
-                    self._trigger_alarm(alarm_id, alarm_data, count)
+                self._record_result(alarm_id, alarm_data, result_data[0].get("count", 0))
+    
+    def _record_result(self, alarm_id, alarm_data, count):
+        """记录一次检查结果：连续命中达到去抖次数且不在冷却期内时触发警报"""
+        with self._trigger_lock:
+            if count <= 0:
+                alarm_data["hits"] = 0
+                return
+            alarm_data["hits"] += 1
+            if alarm_data["hits"] < alarm_data["debounce"]:
+                return
+            last_triggered = alarm_data["last_triggered"]
+            if last_triggered is not None and time.time() - last_triggered < alarm_data["cooldown"]:
+                alarm_data["suppressed"] += 1
+                return
+            alarm_data["hits"] = 0
+        if alarm_id in self.monitoring_tasks:
+            self._trigger_alarm(alarm_id, alarm_data, count)
     
     def _trigger_alarm(self, alarm_id, alarm_data, count):
         """触发警报"""
         # 更新警报状态
         now = time.time()
-        alarm_data["last_triggered"] = now
-        alarm_data["trigger_count"] += 1
+        with self._trigger_lock:
+            alarm_data["last_triggered"] = now
+            alarm_data["trigger_count"] += 1
         
         # 打印警报信息
         print(f"\n===== 警报触发 =====")
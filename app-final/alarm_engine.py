@@ -0,0 +1,345 @@
+import heapq
+import itertools
+import operator
+import re
+import threading
+import time
+from schema_migrations import TIME_PARTITIONED_TABLES
+
+# 只追加写入的表(按tx_hash去重插入)，新行的rowid单调递增，可以按rowid游标增量检查；
+# coin_info、frequent_addresses会原地更新，只能全量检查
+INCREMENTAL_TABLES = set(TIME_PARTITIONED_TABLES)
+
+# 写入时推送给订阅者的列及其类型亲和性，内存谓词只能引用这些列(day_bucket等生成列仍走SQL检查)
+TABLE_COLUMNS = {
+    "whale_transactions": {"tx_hash": "text", "from_address": "text", "to_address": "text", "value": "numeric",
+                           "coin": "text", "block_number": "numeric", "timestamp": "numeric"},
+    "cex_withdrawals": {"tx_hash": "text", "from_address": "text", "to_address": "text", "value": "numeric",
+                        "timestamp": "numeric"},
+    "contract_activities": {"tx_hash": "text", "contract_address": "text", "contract_type": "text",
+                            "from_address": "text", "value": "numeric", "timestamp": "numeric",
+                            "block_number": "numeric"}
+}
+
+# 单表、无聚合的条件: SELECT 列 FROM 表 [别名] [WHERE ...] [ORDER BY ...]
+SIMPLE_CONDITION_RE = re.compile(
+    r"^\s*select\s+(?P<columns>.+?)\s+from\s+(?P<table>\w+)"
+    r"(?:\s+(?:as\s+)?(?P<alias>(?!where\b|order\b)\w+))?"
+    r"(?P<rest>(?:\s+where\s+(?P<where>.+?))?(?:\s+order\s+by\s+.+?)?)\s*;?\s*$",
+    re.IGNORECASE | re.DOTALL
+)
+
+# 内存谓词支持的记号: 字符串、数字、(限定)列名、比较运算符、括号、逗号
+PREDICATE_TOKEN_RE = re.compile(
+    r"\s*(?:(?P<string>'(?:[^']|'')*')|(?P<number>-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?)"
+    r"|(?P<name>[A-Za-z_]\w*(?:\.[A-Za-z_]\w*)?)|(?P<op><=|>=|<>|!=|==|=|<|>)|(?P<punct>[(),]))"
+)
+
+COMPARISONS = {"=": operator.eq, "==": operator.eq, "!=": operator.ne, "<>": operator.ne,
+               "<": operator.lt, "<=": operator.le, ">": operator.gt, ">=": operator.ge}
+
+# 出现这些结构时按新行计数会改变条件的含义，需要全量检查
+NON_INCREMENTAL_RE = re.compile(
+    r"\b(select|join|group\s+by|having|union|intersect|except|limit|distinct|"
+    r"count|sum|avg|min|max|total|group_concat)\b",
+    re.IGNORECASE
+)
+
+# 条件末尾的LIMIT n(n>0)：警报只判断是否存在满足条件的行，去掉后含义不变
+TRAILING_LIMIT_RE = re.compile(r"\s+limit\s+(?P<count>\d+)\s*;?\s*$", re.IGNORECASE)
+
+def _strip_trailing_limit(condition):
+    """去掉不影响"是否存在结果"的末尾LIMIT子句"""
+    match = TRAILING_LIMIT_RE.search(condition)
+    if match and int(match.group("count")) > 0:
+        return condition[:match.start()]
+    return condition
+
+def compile_condition(condition):
+    """
+    把警报条件编译为检查计划
+
+    参数:
+    condition (str): 警报的SQL条件(返回结果即触发)
+
+    返回:
+    dict: incremental为True时，table为目标表，sql为只扫描rowid区间(?, ?]的条件；
+          否则sql为对整个条件计数的全量查询
+    """
+    condition = _strip_trailing_limit(condition)
+    match = SIMPLE_CONDITION_RE.match(condition)
+    if match and match.group("table").lower() in INCREMENTAL_TABLES \
+            and not NON_INCREMENTAL_RE.search(match.group("columns") + match.group("rest")):
+        table = match.group("table").lower()
+        alias = match.group("alias") or match.group("table")
+        # 把FROM表替换为rowid区间子查询，保留原表名/别名，条件中的列引用不受影响
+        sql = (f"SELECT {match.group('columns')} "
+               f"FROM (SELECT * FROM {table} WHERE rowid > ? AND rowid <= ?) AS {alias}"
+               f"{match.group('rest')}")
+        # 补查可推送的警报时取出游标之后满足条件的交易哈希
+        hash_sql = (f"SELECT {alias}.tx_hash AS tx_hash "
+                    f"FROM (SELECT * FROM {table} WHERE rowid > ? AND rowid <= ?) AS {alias}"
+                    f"{match.group('rest')}")
+        return {"incremental": True, "table": table, "sql": sql, "hash_sql": hash_sql,
+                "predicate": compile_predicate(match.group("where"), table, alias)}
+
+    condition = condition.strip().rstrip(";")
+    return {"incremental": False, "table": None, "predicate": None,
+            "sql": f"SELECT COUNT(*) as count FROM ({condition}) as subquery"}
+
+def build_group_query(plans):
+    """
+    把同一张表上的多个增量条件合并成一条语句，每个条件对应一行(slot, count)
+
+    参数:
+    plans (list): compile_condition返回的增量计划，顺序即slot编号
+
+    返回:
+    str: 语句，参数依次为每个条件的(游标, 上界)
+    """
+    parts = [f"SELECT {slot} AS slot, COUNT(*) AS count FROM ({plan['sql']})"
+             for slot, plan in enumerate(plans)]
+    return " UNION ALL ".join(parts)
+
+def build_max_rowid_query(tables):
+    """一次查询多张表当前的最大rowid"""
+    columns = ", ".join(f"(SELECT MAX(rowid) FROM {table}) AS {table}" for table in sorted(tables))
+    return f"SELECT {columns}"
+
+class AlarmScheduler:
+    """
+    按下次检查时间排列的警报调度堆：每个警报按自己的间隔重新入堆，
+    被替换或移除的警报在出堆时由调用方丢弃
+    """
+
+    def __init__(self):
+        self._heap = []  # (到期时间, 序号, 警报ID, 警报数据)
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+
+    def schedule(self, alarm_id, alarm_data, due):
+        """安排警报在due时刻检查"""
+        with self._cond:
+            heapq.heappush(self._heap, (due, next(self._seq), alarm_id, alarm_data))
+            self._cond.notify()
+
+    def pop_due(self, timeout):
+        """
+        等待到有警报到期(最多timeout秒)
+
+        返回:
+        list: 已到期的 (警报ID, 警报数据)
+        """
+        with self._cond:
+            now = time.time()
+            if not self._heap or self._heap[0][0] > now:
+                wait = timeout if not self._heap else min(timeout, self._heap[0][0] - now)
+                self._cond.wait(max(wait, 0))
+                now = time.time()
+            due = []
+            while self._heap and self._heap[0][0] <= now:
+                _, _, alarm_id, alarm_data = heapq.heappop(self._heap)
+                due.append((alarm_id, alarm_data))
+            return due
+
+    def wake(self):
+        """唤醒等待中的调度线程"""
+        with self._cond:
+            self._cond.notify_all()
+
+    def clear(self):
+        with self._cond:
+            self._heap = []
+
+    def __len__(self):
+        with self._cond:
+            return len(self._heap)
+
+def _tokenize(text):
+    """把WHERE子句切分为记号，遇到不支持的字符返回None"""
+    tokens = []
+    pos = 0
+    text = text.strip()
+    while pos < len(text):
+        match = PREDICATE_TOKEN_RE.match(text, pos)
+        if not match or match.end() == pos:
+            return None
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == "string":
+            value = value[1:-1].replace("''", "'")
+        elif kind == "number":
+            value = float(value) if any(c in value for c in ".eE") else int(value)
+        elif kind == "name" and value.lower() in ("and", "or", "not", "in", "is", "null"):
+            kind, value = "keyword", value.lower()
+        tokens.append((kind, value))
+        pos = match.end()
+    return tokens
+
+def _sql_compare(op, left, right):
+    """
+    按SQLite的规则比较两个值：与NULL比较的结果未知(None)；
+    存储类不同时不做转换，数值总是小于文本(如REAL列中存入的无法转换的文本)
+    """
+    if left is None or right is None:
+        return None
+    if isinstance(left, str) != isinstance(right, str):
+        left, right = isinstance(left, str), isinstance(right, str)
+    return COMPARISONS[op](left, right)
+
+def _sql_not(value):
+    return None if value is None else not value
+
+def _sql_and(values):
+    result = True
+    for value in values:
+        if value is False:
+            return False
+        if value is None:
+            result = None
+    return result
+
+def _sql_or(values):
+    result = False
+    for value in values:
+        if value is True:
+            return True
+        if value is None:
+            result = None
+    return result
+
+class _PredicateParser:
+    """
+    把简单的WHERE子句解析为Python函数：列与字面量的比较、IN列表、IS [NOT] NULL，
+    用AND/OR/NOT和括号组合；遇到函数调用、子查询等无法解析的结构时抛出ValueError。
+    与SQL一样使用三值逻辑，结果未知(涉及NULL)时返回None。
+    比较双方类型亲和性不同(如TEXT列与数字)时SQLite会先转换再比较，这类条件不编译，仍走SQL检查
+    """
+
+    def __init__(self, tokens, columns):
+        self.tokens = tokens
+        self.columns = columns
+        self.pos = 0
+
+    def parse(self):
+        node = self._or()
+        if self.pos != len(self.tokens):
+            raise ValueError("无法解析的条件")
+        return node
+
+    def _peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else (None, None)
+
+    def _take(self, kind=None, value=None):
+        token = self._peek()
+        if token[0] is None or (kind and token[0] != kind) or (value is not None and token[1] != value):
+            raise ValueError("无法解析的条件")
+        self.pos += 1
+        return token[1]
+
+    def _accept(self, kind, value):
+        if self._peek() == (kind, value):
+            self.pos += 1
+            return True
+        return False
+
+    def _or(self):
+        nodes = [self._and()]
+        while self._accept("keyword", "or"):
+            nodes.append(self._and())
+        return nodes[0] if len(nodes) == 1 else (lambda row: _sql_or(node(row) for node in nodes))
+
+    def _and(self):
+        nodes = [self._not()]
+        while self._accept("keyword", "and"):
+            nodes.append(self._not())
+        return nodes[0] if len(nodes) == 1 else (lambda row: _sql_and(node(row) for node in nodes))
+
+    def _not(self):
+        if self._accept("keyword", "not"):
+            node = self._not()
+            return lambda row: _sql_not(node(row))
+        if self._accept("punct", "("):
+            node = self._or()
+            self._take("punct", ")")
+            return node
+        return self._comparison()
+
+    def _operand(self):
+        """返回(取值函数, 类型亲和性)"""
+        kind, value = self._peek()
+        if kind in ("string", "number"):
+            self.pos += 1
+            return (lambda row: value), ("text" if kind == "string" else "numeric")
+        column = self._column(self._take("name"))
+        return (lambda row: row.get(column)), self.columns[column]
+
+    def _column(self, name):
+        column = name.split(".")[-1].lower()
+        if column not in self.columns:
+            raise ValueError(f"未知的列: {name}")
+        return column
+
+    def _comparison(self):
+        left, affinity = self._operand()
+        if self._accept("keyword", "is"):
+            negate = self._accept("keyword", "not")
+            self._take("keyword", "null")
+            return lambda row: (left(row) is None) != negate
+        negate = self._accept("keyword", "not")
+        if self._accept("keyword", "in"):
+            self._take("punct", "(")
+            values = [self._literal(affinity)]
+            while self._accept("punct", ","):
+                values.append(self._literal(affinity))
+            self._take("punct", ")")
+            matches = lambda row: _sql_or(_sql_compare("=", left(row), value) for value in values)
+            return (lambda row: _sql_not(matches(row))) if negate else matches
+        if negate:
+            raise ValueError("无法解析的条件")
+        op = self._take("op")
+        right, right_affinity = self._operand()
+        if right_affinity != affinity:
+            raise ValueError("比较双方类型不同")
+        return lambda row: _sql_compare(op, left(row), right(row))
+
+    def _literal(self, affinity):
+        kind, value = self._peek()
+        if kind not in ("string", "number"):
+            raise ValueError("IN列表只支持字面量")
+        if ("text" if kind == "string" else "numeric") != affinity:
+            raise ValueError("比较双方类型不同")
+        self.pos += 1
+        return value
+
+def compile_predicate(where, table, alias=None):
+    """
+    把增量条件的WHERE子句编译为在内存中对新插入的行求值的函数
+
+    参数:
+    where (str/None): WHERE子句，为空表示所有新行都满足
+    table (str): 目标表
+    alias (str, 可选): 条件中使用的表别名
+
+    返回:
+    callable/None: predicate(row_dict) -> bool，无法编译时返回None
+    """
+    columns = TABLE_COLUMNS.get(table)
+    if columns is None:
+        return None
+    if not where:
+        return lambda row: True
+    tokens = _tokenize(where)
+    if tokens is None:
+        return None
+    # 限定列名只能使用本表的表名或别名
+    qualifiers = {table.lower(), (alias or table).lower()}
+    for kind, value in tokens:
+        if kind == "name" and "." in value and value.split(".")[0].lower() not in qualifiers:
+            return None
+    try:
+        node = _PredicateParser(tokens, columns).parse()
+    except ValueError:
+        return None
+    # WHERE只保留结果为真的行，未知按不满足处理
+    return lambda row: node(row) is True
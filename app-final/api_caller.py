@@ -1,21 +1,43 @@
 import os
 import time
 import json
+import threading
+from urllib.parse import urlparse
 import requests
+from requests.adapters import HTTPAdapter
 from openai import OpenAI
 import sqlite3
 import traceback
+from llm_cache import LLMCache
+from sqlite_pool import SQLiteConnectionManager
+from log_sink import LogSink
+from fast_router import FastRouter
+from rate_limiter import RateLimiter, binance_weight
+from single_flight import SingleFlight
+from response_cache import ResponseCache
 
-class APICaller:
-    def __init__(self):
-        self.config = self._load_config()
-        self._setup_clients()
-    
-    def _load_config(self):
-        """加载配置文件"""
+# 进程级共享资源：配置只解析一次，OpenAI客户端只创建一次，每个上游主机一个连接池
+_registry_lock = threading.RLock()
+_shared_config = None
+_shared_openai_client = None
+_http_sessions = {}
+_shared_llm_cache = None
+_db_managers = {}
+_log_sinks = {}
+_shared_fast_router = None
+_shared_rate_limiter = None
+_shared_api_caller = None
+
+def load_config(config_path="config.txt"):
+    """加载配置文件(进程内只解析一次)"""
+    global _shared_config
+    with _registry_lock:
+        if _shared_config is not None:
+            return _shared_config
+        
         config = {}
         try:
-            with open("config.txt", "r") as f:
+            with open(config_path, "r") as f:
                 for line in f:
                     line = line.strip()
                     if line and not line.startswith("#"):
@@ -33,27 +55,168 @@ class APICaller:
                             continue
         except Exception as e:
             print(f"❌ 加载配置文件失败: {str(e)}")
-        return config
+        
+        _shared_config = config
+        return _shared_config
+
+def get_http_session(url):
+    """获取上游主机对应的共享HTTP会话(复用TCP/TLS连接)"""
+    host = urlparse(url).netloc or url
+    with _registry_lock:
+        session = _http_sessions.get(host)
+        if session is None:
+            config = load_config()
+            pool_size = int(config.get("HTTP_POOL_SIZE", "16"))
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _http_sessions[host] = session
+        return session
+
+def get_http_timeout():
+    """上游HTTP请求的(连接, 读取)超时秒数，保证卡住的连接不会永久占用工作线程"""
+    config = load_config()
+    return (float(config.get("HTTP_CONNECT_TIMEOUT", "5")), float(config.get("HTTP_READ_TIMEOUT", "10")))
+
+def _get_openai_client(config):
+    """获取共享的OpenAI客户端"""
+    global _shared_openai_client
+    with _registry_lock:
+        if _shared_openai_client is not None:
+            return _shared_openai_client
+        
+        # 使用新版OpenAI客户端
+        api_key = config.get("API_KEY")
+        base_url = config.get("BASE_URL")
+        if not api_key:
+            print("⚠️ 警告: 未配置API_KEY，API调用可能会失败")
+        if not base_url:
+            print("⚠️ 警告: 未配置BASE_URL，将使用默认URL")
+        
+        _shared_openai_client = OpenAI(
+            api_key=api_key,
+            base_url=base_url
+        )
+        print(f"✅ OpenAI客户端初始化成功: URL={base_url}")
+        return _shared_openai_client
+
+def get_llm_cache():
+    """获取共享的LLM响应缓存，未启用时返回None"""
+    global _shared_llm_cache
+    with _registry_lock:
+        config = load_config()
+        if config.get("LLM_CACHE_ENABLED", "True") != "True":
+            return None
+        if _shared_llm_cache is None:
+            _shared_llm_cache = LLMCache(
+                max_entries=int(config.get("LLM_CACHE_SIZE", "1024")),
+                ttl=float(config.get("LLM_CACHE_TTL", "3600")),
+                db_path=config.get("LLM_CACHE_DB") or None,
+                max_disk_entries=int(config.get("LLM_CACHE_DISK_SIZE", "100000"))
+            )
+        return _shared_llm_cache
+
+def get_db_manager(db_file="blockchain_data.db"):
+    """获取数据库文件对应的共享连接管理器"""
+    with _registry_lock:
+        manager = _db_managers.get(db_file)
+        if manager is None:
+            config = load_config()
+            manager = SQLiteConnectionManager(
+                db_file,
+                busy_timeout_ms=int(config.get("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+                mmap_size=int(config.get("SQLITE_MMAP_SIZE", "268435456")),
+                max_readers=int(config.get("SQLITE_MAX_READERS", "8"))
+            )
+            _db_managers[db_file] = manager
+        return manager
+
+def get_log_sink(path):
+    """获取日志文件对应的共享后台写入器"""
+    with _registry_lock:
+        sink = _log_sinks.get(path)
+        if sink is None:
+            config = load_config()
+            sink = LogSink(
+                path,
+                max_bytes=int(config.get("LOG_MAX_BYTES", str(50 * 1024 * 1024))),
+                rotate_seconds=float(config.get("LOG_ROTATE_SECONDS", "86400")),
+                compression=config.get("LOG_COMPRESSION", "gzip"),
+                max_queue=int(config.get("LOG_QUEUE_SIZE", "10000")),
+                flush_interval=float(config.get("LOG_FLUSH_INTERVAL", "1.0"))
+            )
+            _log_sinks[path] = sink
+        return sink
+
+def _explain_sql(sql, db_file="blockchain_data.db"):
+    """用EXPLAIN检查SQL能否在数据库上编译(不执行)，只接受只读语句"""
+    manager = get_db_manager(db_file)
+    if not manager.is_read_query(sql):
+        return False
+    try:
+        with manager.reader() as conn:
+            conn.execute(f"EXPLAIN {sql}")
+        return True
+    except sqlite3.Error:
+        return False
+
+def get_fast_router():
+    """获取共享的规则路由器，首次创建时从coin_info表加载币种字典"""
+    global _shared_fast_router
+    with _registry_lock:
+        if _shared_fast_router is None:
+            config = load_config()
+            _shared_fast_router = FastRouter(threshold=float(config.get("FAST_ROUTER_THRESHOLD", "0.8")),
+                                             sql_validator=_explain_sql)
+            _shared_fast_router.load_tickers(get_api_caller())
+        return _shared_fast_router
+
+def get_rate_limiter():
+    """获取共享的上游限速器(Etherscan按每秒调用数，Binance按每分钟请求权重)"""
+    global _shared_rate_limiter
+    with _registry_lock:
+        if _shared_rate_limiter is None:
+            config = load_config()
+            limiter = RateLimiter()
+            etherscan_rate = float(config.get("ETHERSCAN_CALLS_PER_SECOND", "5"))
+            limiter.configure("etherscan", etherscan_rate, float(config.get("ETHERSCAN_BURST", str(etherscan_rate))))
+            binance_rate = float(config.get("BINANCE_WEIGHT_PER_MINUTE", "6000")) / 60
+            limiter.configure("binance", binance_rate, float(config.get("BINANCE_WEIGHT_BURST", str(binance_rate * 10))))
+            _shared_rate_limiter = limiter
+        return _shared_rate_limiter
+
+def get_api_caller():
+    """获取进程级共享的APICaller实例(线程安全)"""
+    global _shared_api_caller
+    with _registry_lock:
+        if _shared_api_caller is None:
+            _shared_api_caller = APICaller()
+        return _shared_api_caller
+
+class APICaller:
+    def __init__(self):
+        self.config = self._load_config()
+        self._setup_clients()
+    
+    def _load_config(self):
+        """加载配置文件"""
+        return load_config()
     
     def _setup_clients(self):
         """设置API客户端"""
         try:
-            # 使用新版OpenAI客户端
-            api_key = self.config.get("API_KEY")
-            base_url = self.config.get("BASE_URL")
-            if not api_key:
-                print("⚠️ 警告: 未配置API_KEY，API调用可能会失败")
-            if not base_url:
-                print("⚠️ 警告: 未配置BASE_URL，将使用默认URL")
-            
-            self.openai_client = OpenAI(
-                api_key=api_key,
-                base_url=base_url
-            )
-            print(f"✅ OpenAI客户端初始化成功: URL={base_url}")
+            self.openai_client = _get_openai_client(self.config)
         except Exception as e:
             print(f"❌ OpenAI客户端初始化失败: {str(e)}")
             # 继续执行，以便其他功能仍然可用
+        self.llm_cache = get_llm_cache()
+        # 相同的区块链API请求合并为一次HTTP调用，成功的响应短时间缓存
+        self.blockchain_flight = SingleFlight()
+        self.blockchain_cache = ResponseCache(
+            ttl=float(self.config.get("BLOCKCHAIN_CACHE_TTL", "5")),
+            max_entries=int(self.config.get("BLOCKCHAIN_CACHE_SIZE", "512"))
+        )
     
     def _log_api_call(self, api_type, request, response):
         """记录API调用"""
@@ -66,36 +229,46 @@ class APICaller:
                     "response": response
                 }
                 
-                # 确保response可序列化为JSON
-                try:
-                    json.dumps(log_entry)
-                except TypeError:
-                    # 如果不可序列化，则转换为字符串
-                    log_entry["response"] = str(response)
-                
-                with open("logs.txt", "a", encoding="utf-8") as f:
-                    f.write(json.dumps(log_entry, ensure_ascii=False) + "\n")
+                # 交给后台写入器，不可序列化的字段由其转为字符串
+                get_log_sink("logs.txt").write(log_entry)
                 
                 if api_type.startswith("ERROR"):
                     print(f"❌ API错误 ({api_type}): {str(response)}")
             except Exception as e:
                 print(f"❌ 记录API调用失败: {str(e)}")
     
-    def call_llm_api(self, prompt):
-        """调用LLM API"""
+    def call_llm_api(self, prompt, use_cache=True):
+        """
+        调用LLM API
+
+        参数:
+        prompt (str): 提示内容
+        use_cache (bool): 是否使用响应缓存，生成式回答应传False
+        """
+        model = self.config.get("MODEL")
+        if use_cache and self.llm_cache is not None:
+            cached = self.llm_cache.get(prompt, model)
+            if cached is not None:
+                if self.config.get("DEBUG_MODE") == "True":
+                    print(f"⚡ LLM缓存命中: prompt长度={len(prompt)} 字符")
+                return cached
+        
         try:
             if self.config.get("DEBUG_MODE") == "True":
                 print(f"🔄 调用LLM API: prompt长度={len(prompt)} 字符")
             
             # 使用新版API调用方式
             response = self.openai_client.chat.completions.create(
-                model=self.config.get("MODEL"),
+                model=model,
                 messages=[
                     {"role": "user", "content": prompt}
                 ]
             )
             content = response.choices[0].message.content
             
+            if use_cache and self.llm_cache is not None and content is not None:
+                self.llm_cache.set(prompt, model, content)
+            
             if self.config.get("DEBUG_MODE") == "True":
                 print(f"✅ LLM API调用成功: 响应长度={len(content)} 字符")
             
@@ -111,9 +284,7 @@ class APICaller:
                     "prompt": prompt,
                     "response": content
                 }
-                with open("llm.txt", "a", encoding="utf-8") as f:
-                    f.write(json.dumps(llm_log_entry, ensure_ascii=False) + "\n")
-                print(f"📝 LLM API调用已记录到llm.txt: prompt长度={len(prompt)}, 响应长度={len(content)}")
+                get_log_sink("llm.txt").write(llm_log_entry)
             except Exception as e:
                 print(f"❌ 记录LLM调用到llm.txt失败: {str(e)}")
                 
@@ -134,9 +305,7 @@ class APICaller:
                     "prompt": prompt,
                     "error": error_msg
                 }
-                with open("llm.txt", "a", encoding="utf-8") as f:
-                    f.write(json.dumps(llm_error_entry, ensure_ascii=False) + "\n")
-                print(f"📝 LLM API调用错误已记录到llm.txt")
+                get_log_sink("llm.txt").write(llm_error_entry)
             except Exception as log_e:
                 print(f"❌ 记录LLM错误到llm.txt失败: {str(log_e)}")
             
@@ -144,32 +313,153 @@ class APICaller:
             mock_response = f"<o>由于API调用错误，无法获取响应: {str(e)}</o>"
             return mock_response
     
+    def call_llm_stream(self, prompt):
+        """
+        以流式方式调用LLM API，逐段产出生成的文本(生成式回答，不使用缓存)
+
+        参数:
+        prompt (str): 提示内容
+        """
+        model = self.config.get("MODEL")
+        parts = []
+        try:
+            if self.config.get("DEBUG_MODE") == "True":
+                print(f"🔄 流式调用LLM API: prompt长度={len(prompt)} 字符")
+            
+            stream = self.openai_client.chat.completions.create(
+                model=model,
+                messages=[
+                    {"role": "user", "content": prompt}
+                ],
+                stream=True
+            )
+            for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    parts.append(delta)
+                    yield delta
+            
+            content = "".join(parts)
+            if self.config.get("DEBUG_MODE") == "True":
+                self._log_api_call("LLM", prompt, content)
+            get_log_sink("llm.txt").write({
+                "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "model": self.config.get("MODEL", "unknown"),
+                "stream": True,
+                "prompt": prompt,
+                "response": content
+            })
+        except Exception as e:
+            error_detail = traceback.format_exc()
+            error_msg = f"LLM API调用失败: {str(e)}\n{error_detail}"
+            if self.config.get("DEBUG_MODE") == "True":
+                self._log_api_call("LLM_ERROR", prompt, error_msg)
+            get_log_sink("llm.txt").write({
+                "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "model": self.config.get("MODEL", "unknown"),
+                "stream": True,
+                "prompt": prompt,
+                "error": error_msg
+            })
+            # 已经输出过部分内容时不再追加错误提示，避免破坏输出格式
+            if not parts:
+                yield f"<o>由于API调用错误，无法获取响应: {str(e)}</o>"
+    
+    def _blockchain_api_keys(self):
+        """可轮换的区块链API密钥(BLOCKCHAIN_API_KEYS逗号分隔，否则使用BLOCKCHAIN_API_KEY)"""
+        keys = self.config.get("BLOCKCHAIN_API_KEYS") or self.config.get("BLOCKCHAIN_API_KEY") or ""
+        return [key.strip() for key in keys.split(",") if key.strip() and key.strip() != "YOUR_ETHERSCAN_API_KEY"]
+    
+    @staticmethod
+    def _is_rate_limited(data):
+        """判断Etherscan是否以正常响应的形式返回了限流错误"""
+        return (isinstance(data, dict) and str(data.get("status")) == "0"
+                and "rate limit" in str(data.get("result", "")).lower())
+    
+    @staticmethod
+    def _is_cacheable(data):
+        """
+        判断区块链API响应能否缓存：Etherscan以status=0返回错误(如密钥无效、参数错误)，
+        其中只有"No transactions found"是正常的空结果
+        """
+        if not isinstance(data, dict) or "error" in data:
+            return False
+        if str(data.get("status")) == "0":
+            return data.get("message") == "No transactions found"
+        return True
+    
+    @staticmethod
+    def _blockchain_request_key(params):
+        """区块链API请求的去重键：module/action及其余参数，不含apikey"""
+        return tuple(sorted((str(name), str(value)) for name, value in params.items() if name != "apikey"))
+    
     def call_blockchain_api(self, endpoint, params):
-        """调用区块链API"""
+        """
+        调用区块链API：并发的相同请求共享同一次HTTP调用和解析结果，
+        成功的响应在BLOCKCHAIN_CACHE_TTL秒内直接复用(返回值在调用方之间共享，不要原地修改)
+        """
+        key = self._blockchain_request_key(params)
+        cached = self.blockchain_cache.get(key)
+        if cached is not None:
+            return cached
+        return self.blockchain_flight.do(key, self._fetch_blockchain_api, endpoint, params, key)
+    
+    def _fetch_blockchain_api(self, endpoint, params, cache_key):
+        """实际调用区块链API(按密钥限速，限流时退避重试并轮换密钥)"""
         try:
             if self.config.get("DEBUG_MODE") == "True":
                 print(f"🔄 调用区块链API: endpoint={endpoint}")
                 
             url = self.config.get("BLOCKCHAIN_API_BASE")
-            api_key = self.config.get("BLOCKCHAIN_API_KEY")
+            api_keys = self._blockchain_api_keys()
             
             if not url:
                 error_msg = "未配置区块链API基础URL"
                 self._log_api_call("BLOCKCHAIN_ERROR", {"endpoint": endpoint, "params": params}, error_msg)
                 return {"error": error_msg}
             
-            if not api_key or api_key == "YOUR_ETHERSCAN_API_KEY":
+            if not api_keys:
                 if self.config.get("DEBUG_MODE") == "True":
                     print("⚠️ 使用模拟数据: 未配置有效的区块链API密钥")
                 return {"result": "Error! Invalid API Key"}
             
-            params["apikey"] = api_key
-            
-            response = requests.get(url, params=params)
-            data = response.json()
+            limiter = get_rate_limiter()
+            max_retries = int(self.config.get("RATE_LIMIT_MAX_RETRIES", "3"))
+            wait_timeout = float(self.config.get("RATE_LIMIT_TIMEOUT", "30"))
+            for attempt in range(max_retries + 1):
+                api_key = limiter.acquire("etherscan", api_keys, timeout=wait_timeout)
+                if api_key is None:
+                    error_msg = "等待区块链API调用配额超时"
+                    self._log_api_call("BLOCKCHAIN_ERROR", {"endpoint": endpoint, "params": params}, error_msg)
+                    return {"error": error_msg}
+                
+                # 密钥只加到本次请求的参数副本中，不写入调用方的参数和日志
+                request_params = dict(params)
+                request_params["apikey"] = api_key
+                response = get_http_session(url).get(url, params=request_params, timeout=get_http_timeout())
+                
+                if response.status_code in (429, 418):
+                    delay = limiter.throttled("etherscan", api_key, response.headers.get("Retry-After"), attempt)
+                    print(f"⚠️ 区块链API限流(HTTP {response.status_code})，{delay:.1f}秒后重试")
+                    continue
+                
+                data = response.json()
+                if self._is_rate_limited(data):
+                    delay = limiter.throttled("etherscan", api_key, attempt=attempt)
+                    print(f"⚠️ 区块链API限流({data.get('result')})，{delay:.1f}秒后重试")
+                    continue
+                
+                self._log_api_call("BLOCKCHAIN", {"endpoint": endpoint, "params": params}, data)
+                # 出错的响应不缓存，下次调用重新请求
+                if self._is_cacheable(data):
+                    self.blockchain_cache.set(cache_key, data)
+                return data
             
-            self._log_api_call("BLOCKCHAIN", {"endpoint": endpoint, "params": params}, data)
-            return data
+            error_msg = f"区块链API持续限流，已重试{max_retries}次"
+            self._log_api_call("BLOCKCHAIN_ERROR", {"endpoint": endpoint, "params": params}, error_msg)
+            return {"error": error_msg}
         except Exception as e:
             error_detail = traceback.format_exc()
             error_msg = f"区块链API调用失败: {str(e)}\n{error_detail}"
@@ -177,7 +467,7 @@ class APICaller:
             return {"error": error_msg}
     
     def call_exchange_api(self, exchange, endpoint, params, method="GET"):
-        """调用交易所API"""
+        """调用交易所API(按端点权重限速，限流时退避重试)"""
         try:
             if self.config.get("DEBUG_MODE") == "True":
                 print(f"🔄 调用交易所API: exchange={exchange}, endpoint={endpoint}")
@@ -197,14 +487,36 @@ class APICaller:
                 base_url = "https://api.binance.com"
                 url = f"{base_url}{endpoint}"
                 
-                if method.upper() == "GET":
-                    response = requests.get(url, headers=headers, params=params)
-                else:
-                    response = requests.post(url, headers=headers, data=params)
+                session = get_http_session(base_url)
+                limiter = get_rate_limiter()
+                weight = binance_weight(endpoint, params)
+                max_retries = int(self.config.get("RATE_LIMIT_MAX_RETRIES", "3"))
+                wait_timeout = float(self.config.get("RATE_LIMIT_TIMEOUT", "30"))
+                for attempt in range(max_retries + 1):
+                    # Binance的请求权重按IP计算，共用一个桶
+                    if limiter.acquire("binance", cost=weight, timeout=wait_timeout) is None:
+                        error_msg = "等待交易所API调用配额超时"
+                        self._log_api_call("EXCHANGE_ERROR", {"exchange": exchange, "endpoint": endpoint, "params": params}, error_msg)
+                        return {"error": error_msg}
+                    
+                    if method.upper() == "GET":
+                        response = session.get(url, headers=headers, params=params, timeout=get_http_timeout())
+                    else:
+                        response = session.post(url, headers=headers, data=params, timeout=get_http_timeout())
+                    
+                    # 429为超出权重限制，418为多次超限后IP被临时封禁
+                    if response.status_code in (429, 418):
+                        delay = limiter.throttled("binance", "", response.headers.get("Retry-After"), attempt)
+                        print(f"⚠️ 交易所API限流(HTTP {response.status_code})，{delay:.1f}秒后重试")
+                        continue
+                    
+                    data = response.json()
+                    self._log_api_call("EXCHANGE", {"exchange": exchange, "endpoint": endpoint, "params": params}, data)
+                    return data
                 
-                data = response.json()
-                self._log_api_call("EXCHANGE", {"exchange": exchange, "endpoint": endpoint, "params": params}, data)
-                return data
+                error_msg = f"交易所API持续限流，已重试{max_retries}次"
+                self._log_api_call("EXCHANGE_ERROR", {"exchange": exchange, "endpoint": endpoint, "params": params}, error_msg)
+                return {"error": error_msg}
             else:
                 error_msg = f"不支持的交易所: {exchange}"
                 self._log_api_call("EXCHANGE_ERROR", {"exchange": exchange, "endpoint": endpoint, "params": params}, error_msg)
@@ -221,25 +533,25 @@ class APICaller:
             if self.config.get("DEBUG_MODE") == "True":
                 print(f"🔄 执行SQL: query={query[:50]}..." if len(query) > 50 else f"🔄 执行SQL: query={query}")
                 
-            # 确保数据库文件目录存在
-            db_file = "blockchain_data.db"
-            dir_name = os.path.dirname(db_file)
-            if dir_name and not os.path.exists(dir_name):
-                os.makedirs(dir_name)
+            db = get_db_manager()
+            is_read = db.is_read_query(query)
             
-            conn = sqlite3.connect(db_file)
-            cursor = conn.cursor()
-            
-            if params:
-                result = cursor.execute(query, params)
+            if is_read:
+                # 只读查询借用连接池中的只读连接，不会被写入阻塞
+                with db.reader() as conn:
+                    cursor = conn.execute(query, params or ())
+                    data = cursor.fetchall()
+                    columns = [description[0] for description in cursor.description] if cursor.description else []
             else:
-                result = cursor.execute(query)
-                
-            if query.strip().upper().startswith(("SELECT", "PRAGMA")):
-                data = result.fetchall()
-                columns = [description[0] for description in cursor.description] if cursor.description else []
-                conn.close()
+                # 写入串行化到唯一的写连接
+                with db.writer() as conn:
+                    cursor = conn.execute(query, params or ())
+                    affected = cursor.rowcount
+                    if query.strip().upper().startswith("PRAGMA"):
+                        data = cursor.fetchall()
+                        columns = [description[0] for description in cursor.description] if cursor.description else []
                 
+            if query.strip().upper().startswith(("SELECT", "PRAGMA")) or (is_read and cursor.description):
                 # 将结果转换为字典列表
                 rows = []
                 for row in data:
@@ -251,10 +563,6 @@ class APICaller:
                 self._log_api_call("SQL", query, {"rows": len(rows), "sample": rows[:3] if rows else []})
                 return rows
             else:
-                conn.commit()
-                affected = cursor.rowcount
-                conn.close()
-                
                 if self.config.get("DEBUG_MODE") == "True":
                     print(f"✅ SQL执行成功: 影响 {affected} 行")
                 
@@ -269,9 +577,101 @@ class APICaller:
                 print(f"❌ SQL执行失败: {str(e)}")
                 
             return {"error": error_msg}
+    
+    def execute_many(self, query, rows, batch_size=None):
+        """
+        批量执行同一条写入语句，每个批次在一个事务内使用executemany完成
+
+        参数:
+        query (str): 带占位符的SQL语句(文本固定，便于sqlite复用预编译语句)
+        rows (list): 参数元组列表
+        batch_size (int, 可选): 每个事务的行数，默认读取INGEST_BATCH_SIZE
+        """
+        rows = list(rows)
+        if not rows:
+            return {"affected_rows": 0}
+        
+        batch_size = batch_size or int(self.config.get("INGEST_BATCH_SIZE", "1000"))
+        try:
+            if self.config.get("DEBUG_MODE") == "True":
+                print(f"🔄 批量执行SQL: {len(rows)} 行, query={query.strip()[:50]}...")
+            
+            db = get_db_manager()
+            affected = 0
+            for start in range(0, len(rows), batch_size):
+                batch = rows[start:start + batch_size]
+                with db.writer() as conn:
+                    cursor = conn.executemany(query, batch)
+                    affected += cursor.rowcount
+            
+            self._log_api_call("SQL", query, {"affected_rows": affected, "batch_rows": len(rows)})
+            return {"affected_rows": affected}
+        except Exception as e:
+            error_detail = traceback.format_exc()
+            error_msg = f"SQL批量执行失败: {str(e)}\n{error_detail}"
+            self._log_api_call("SQL_ERROR", query, error_msg)
+            
+            if self.config.get("DEBUG_MODE") == "True":
+                print(f"❌ SQL批量执行失败: {str(e)}")
+                
+            return {"error": error_msg}
+
+    def insert_many(self, query, rows, table, columns, on_insert=None, batch_size=None):
+        """
+        批量执行插入(或upsert)语句，并取出本次真正新插入的行；已存在而被更新的行不算在内
+
+        参数:
+        query (str): 带占位符的INSERT语句
+        rows (list): 参数元组列表
+        table (str): 写入的表(只追加写入，新行的rowid大于已有的行)
+        columns (tuple): 新插入的行要取出的列
+        on_insert (callable, 可选): on_insert(rows)，每个批次提交后按提交顺序调用，
+                                    rows为新插入的行(dict，含rowid)
+        batch_size (int, 可选): 每个事务的行数，默认读取INGEST_BATCH_SIZE
+
+        返回:
+        dict: affected_rows和新插入的行数inserted_rows，出错时为error
+        """
+        rows = list(rows)
+        if not rows:
+            return {"affected_rows": 0, "inserted_rows": 0}
+        
+        batch_size = batch_size or int(self.config.get("INGEST_BATCH_SIZE", "1000"))
+        select_new = f"SELECT rowid AS rowid, {', '.join(columns)} FROM {table} WHERE rowid > ? ORDER BY rowid"
+        try:
+            db = get_db_manager()
+            affected = 0
+            inserted_total = 0
+            for start in range(0, len(rows), batch_size):
+                batch = rows[start:start + batch_size]
+                inserted = []
+                callback = (lambda: on_insert(inserted)) if on_insert else None
+                with db.writer(on_commit=callback) as conn:
+                    # 先取得写锁再读取最大rowid，其他进程的写入不会混入本批次
+                    conn.execute("BEGIN IMMEDIATE")
+                    high = conn.execute(f"SELECT COALESCE(MAX(rowid), 0) FROM {table}").fetchone()[0]
+                    cursor = conn.executemany(query, batch)
+                    affected += cursor.rowcount
+                    new_rows = conn.execute(select_new, (high,))
+                    names = [column[0] for column in new_rows.description]
+                    inserted.extend(dict(zip(names, row)) for row in new_rows)
+                inserted_total += len(inserted)
+            
+            self._log_api_call("SQL", query, {"affected_rows": affected, "inserted_rows": inserted_total,
+                                              "batch_rows": len(rows)})
+            return {"affected_rows": affected, "inserted_rows": inserted_total}
+        except Exception as e:
+            error_detail = traceback.format_exc()
+            error_msg = f"SQL批量插入失败: {str(e)}\n{error_detail}"
+            self._log_api_call("SQL_ERROR", query, error_msg)
+            
+            if self.config.get("DEBUG_MODE") == "True":
+                print(f"❌ SQL批量插入失败: {str(e)}")
+                
+            return {"error": error_msg}
 
-# 创建APICaller类的单例实例
-_api_caller_instance = APICaller()
+# 与各代理共用同一个APICaller实例
+_api_caller_instance = get_api_caller()
 
 # 提供api_caller函数，供其他模块导入使用
 def api_caller(api_type, endpoint, api_key, params):
@@ -298,21 +698,7 @@ def api_caller(api_type, endpoint, api_key, params):
         # 调用实例的方法
         result = _api_caller_instance.call_llm_api(prompt)
         
-        # 直接在这里也记录到llm.txt，确保被记录
-        try:
-            llm_log_entry = {
-                "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
-                "call_path": "api_caller_function",
-                "model": _api_caller_instance.config.get("MODEL", "unknown"),
-                "prompt": prompt,
-                "response": result
-            }
-            with open("llm.txt", "a", encoding="utf-8") as f:
-                f.write(json.dumps(llm_log_entry, ensure_ascii=False) + "\n")
-            print(f"📝 (api_caller函数) LLM API调用已直接记录到llm.txt")
-        except Exception as e:
-            print(f"❌ (api_caller函数) 记录LLM调用到llm.txt失败: {str(e)}")
-        
+        # call_llm_api已经记录到llm.txt，这里不再重复记录
         return result
     
     elif api_type.upper() == "BLOCKCHAIN":
@@ -12,6 +12,8 @@ from datetime import datetime
 from central_agent import CentralAgent
 from agent_interceptor import interceptor
 from main import initialize_agents, process_user_query
+from api_caller import load_config as load_shared_config
+from job_engine import JobEngine
 
 # 配置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -22,7 +24,12 @@ app = Flask(__name__)
 app.config['SECRET_KEY'] = 'multi-agent-visualization'
 
 # 初始化SocketIO
-socketio = SocketIO(app, cors_allowed_origins="*")
+# 配置SOCKETIO_MESSAGE_QUEUE(如redis://)后，多个Web进程可以共同向客户端推送事件
+socketio = SocketIO(app, cors_allowed_origins="*",
+                    message_queue=load_shared_config().get("SOCKETIO_MESSAGE_QUEUE") or None)
+
+# 拦截器事件由其分发线程攒批后以数组帧推送
+interceptor.set_broadcast_func(lambda frame: socketio.emit('message', frame))
 
 # 存储客户端连接
 clients = []
@@ -37,26 +44,8 @@ MAX_INTERACTIONS = 100
 # 加载配置
 def load_config():
     """从config.txt加载配置"""
-    config = {}
-    try:
-        with open("config.txt", "r") as f:
-            for line in f:
-                line = line.strip()
-                if line and not line.startswith("#"):
-                    try:
-                        # 拆分行到等号，只取第一个等号
-                        key_value = line.split("=", 1)
-                        if len(key_value) == 2:
-                            key, value = key_value
-                            # 移除值中的注释部分
-                            if "#" in value:
-                                value = value.split("#")[0]
-                            # 去除前后空格和引号
-                            config[key.strip()] = value.strip().strip('"').strip("'")
-                    except ValueError:
-                        continue
-    except Exception as e:
-        logger.error(f"加载配置文件失败: {str(e)}")
+    # 复用APICaller的共享解析结果，复制一份避免默认值污染共享配置
+    config = dict(load_shared_config())
     
     # 设置默认值
     if "ALARM_INTERVAL" not in config:
@@ -75,6 +64,18 @@ agents = initialize_agents()
 user_agent = agents["user_agent"]
 print("代理系统已初始化，准备接收Web请求")
 
+def emit_to_owner(event, payload, owner):
+    """只向任务的提交方推送事件；没有关联会话的任务(如直接调用HTTP接口)通过/api/jobs查询"""
+    if owner:
+        socketio.emit(event, payload, to=owner)
+
+# 用户请求由任务引擎在有界线程池中执行，状态和结果通过Socket.IO推送给提交方
+job_engine = JobEngine(
+    max_workers=int(CONFIG.get("JOB_MAX_WORKERS", "4")),
+    max_queue=int(CONFIG.get("JOB_QUEUE_SIZE", "50")),
+    notify=emit_to_owner
+)
+
 # 存储交互历史
 interaction_history = {
     "messages": [],
@@ -112,34 +113,83 @@ def get_config():
         "alarm_initial_delay": int(CONFIG.get("ALARM_INITIAL_DELAY", 5000))
     })
 
+def make_chunk_emitter(stream_id, owner=None):
+    """创建把回复片段推送到提交方页面的回调"""
+    def on_chunk(chunk):
+        emit_to_owner('response_chunk', {'stream_id': stream_id, 'chunk': chunk}, owner)
+    return on_chunk
+
+def make_progress_reporter(job):
+    """
+    创建推送处理阶段的回调：转发给中央代理之前是取消检查点，
+    之后代理链可能已执行交易等操作，任务不再接受取消并一定返回结果
+    """
+    def on_progress(stage, detail=None):
+        if stage == "routed":
+            job.disable_cancel()
+        else:
+            job.check_cancelled()
+        job_engine.report_progress(job, {"stage": stage, "detail": detail})
+    return on_progress
+
+def emit_response_done(stream_id, result, owner=None):
+    """通知提交方流式回复结束，并附带完整的格式化回复"""
+    emit_to_owner('response_done', {
+        'stream_id': stream_id,
+        'formatted_response': result.get('formatted_response') if isinstance(result, dict) else None,
+        'status': result.get('status') if isinstance(result, dict) else None
+    }, owner)
+
+def save_history_entry(user_message, result):
+    """保存请求和结果到历史记录"""
+    history_entry = {
+        'timestamp': datetime.now().isoformat(),
+        'user_message': user_message,
+        'response': result
+    }
+    interaction_history["messages"].append(history_entry)
+    try:
+        with open(HISTORY_FILE, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(history_entry, ensure_ascii=False) + '\n')
+    except Exception as e:
+        print(f"保存历史记录错误: {e}")
+
+def run_user_query_job(job, user_message):
+    """在任务线程中执行完整的代理处理链"""
+    broadcast_interaction("User", "CentralAgent", f"处理请求: {user_message[:50]}")
+    result = process_user_query(user_agent, user_message, on_chunk=make_chunk_emitter(job.id, job.owner),
+                                on_progress=make_progress_reporter(job))
+    emit_response_done(job.id, result, job.owner)
+    save_history_entry(user_message, result)
+    broadcast_interaction("CentralAgent", "User", "请求处理完成")
+    return result
+
+def submit_user_query(user_message, socket_id=None):
+    """提交用户请求到任务引擎，返回HTTP响应；socket_id为提交方的Socket.IO会话，任务事件只推送给它"""
+    owner = socket_id if socket_id in clients else None
+    submitted = job_engine.submit(lambda job: run_user_query_job(job, user_message), description=user_message,
+                                  owner=owner)
+    if submitted["status"] != "success":
+        return jsonify({"error": submitted["message"]}), 429
+    return jsonify({"job_id": submitted["job_id"], "status": "queued"}), 202
+
 @app.route('/api/process', methods=['POST'])
 def process_request():
+    """提交用户请求，立即返回任务ID，结果通过job_update事件推送"""
     try:
-        data = request.json
+        data = request.json or {}
         user_message = data.get('message', '')
+        if not user_message:
+            return jsonify({'error': '未提供请求内容'}), 400
         
-        # 模拟处理逻辑
-        # 这里可以添加实际的处理逻辑，调用各种代理处理请求
-        
-        # 模拟回复
-        response = {
-            "formatted_response": f"您的请求 '{user_message}' 已处理。这是一个模拟回复。"
-        }
-        
-        # 广播消息，通知前端有新的交互
-        broadcast_interaction("System", "CentralAgent", "用户请求已接收", "message")
-        
-        # 模拟各代理之间的交互
-        simulate_agent_interactions(user_message)
-        
-        return jsonify(response)
+        return submit_user_query(user_message, data.get('socket_id'))
     except Exception as e:
         logger.error(f"处理请求出错: {str(e)}")
         return jsonify({"error": f"处理请求时出错: {str(e)}"}), 500
 
 @app.route('/api/analyze_tx', methods=['POST'])
 def analyze_tx():
-    """分析区块链交易"""
+    """分析区块链交易(异步任务)"""
     try:
         data = request.json
 
@@ -160,35 +210,7 @@ def analyze_tx():
             'timestamp': time.time()
         }))
 
-        # 处理交易分析
-        result = process_user_query(user_agent, f"分析交易: {tx_hash}")
-
-        # 添加到历史记录
-        history_entry = {
-            'timestamp': datetime.now().isoformat(),
-            'user_message': f"分析交易: {tx_hash}",
-            'response': result
-        }
-
-        interaction_history["messages"].append(history_entry)
-
-        # 保存历史记录
-        try:
-            with open(HISTORY_FILE, 'a', encoding='utf-8') as f:
-                f.write(json.dumps(history_entry, ensure_ascii=False) + '\n')
-        except Exception as e:
-            print(f"保存历史记录错误: {e}")
-            
-        # 发送完成消息
-        socketio.emit('message', json.dumps({
-            'type': 'system',
-            'source': 'System',
-            'target': 'User',
-            'content': '交易分析完成',
-            'timestamp': time.time()
-        }))
-
-        return jsonify(result)
+        return submit_user_query(f"分析交易: {tx_hash}", data.get('socket_id'))
 
     except Exception as e:
         print(f"分析交易错误: {e}")
@@ -204,6 +226,27 @@ def analyze_tx():
         
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """查询任务状态和结果"""
+    job = job_engine.get(job_id)
+    if job is None:
+        return jsonify({'error': f'任务不存在: {job_id}'}), 404
+    return jsonify(job)
+
+@app.route('/api/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    """取消任务"""
+    result = job_engine.cancel(job_id)
+    if result["status"] != "success":
+        return jsonify({'error': result["message"]}), 409
+    return jsonify(result)
+
+@app.route('/api/jobs', methods=['GET'])
+def get_job_stats():
+    """任务队列统计"""
+    return jsonify(job_engine.get_stats())
+
 @app.route('/api/get_messages', methods=['GET'])
 def get_messages():
     """获取拦截的消息用于可视化"""
@@ -495,52 +538,6 @@ def get_agent_type(agent_id):
     }
     return agent_types.get(agent_id, "unknown")
 
-def simulate_agent_interactions(user_message):
-    """模拟代理之间的交互"""
-    # 模拟中央代理分发任务
-    broadcast_interaction("CentralAgent", "InfoProcessAgent", f"获取相关信息: {user_message}")
-    time.sleep(0.5)
-    
-    # 模拟信息处理代理向专业代理分发任务
-    broadcast_interaction("InfoProcessAgent", "MultiAgents", "分配数据获取任务")
-    time.sleep(0.3)
-    
-    # 模拟专业代理执行任务
-    agents = ["CEXWithdrawAgent", "WhaleAgent", "TxAgent", "ContractMonitorAgent", "BasicInfoAgent"]
-    for agent in agents:
-        broadcast_interaction("MultiAgents", agent, f"执行数据收集: {user_message[:20]}...")
-        time.sleep(0.2)
-    
-    # 模拟API调用
-    broadcast_interaction("BasicInfoAgent", "API", "获取币价信息", "api_call")
-    time.sleep(0.5)
-    broadcast_interaction("API", "BasicInfoAgent", "返回币价数据", "api_response")
-    
-    # 模拟数据清理
-    broadcast_interaction("MultiAgents", "DataCleanAgent", "数据整合与清理")
-    time.sleep(0.4)
-    
-    # 模拟向中央代理返回结果
-    broadcast_interaction("DataCleanAgent", "CentralAgent", "数据处理完成")
-    
-    # 模拟警报触发
-    if "警报" in user_message or "紧急" in user_message:
-        broadcast_interaction("CentralAgent", "AlarmAgent", "触发警报系统")
-        time.sleep(0.3)
-        broadcast_interaction("AlarmAgent", "MessageCall", "发送紧急通知")
-    
-    # 模拟交易操作
-    if "交易" in user_message or "买入" in user_message or "卖出" in user_message:
-        broadcast_interaction("CentralAgent", "AutoTradeAgent", "准备执行交易")
-        time.sleep(0.3)
-        broadcast_interaction("AutoTradeAgent", "WalletAgent", "请求交易授权")
-        time.sleep(0.4)
-        broadcast_interaction("WalletAgent", "ApprovalTx", "确认交易授权")
-        time.sleep(0.3)
-        broadcast_interaction("AutoTradeAgent", "CEXAgent", "提交交易订单")
-        time.sleep(0.3)
-        broadcast_interaction("CEXAgent", "PlaceOrder", "订单已提交")
-
 if __name__ == '__main__':
     # 清空 history.txt 文件
     with open(HISTORY_FILE, 'w', encoding='utf-8') as f:
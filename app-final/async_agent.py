@@ -0,0 +1,158 @@
+import asyncio
+import threading
+from abc import abstractmethod
+from base_agent import BaseAgent
+from transport import get_transport
+
+class AgentRuntime:
+    """
+    异步代理运行时：在后台线程中运行一个事件循环，
+    所有异步代理的邮箱和工作协程都在这个循环上执行
+    """
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, name="agent-runtime")
+        self._thread.daemon = True
+        self._thread.start()
+        self._api_caller = None
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def get_api_caller(self):
+        """获取绑定到本事件循环的异步API调用器"""
+        if self._api_caller is None:
+            from async_api_caller import AsyncAPICaller
+            self._api_caller = AsyncAPICaller()
+        return self._api_caller
+
+    def submit(self, coro):
+        """从任意线程提交协程，返回concurrent.futures.Future"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro, timeout=None):
+        """
+        从同步代码中运行协程并等待结果
+
+        参数:
+        coro: 协程
+        timeout (float, 可选): 等待超时(秒)
+        """
+        if threading.current_thread() is self._thread:
+            coro.close()
+            raise RuntimeError("不能在代理运行时的事件循环线程中同步等待协程")
+        return self.submit(coro).result(timeout)
+
+    def close(self, timeout=5.0):
+        """取消所有工作协程并停止事件循环"""
+        async def cancel_tasks():
+            tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            if self._api_caller is not None:
+                await self._api_caller.aclose()
+
+        self.run(cancel_tasks(), timeout)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout)
+        self.loop.close()
+
+_runtime = None
+_runtime_lock = threading.Lock()
+
+def get_runtime():
+    """获取进程级共享的代理运行时"""
+    global _runtime
+    with _runtime_lock:
+        if _runtime is None:
+            _runtime = AgentRuntime()
+        return _runtime
+
+class AsyncBaseAgent(BaseAgent):
+    """
+    异步代理基类：每个代理有一个邮箱队列，由若干工作协程并发处理，
+    receive_message为协程；同步代理通过send_message发来的消息由兼容层转交运行时处理。
+    继承自BaseAgent的同步方法(send_message、call_llm)保持不变，
+    协程中使用send_message_async、call_llm_async，不要在事件循环中调用同步方法
+    """
+
+    is_async = True
+
+    def __init__(self, name, concurrency=None, mailbox_size=None):
+        """
+        参数:
+        name (str): 代理名称
+        concurrency (int, 可选): 同时处理的消息数，默认读取AGENT_CONCURRENCY
+        mailbox_size (int, 可选): 邮箱容量，默认读取AGENT_MAILBOX_SIZE
+        """
+        super().__init__(name)
+        self.runtime = get_runtime()
+        self.concurrency = concurrency or int(self.config.get("AGENT_CONCURRENCY", "32"))
+        self.mailbox_size = mailbox_size or int(self.config.get("AGENT_MAILBOX_SIZE", "1000"))
+        self.mailbox = None
+        self._workers = []
+        # 邮箱和工作协程需在运行时的事件循环中创建
+        self.runtime.run(self._start())
+
+    @property
+    def async_api_caller(self):
+        """异步API调用器(首次使用时创建)"""
+        return self.runtime.get_api_caller()
+
+    async def _start(self):
+        """创建邮箱并启动工作协程"""
+        self.mailbox = asyncio.Queue(maxsize=self.mailbox_size)
+        self._workers = [asyncio.ensure_future(self._worker()) for _ in range(self.concurrency)]
+
+    async def _worker(self):
+        """从邮箱取消息并处理，结果写回发送方等待的future"""
+        while True:
+            message, reply = await self.mailbox.get()
+            try:
+                result = await self.receive_message(message)
+                if not reply.done():
+                    reply.set_result(result)
+            except Exception as e:
+                if not reply.done():
+                    reply.set_exception(e)
+            finally:
+                self.mailbox.task_done()
+
+    async def post(self, message):
+        """
+        把消息投递到邮箱并等待处理结果(邮箱满时等待，形成背压)
+
+        参数:
+        message (dict): MCP消息
+        """
+        reply = asyncio.get_running_loop().create_future()
+        await self.mailbox.put((message, reply))
+        return await reply
+
+    def receive_message_sync(self, message, timeout=None):
+        """兼容层：供同步代码调用，阻塞等待异步处理结果"""
+        return self.runtime.run(self.post(message), timeout)
+
+    async def call_llm_async(self, prompt, use_cache=True):
+        """异步调用大语言模型，生成式回答应传use_cache=False"""
+        response = await self.async_api_caller.call_llm_api(prompt, use_cache=use_cache)
+        if self.config.get("DEBUG_SLEEP", "0") == "1":
+            await asyncio.sleep(1)
+        return response
+
+    async def send_message_async(self, target_agent, message):
+        """发送消息到目标Agent，同步代理(及远程代理)经传输层在线程池中投递，不阻塞事件循环"""
+        if self.config.get("DEBUG_MODE") == "True":
+            print(f"🔄 [{self.name}] -> [{target_agent.name}]: {message['type']}")
+
+        if getattr(target_agent, "is_async", False):
+            return await target_agent.post(message)
+        return await asyncio.to_thread(get_transport().send, target_agent, message)
+
+    @abstractmethod
+    async def receive_message(self, message):
+        """接收消息的抽象协程"""
+        pass
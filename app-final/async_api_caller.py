@@ -0,0 +1,95 @@
+import asyncio
+import time
+import traceback
+from api_caller import get_api_caller, get_log_sink
+
+class AsyncAPICaller:
+    """
+    异步API调用器：LLM使用AsyncOpenAI，配置、LLM缓存和日志与同步APICaller共用；
+    区块链、交易所和SQLite调用交给同步APICaller在线程池中执行，
+    与同步路径共用限速器、请求合并、响应缓存和密钥轮换
+    """
+
+    def __init__(self):
+        self.sync_caller = get_api_caller()
+        self.config = self.sync_caller.config
+        self.llm_cache = self.sync_caller.llm_cache
+        self._openai_client = None
+
+    @property
+    def openai_client(self):
+        """异步OpenAI客户端(首次调用LLM时创建)"""
+        if self._openai_client is None:
+            from openai import AsyncOpenAI
+            self._openai_client = AsyncOpenAI(
+                api_key=self.config.get("API_KEY"),
+                base_url=self.config.get("BASE_URL")
+            )
+        return self._openai_client
+
+    async def call_llm_api(self, prompt, use_cache=True):
+        """
+        异步调用LLM API
+
+        参数:
+        prompt (str): 提示内容
+        use_cache (bool): 是否使用响应缓存，生成式回答应传False
+        """
+        model = self.config.get("MODEL")
+        if use_cache and self.llm_cache is not None:
+            cached = self.llm_cache.get(prompt, model)
+            if cached is not None:
+                return cached
+
+        try:
+            response = await self.openai_client.chat.completions.create(
+                model=model,
+                messages=[
+                    {"role": "user", "content": prompt}
+                ]
+            )
+            content = response.choices[0].message.content
+
+            if use_cache and self.llm_cache is not None and content is not None:
+                self.llm_cache.set(prompt, model, content)
+
+            self.sync_caller._log_api_call("LLM", prompt, content)
+            get_log_sink("llm.txt").write({
+                "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "model": self.config.get("MODEL", "unknown"),
+                "prompt": prompt,
+                "response": content
+            })
+            return content
+        except Exception as e:
+            error_msg = f"LLM API调用失败: {str(e)}\n{traceback.format_exc()}"
+            self.sync_caller._log_api_call("LLM_ERROR", prompt, error_msg)
+            get_log_sink("llm.txt").write({
+                "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "model": self.config.get("MODEL", "unknown"),
+                "prompt": prompt,
+                "error": error_msg
+            })
+            return f"<o>由于API调用错误，无法获取响应: {str(e)}</o>"
+
+    async def call_blockchain_api(self, endpoint, params):
+        """异步调用区块链API(经同步APICaller限速、合并和缓存，日志中不含密钥)"""
+        return await asyncio.to_thread(self.sync_caller.call_blockchain_api, endpoint, params)
+
+    async def call_exchange_api(self, exchange, endpoint, params, method="GET"):
+        """异步调用交易所API(经同步APICaller按端点权重限速)"""
+        return await asyncio.to_thread(self.sync_caller.call_exchange_api, exchange, endpoint, params, method)
+
+    async def execute_sql(self, query, params=None):
+        """在线程池中执行SQL，避免阻塞事件循环"""
+        return await asyncio.to_thread(self.sync_caller.execute_sql, query, params)
+
+    async def execute_many(self, query, rows, batch_size=None):
+        """在线程池中批量执行SQL"""
+        return await asyncio.to_thread(self.sync_caller.execute_many, query, rows, batch_size)
+
+    async def aclose(self):
+        """关闭OpenAI客户端"""
+        if self._openai_client is not None:
+            await self._openai_client.close()
+            self._openai_client = None
@@ -1,4 +1,6 @@
 from base_agent import BaseAgent
+from registry_store import RegistryStore
+import threading
 import time
 
 class AutoTradeAgent(BaseAgent):
@@ -8,6 +10,9 @@ class AutoTradeAgent(BaseAgent):
         self.wallet_agent = None
         self.cex_agent = None
         self.strategies = {}  # 存储交易策略
+        # 持久化注册表在首次访问策略时才加载
+        self.registry = None
+        self._load_lock = threading.Lock()
     
     def set_agents(self, central_agent, wallet_agent, cex_agent):
         """设置关联的其他代理"""
@@ -15,6 +20,18 @@ class AutoTradeAgent(BaseAgent):
         self.wallet_agent = wallet_agent
         self.cex_agent = cex_agent
     
+    def _ensure_loaded(self):
+        """首次访问时从注册表恢复交易策略"""
+        if self.registry is not None:
+            return
+        with self._load_lock:
+            if self.registry is not None:
+                return
+            registry = RegistryStore(self.api_caller)
+            for strategy_id, strategy in registry.load_strategies().items():
+                self.strategies.setdefault(strategy_id, strategy)
+            self.registry = registry
+    
     def receive_message(self, message):
         """接收消息"""
         if message["type"] == "execute_trade":
@@ -78,13 +95,15 @@ class AutoTradeAgent(BaseAgent):
         if not isinstance(rules, list) or not rules:
             return {"status": "error", "message": "策略规则必须是非空列表"}
         
-        # 添加策略
+        # 添加策略并写入注册表
+        self._ensure_loaded()
         self.strategies[strategy_id] = {
             "description": description,
             "rules": rules,
             "active": params.get("active", True),
             "created_at": params.get("created_at", int(time.time()))
         }
+        self.registry.save_strategy(strategy_id, self.strategies[strategy_id])
         
         return {
             "status": "success",
@@ -102,9 +121,11 @@ class AutoTradeAgent(BaseAgent):
             return {"status": "error", "message": "缺少策略ID"}
         
         strategy_id = params["id"]
+        self._ensure_loaded()
         
         if strategy_id in self.strategies:
             del self.strategies[strategy_id]
+            self.registry.delete_strategy(strategy_id)
             return {
                 "status": "success",
                 "message": f"已移除策略: {strategy_id}"
@@ -117,6 +138,7 @@ class AutoTradeAgent(BaseAgent):
     
     def list_strategies(self):
         """列出所有交易策略"""
+        self._ensure_loaded()
         strategy_list = []
         for strategy_id, strategy_data in self.strategies.items():
             strategy_list.append({
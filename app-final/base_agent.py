@@ -1,35 +1,71 @@
 import json
 import time
 from abc import ABC, abstractmethod
-from api_caller import APICaller
+from api_caller import get_api_caller
+from transport import get_transport
 
 class BaseAgent(ABC):
     def __init__(self, name):
         self.name = name
-        self.api_caller = APICaller()
+        self.api_caller = get_api_caller()
         self.config = self._load_config()
     
     def _load_config(self):
-        """加载配置文件"""
-        config = {}
-        with open("config.txt", "r") as f:
-            for line in f:
-                line = line.strip()
-                if line and not line.startswith("#"):
-                    try:
-                        key, value = line.split("=", 1)
-                        config[key.strip()] = value.strip().strip('"').strip("'")
-                    except ValueError:
-                        continue
-        return config
+        """加载配置文件(与APICaller共用同一份解析结果)"""
+        return self.api_caller.config
     
-    def call_llm(self, prompt):
-        """调用大语言模型"""
-        response = self.api_caller.call_llm_api(prompt)
+    def call_llm(self, prompt, use_cache=True):
+        """调用大语言模型，生成式回答应传use_cache=False"""
+        response = self.api_caller.call_llm_api(prompt, use_cache=use_cache)
         if self.config.get("DEBUG_SLEEP", "0") == "1":
             time.sleep(1)
         return response
     
+    def call_llm_stream(self, prompt):
+        """流式调用大语言模型，逐段产出生成的文本"""
+        for chunk in self.api_caller.call_llm_stream(prompt):
+            yield chunk
+    
+    def stream_output(self, chunks, tag="o"):
+        """
+        从流式响应中实时过滤出标签内的文本，标签可能被拆分到多个片段中
+        
+        参数:
+        chunks (iterable): 文本片段
+        tag (str): 标签名
+        """
+        start_tag = f"<{tag}>"
+        end_tag = f"</{tag}>"
+        buffer = ""
+        inside = False
+        for chunk in chunks:
+            buffer += chunk
+            while buffer:
+                if not inside:
+                    idx = buffer.find(start_tag)
+                    if idx < 0:
+                        # 保留可能是起始标签前缀的尾部
+                        buffer = buffer[-(len(start_tag) - 1):]
+                        break
+                    buffer = buffer[idx + len(start_tag):]
+                    inside = True
+                else:
+                    idx = buffer.find(end_tag)
+                    if idx >= 0:
+                        if idx:
+                            yield buffer[:idx]
+                        return
+                    # 末尾可能是被拆开的结束标签，暂不输出
+                    safe = len(buffer)
+                    for keep in range(min(len(end_tag) - 1, len(buffer)), 0, -1):
+                        if end_tag.startswith(buffer[-keep:]):
+                            safe = len(buffer) - keep
+                            break
+                    if safe:
+                        yield buffer[:safe]
+                    buffer = buffer[safe:]
+                    break
+    
     def extract_output(self, response, tag="o"):
         """从LLM响应中提取标签内容"""
         start_tag = f"<{tag}>"
@@ -55,7 +91,8 @@ class BaseAgent(ABC):
         if self.config.get("DEBUG_MODE") == "True":
             print(f"🔄 [{self.name}] -> [{target_agent.name}]: {message['type']}")
         
-        return target_agent.receive_message(message)
+        # 由传输层投递：进程内直接调用，远程代理经broker转发
+        return get_transport().send(target_agent, message)
     
     def log_action(self, action, details=None):
         """记录代理执行动作"""
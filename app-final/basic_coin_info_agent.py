@@ -1,6 +1,11 @@
-from base_agent import BaseAgent
+import asyncio
+import json
+from async_agent import AsyncBaseAgent
+from api_caller import get_fast_router
+
+class BasicCoinInfoAgent(AsyncBaseAgent):
+    """币种信息代理：运行在异步运行时上，主要币种的LLM补充信息并发获取"""
 
-class BasicCoinInfoAgent(BaseAgent):
     def __init__(self):
         super().__init__(name="BasicCoinInfoAgent")
         self.data_clean_agent = None
@@ -11,38 +16,41 @@ class BasicCoinInfoAgent(BaseAgent):
         """设置DataClean Agent"""
         self.data_clean_agent = agent
     
-    def receive_message(self, message):
+    async def receive_message(self, message):
         """接收消息"""
         if message["type"] == "info_update":
-            return self.process_info_update(message["content"])
+            return await self.process_info_update(message["content"])
         elif message["type"] == "get_coin_info":
             if "coin" in message["content"]:
                 return self.get_coin_info(message["content"]["coin"])
             else:
                 return {"status": "error", "message": "未提供币种"}
         elif message["type"] == "request_market_analysis":
-            return self.analyze_market_data(message["content"])
+            return await self.analyze_market_data(message["content"])
         return {"status": "error", "message": "未支持的消息类型"}
     
-    def process_info_update(self, info):
+    async def process_info_update(self, info):
         """处理更新的信息"""
         self.latest_info = info
         
         # 处理市场信息中的币种信息
-        coin_info_data = self._extract_coin_info(info)
+        coin_info_data = await self._extract_coin_info(info)
         
         # 更新币种数据
         for coin in coin_info_data["coins"]:
             symbol = coin["symbol"]
             self.coin_data[symbol] = coin
         
+        # 新出现的币种补充到快速路由的币种字典
+        get_fast_router().update_tickers([(coin["symbol"], coin.get("name")) for coin in coin_info_data["coins"]])
+        
         # 如果有DataClean Agent，将处理后的数据发送给它
         if self.data_clean_agent:
             message = self.create_mcp_message("processed_data", {
                 "type": "basic_coin_info",
                 "data": coin_info_data
             })
-            self.send_message(self.data_clean_agent, message)
+            await self.send_message_async(self.data_clean_agent, message)
         
         return {"status": "success", "message": "币种信息已处理"}
     
@@ -57,7 +65,7 @@ class BasicCoinInfoAgent(BaseAgent):
             else:
                 return {"status": "error", "message": "未提供币种"}
         elif "type" in data and data["type"] == "analyze_market":
-            return self.analyze_market_data(data.get("params", {}))
+            return self.runtime.run(self.analyze_market_data(data.get("params", {})))
         
         return {"status": "error", "message": "未支持的任务类型"}
     
@@ -74,7 +82,7 @@ class BasicCoinInfoAgent(BaseAgent):
                 "message": f"没有找到币种 {coin_symbol} 的信息"
             }
     
-    def analyze_market_data(self, params=None):
+    async def analyze_market_data(self, params=None):
         """分析市场数据"""
         if not self.latest_info:
             return {"status": "error", "message": "没有最新的市场信息"}
@@ -102,7 +110,7 @@ class BasicCoinInfoAgent(BaseAgent):
         请返回你的分析结果，格式为<output>分析结果</output>
         """
         
-        analysis_result = self.call_llm(analysis_prompt)
+        analysis_result = await self.call_llm_async(analysis_prompt, use_cache=False)
         extracted_analysis = self.extract_output(analysis_result)
         
         return {
@@ -110,8 +118,8 @@ class BasicCoinInfoAgent(BaseAgent):
             "analysis": extracted_analysis
         }
     
-    def _extract_coin_info(self, info):
-        """从市场信息中提取币种信息"""
+    async def _extract_coin_info(self, info):
+        """从市场信息中提取币种信息，主要币种的补充信息并发请求LLM"""
         coin_info_data = {
             "timestamp": info.get("timestamp", 0),
             "coins": []
@@ -142,36 +150,39 @@ class BasicCoinInfoAgent(BaseAgent):
                 if isinstance(price_data, dict) and "price" in price_data:
                     coin_data["price"] = price_data["price"]
             
-            # 使用LLM补充币种信息
-            if symbol in ["ETH", "USDT", "USDC"]:  # 仅为主要币种生成额外信息
-                prompt = f"""
-                根据你的知识，请提供以下加密货币的基本信息:
-                
-                币种: {symbol} ({token.get("name", "")})
-                
-                请简要回答以下问题:
-                1. 这个币种的主要用途是什么?
-                2. 它是哪个区块链的原生代币?
-                3. 它的主要特点是什么?
-                
-                请返回一个JSON格式的回答，包含"description"和"features"两个字段，格式为<output>{{your json}}</output>
-                """
-                
-                result = self.call_llm(prompt)
-                try:
-                    # 尝试解析LLM返回的JSON
-                    extracted_info = self.extract_output(result)
-                    import json
-                    extra_info = json.loads(extracted_info)
-                    
-                    if isinstance(extra_info, dict):
-                        for key, value in extra_info.items():
-                            coin_data[key] = value
-                except:
-                    # 如果解析失败，添加原始文本
-                    coin_data["extra_info"] = self.extract_output(result)
-            
             # 添加到币种数据列表
             coin_info_data["coins"].append(coin_data)
         
-        return coin_info_data 
\ No newline at end of file
+        # 使用LLM补充币种信息，仅为主要币种生成额外信息
+        major_coins = [coin for coin in coin_info_data["coins"] if coin["symbol"] in ["ETH", "USDT", "USDC"]]
+        await asyncio.gather(*(self._enrich_coin(coin) for coin in major_coins))
+        
+        return coin_info_data
+    
+    async def _enrich_coin(self, coin_data):
+        """用LLM补充单个币种的描述和特点"""
+        symbol = coin_data["symbol"]
+        prompt = f"""
+        根据你的知识，请提供以下加密货币的基本信息:
+        
+        币种: {symbol} ({coin_data["name"]})
+        
+        请简要回答以下问题:
+        1. 这个币种的主要用途是什么?
+        2. 它是哪个区块链的原生代币?
+        3. 它的主要特点是什么?
+        
+        请返回一个JSON格式的回答，包含"description"和"features"两个字段，格式为<output>{{your json}}</output>
+        """
+        
+        result = await self.call_llm_async(prompt)
+        try:
+            # 尝试解析LLM返回的JSON
+            extra_info = json.loads(self.extract_output(result))
+            
+            if isinstance(extra_info, dict):
+                for key, value in extra_info.items():
+                    coin_data[key] = value
+        except:
+            # 如果解析失败，添加原始文本
+            coin_data["extra_info"] = self.extract_output(result)
@@ -0,0 +1,135 @@
+import json
+import time
+from api_caller import get_db_manager
+from schema_migrations import apply_migrations
+
+CURSOR_UPSERT_SQL = """
+INSERT INTO ingest_cursors (stream, last_block, last_tx_hash, block_hashes, updated_at)
+VALUES (?, ?, ?, ?, ?)
+ON CONFLICT(stream) DO UPDATE SET
+    last_block = excluded.last_block,
+    last_tx_hash = excluded.last_tx_hash,
+    block_hashes = excluded.block_hashes,
+    updated_at = excluded.updated_at
+"""
+
+class BlockCursorStore:
+    """
+    按数据流持久化的区块高水位：最后处理的区块号、交易哈希，
+    以及该区块内已处理的哈希(用于同一区块的去重)
+    """
+
+    def __init__(self, api_caller):
+        self.api_caller = api_caller
+        apply_migrations(get_db_manager())
+
+    def get(self, stream):
+        """读取游标，不存在时返回None"""
+        rows = self.api_caller.execute_sql(
+            "SELECT last_block, last_tx_hash, block_hashes FROM ingest_cursors WHERE stream = ?", (stream,)
+        )
+        if not isinstance(rows, list) or not rows:
+            return None
+        row = rows[0]
+        return {
+            "last_block": row["last_block"] or 0,
+            "last_tx_hash": row["last_tx_hash"] or "",
+            "block_hashes": set(json.loads(row["block_hashes"] or "[]"))
+        }
+
+    def save(self, stream, last_block, last_tx_hash, block_hashes):
+        """保存游标"""
+        return self.api_caller.execute_sql(
+            CURSOR_UPSERT_SQL,
+            (stream, last_block, last_tx_hash, json.dumps(sorted(block_hashes)), int(time.time()))
+        )
+
+    def commit(self, pending):
+        """确认fetch_incremental返回的待确认游标(下游已成功处理该批交易)"""
+        if not pending:
+            return {"affected_rows": 0}
+        return self.save(pending["stream"], pending["last_block"], pending["last_tx_hash"], pending["block_hashes"])
+
+def _block_number(tx):
+    value = str(tx.get("blockNumber", ""))
+    return int(value) if value.isdigit() else 0
+
+def _tx_index(tx):
+    value = str(tx.get("transactionIndex", ""))
+    return int(value) if value.isdigit() else 0
+
+def fetch_incremental(api_caller, cursor_store, stream, endpoint, params, page_size=100, max_pages=10):
+    """
+    从游标位置开始按区块升序分页拉取交易，只返回上次之后的新交易
+
+    首次拉取(无游标)时只取最新一页作为起点；之后从last_block开始
+    (包含该区块，按哈希去重)，直到返回不满一页或达到max_pages，
+    未拉完的部分会在下次从新的游标继续，不会漏数据。
+
+    拉取本身不移动游标：调用方在新交易被下游处理(入库)成功后，
+    再用cursor_store.commit(pending)确认，失败或超时的批次下次会重新拉取。
+
+    返回:
+    tuple: (响应, 待确认的游标)。响应为Etherscan格式，result为按区块降序排列的新交易；
+           第一页就出错时原样返回API响应；没有新交易或出错时待确认的游标为None
+    """
+    cursor = cursor_store.get(stream)
+    new_txs = []
+    page = 1
+    while page <= max_pages:
+        page_params = dict(params)
+        page_params.update({
+            "startblock": str(cursor["last_block"]) if cursor else "0",
+            "endblock": "99999999",
+            "sort": "asc" if cursor else "desc",
+            "page": str(page),
+            "offset": str(page_size)
+        })
+        response = api_caller.call_blockchain_api(endpoint, page_params)
+        result = response.get("result") if isinstance(response, dict) else None
+        if "error" in response or not isinstance(result, list):
+            if page == 1:
+                return response, None
+            break
+
+        for tx in result:
+            if not isinstance(tx, dict):
+                continue
+            if cursor:
+                block = _block_number(tx)
+                if block < cursor["last_block"]:
+                    continue
+                if block == cursor["last_block"] and tx.get("hash") in cursor["block_hashes"]:
+                    continue
+            new_txs.append(tx)
+
+        # 首次拉取只取最新一页；不满一页说明已到达链头
+        if not cursor or len(result) < page_size:
+            break
+        page += 1
+
+    # 按(区块号, 区块内序号)降序排列，第一条即最新处理的交易
+    new_txs.sort(key=lambda tx: (_block_number(tx), _tx_index(tx)), reverse=True)
+    pending = None
+    if new_txs:
+        last_block = _block_number(new_txs[0])
+        block_hashes = {tx.get("hash", "") for tx in new_txs if _block_number(tx) == last_block}
+        if cursor and cursor["last_block"] == last_block:
+            block_hashes |= cursor["block_hashes"]
+        pending = {"stream": stream, "last_block": last_block,
+                   "last_tx_hash": new_txs[0].get("hash", ""), "block_hashes": block_hashes}
+
+    return {"status": "1", "message": "OK", "result": new_txs}, pending
+
+def merge_window(window, new_txs, size):
+    """
+    把新交易合并到最近交易窗口(按哈希去重，按区块降序，最多保留size条)，
+    快照和用户查询读取窗口，入库只使用每次拉取的新交易
+    """
+    merged = {}
+    for tx in list(new_txs) + list(window):
+        tx_hash = tx.get("hash", "")
+        if tx_hash not in merged:
+            merged[tx_hash] = tx
+    txs = sorted(merged.values(), key=lambda tx: (_block_number(tx), _tx_index(tx)), reverse=True)
+    return txs[:size]
@@ -1,11 +1,25 @@
 from base_agent import BaseAgent
+from api_caller import get_fast_router, get_db_manager
+from response_cache import ResponseCache
+from intent_schema import INTENT_SCHEMAS, build_followup_prompt, fill_slot
 import json
+import re
 import time
 import traceback
 
 class CentralAgent(BaseAgent):
     def __init__(self):
         super().__init__(name="CentralAgent")
+        self.fast_router = get_fast_router()
+        # 规范化问题 -> 执行成功过的SQL；(SQL, 数据版本) -> 查询结果和解释
+        self.sql_cache = ResponseCache(
+            ttl=float(self.config.get("SQL_QUESTION_CACHE_TTL", "86400")),
+            max_entries=int(self.config.get("SQL_QUESTION_CACHE_SIZE", "256"))
+        )
+        self.sql_result_cache = ResponseCache(
+            ttl=float(self.config.get("SQL_RESULT_CACHE_TTL", "3600")),
+            max_entries=int(self.config.get("SQL_RESULT_CACHE_SIZE", "128"))
+        )
         # 初始化其他代理的引用
         self.info_process_agent = None
         self.data_clean_agent = None
@@ -56,9 +70,9 @@ class CentralAgent(BaseAgent):
     def process_user_request(self, request):
         """处理用户请求"""
         try:
-            # 首先更新市场信息
+            # 确保市场信息快照新鲜(仅在过期时等待刷新)
             if self.info_process_agent:
-                update_message = self.create_mcp_message("request_info_update", {})
+                update_message = self.create_mcp_message("request_info_snapshot", {})
                 update_result = self.send_message(self.info_process_agent, update_message)
                 if update_result.get("status") != "success":
                     return {"status": "error", "message": "无法更新市场信息"}
@@ -117,6 +131,11 @@ class CentralAgent(BaseAgent):
         # 确定要分析的文本
         request_text = request["original_query"] if isinstance(request, dict) and "original_query" in request else str(request)
         
+        # 规则路由足够确定时直接使用
+        route = self.fast_router.route(request_text)
+        if self.fast_router.is_confident(route):
+            return route["request_type"]
+        
         analysis_prompt = f"""
         请识别以下用户请求属于哪种类型:
         
@@ -143,6 +162,24 @@ class CentralAgent(BaseAgent):
         
         return request_type
     
+    def _resolve_slot(self, request, request_type, slot_name):
+        """
+        获取处理请求所需的参数：UserAgent已提取并校验的直接使用，
+        缺失时先用规则提取，仍缺失才针对该参数单独调用一次LLM
+        """
+        if isinstance(request, dict) and slot_name in request.get("parameters", {}):
+            return request["parameters"][slot_name]
+        
+        request_text = request["original_query"] if isinstance(request, dict) and "original_query" in request else str(request)
+        value = fill_slot(request_type, slot_name, self.fast_router.extract_slot(request_type, slot_name, request_text))
+        if value is None:
+            result = self.call_llm(build_followup_prompt(request_type, slot_name, request_text))
+            value = fill_slot(request_type, slot_name, self.extract_output(result))
+        if value is None:
+            default = INTENT_SCHEMAS[request_type]["slots"][slot_name].get("default")
+            value = default() if callable(default) else default
+        return value
+    
     def _handle_market_analysis_request(self, request):
         """处理市场分析请求"""
         if self.basic_coin_info_agent:
@@ -153,22 +190,7 @@ class CentralAgent(BaseAgent):
     
     def _handle_coin_info_request(self, request):
         """处理币种信息请求"""
-        # 如果参数中已有币种信息，直接使用
-        if isinstance(request, dict) and "parameters" in request and "coin" in request["parameters"]:
-            coin_symbol = request["parameters"]["coin"]
-        else:
-            # 使用LLM提取请求中的币种
-            request_text = request["original_query"] if isinstance(request, dict) and "original_query" in request else str(request)
-            extract_prompt = f"""
-            请从以下请求中提取用户想要了解的币种符号:
-            
-            {request_text}
-            
-            请只返回币种符号(如BTC, ETH, USDT等)，格式为<o>币种符号</o>
-            """
-            
-            result = self.call_llm(extract_prompt)
-            coin_symbol = self.extract_output(result)
+        coin_symbol = self._resolve_slot(request, "coin_info", "coin")
         
         if self.basic_coin_info_agent:
             message = self.create_mcp_message("get_coin_info", {
@@ -180,22 +202,7 @@ class CentralAgent(BaseAgent):
     
     def _handle_whale_analysis_request(self, request):
         """处理鲸鱼活动分析请求"""
-        # 如果参数中已有币种信息，直接使用
-        if isinstance(request, dict) and "parameters" in request and "coin" in request["parameters"]:
-            coin_symbol = request["parameters"]["coin"]
-        else:
-            # 使用LLM提取请求中的币种
-            request_text = request["original_query"] if isinstance(request, dict) and "original_query" in request else str(request)
-            extract_prompt = f"""
-            请从以下请求中提取用户想要分析的币种符号:
-            
-            {request_text}
-            
-            请只返回币种符号(如BTC, ETH, USDT等)，如果没有提到具体币种，则返回ETH，格式为<o>币种符号</o>
-            """
-            
-            result = self.call_llm(extract_prompt)
-            coin_symbol = self.extract_output(result)
+        coin_symbol = self._resolve_slot(request, "whale_analysis", "coin")
         
         if self.specific_coin_whale_agent:
             message = self.create_mcp_message("request_whale_analysis", {
@@ -207,22 +214,9 @@ class CentralAgent(BaseAgent):
     
     def _handle_contract_analysis_request(self, request):
         """处理合约分析请求"""
-        # 如果参数中已有合约地址，直接使用
-        if isinstance(request, dict) and "parameters" in request and "address" in request["parameters"]:
-            contract_address = request["parameters"]["address"]
-        else:
-            # 使用LLM提取请求中的合约地址
-            request_text = request["original_query"] if isinstance(request, dict) and "original_query" in request else str(request)
-            extract_prompt = f"""
-            请从以下请求中提取用户想要分析的智能合约地址:
-            
-            {request_text}
-            
-            请只返回合约地址(0x开头的地址)，格式为<o>合约地址</o>
-            """
-            
-            result = self.call_llm(extract_prompt)
-            contract_address = self.extract_output(result)
+        contract_address = self._resolve_slot(request, "contract_analysis", "address")
+        if not contract_address:
+            return {"status": "error", "message": "无法确定要分析的合约地址"}
         
         if self.contract_monitor_agent:
             message = self.create_mcp_message("request_contract_analysis", {
@@ -234,43 +228,12 @@ class CentralAgent(BaseAgent):
     
     def _handle_transaction_analysis_request(self, request):
         """处理交易分析请求"""
-        # 如果参数中已有分析类型，直接使用
-        if isinstance(request, dict) and "parameters" in request and "analysis_type" in request["parameters"]:
-            analysis_type = request["parameters"]["analysis_type"]
-        else:
-            # 确定是高频交易分析还是交易所提款分析
-            request_text = request["original_query"] if isinstance(request, dict) and "original_query" in request else str(request)
-            determine_prompt = f"""
-            请从以下请求中判断用户是想分析高频交易地址还是交易所提款情况:
-            
-            {request_text}
-            
-            请返回 "high_freq" 或 "cex_withdrawal"，格式为<o>分析类型</o>
-            """
-            
-            result = self.call_llm(determine_prompt)
-            analysis_type = self.extract_output(result)
+        analysis_type = self._resolve_slot(request, "transaction_analysis", "analysis_type")
         
         if analysis_type == "high_freq":
             # 分析高频交易
             if self.freq_tx_agent:
-                address = None
-                # 如果参数中已有地址，直接使用
-                if isinstance(request, dict) and "parameters" in request and "address" in request["parameters"]:
-                    address = request["parameters"]["address"]
-                else:
-                    # 尝试提取特定地址
-                    request_text = request["original_query"] if isinstance(request, dict) and "original_query" in request else str(request)
-                    extract_prompt = f"""
-                    请从以下请求中提取用户想要分析的具体地址(如果有):
-                    
-                    {request_text}
-                    
-                    如果请求中包含具体地址，请返回该地址，否则返回"all"，格式为<o>地址或all</o>
-                    """
-                    
-                    result = self.call_llm(extract_prompt)
-                    address = self.extract_output(result)
+                address = self._resolve_slot(request, "transaction_analysis", "address")
                 
                 params = {}
                 if address and address != "all":
@@ -319,8 +282,9 @@ class CentralAgent(BaseAgent):
                 if "target" not in params:
                     params["target"] = "cex"  # 默认使用中心化交易所
                 
-                if "action" not in params:
-                    params["action"] = "buy"  # 默认执行买入操作
+                # 交易动作无法确定时不下单，避免把转账、提币或被否定的请求当作买入
+                if params.get("action") not in ("buy", "sell", "approve", "swap"):
+                    return {"status": "error", "message": "无法确定交易动作，请明确说明买入、卖出、兑换或授权"}
                 
                 message = self.create_mcp_message("execute_trade", params)
                 result = self.send_message(self.auto_trade_agent, message)
@@ -329,31 +293,36 @@ class CentralAgent(BaseAgent):
                 return {"status": "error", "message": "缺少交易参数"}
         return {"status": "error", "message": "交易功能尚未实现"}
     
+    @staticmethod
+    def _normalize_question(request):
+        """规范化用户问题作为缓存键：小写、合并空白、去掉末尾标点"""
+        if not isinstance(request, dict) or not request.get("original_query"):
+            return None
+        question = re.sub(r"\s+", " ", str(request["original_query"]).strip().lower())
+        return question.rstrip("?？。.!！ ")
+    
     def _handle_sql_query_request(self, request):
-        """处理SQL查询请求"""
-        # 如果参数中已有SQL查询，直接使用
-        if isinstance(request, dict) and "parameters" in request and "sql" in request["parameters"]:
-            sql_query = request["parameters"]["sql"]
-        else:
-            # 使用LLM从请求中提取SQL查询
-            request_text = request["original_query"] if isinstance(request, dict) and "original_query" in request else str(request)
-            extract_prompt = f"""
-            请从以下请求中提取或生成SQL查询语句:
-            
-            {request_text}
-            
-            请返回完整的SQL查询语句，格式为<sql>SQL查询语句</sql>
-            """
-            
-            result = self.call_llm(extract_prompt)
-            
-            # 提取SQL查询
-            sql_query = self.extract_output(result, tag="sql")
+        """
+        处理SQL查询请求：同一问题复用执行成功过的SQL，
+        数据库内容未变化时直接返回缓存的结果和解释，跳过查询和LLM调用
+        """
+        question = self._normalize_question(request)
+        sql_query = self.sql_cache.get(question) if question else None
+        if sql_query is None:
+            sql_query = self._resolve_slot(request, "sql_query", "sql")
         
         if not sql_query:
             return {"status": "error", "message": "无法提取或生成SQL查询"}
         
         if self.data_clean_agent:
+            db = get_db_manager()
+            cacheable = db.is_read_query(sql_query)
+            result_key = (re.sub(r"\s+", " ", sql_query.strip()), db.data_version()) if cacheable else None
+            if result_key is not None:
+                cached = self.sql_result_cache.get(result_key)
+                if cached is not None:
+                    return dict(cached, cached=True)
+            
             message = self.create_mcp_message("sql_query", {
                 "query": sql_query
             })
@@ -370,10 +339,15 @@ class CentralAgent(BaseAgent):
                 请提供简洁明了的解释，格式为<o>解释</o>
                 """
                 
-                explanation_result = self.call_llm(explanation_prompt)
+                explanation_result = self.call_llm(explanation_prompt, use_cache=False)
                 explanation = self.extract_output(explanation_result)
                 
                 result["explanation"] = explanation
+                
+                if question:
+                    self.sql_cache.set(question, sql_query)
+                if result_key is not None:
+                    self.sql_result_cache.set(result_key, result)
             
             return result
         
@@ -149,7 +149,7 @@ class ContractMonitorAgent(BaseAgent):
         请返回你的分析结果，格式为<o>分析结果</o>
         """
         
-        analysis_result = self.call_llm(analysis_prompt)
+        analysis_result = self.call_llm(analysis_prompt, use_cache=False)
         extracted_analysis = self.extract_output(analysis_result)
         
         return {
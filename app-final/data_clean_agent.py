@@ -1,11 +1,90 @@
 from base_agent import BaseAgent
+from api_caller import get_db_manager
+from schema_migrations import apply_migrations, prune_expired_rows
 import json
 import time
 import os
 
+# 批量写入语句(文本固定，sqlite可复用预编译语句)
+COIN_INFO_UPSERT_SQL = """
+INSERT INTO coin_info (symbol, name, contract, price, market_cap, volume_24h, change_24h, description, features, last_updated)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(symbol) DO UPDATE SET
+    name = excluded.name,
+    contract = excluded.contract,
+    price = COALESCE(excluded.price, coin_info.price),
+    market_cap = COALESCE(excluded.market_cap, coin_info.market_cap),
+    volume_24h = COALESCE(excluded.volume_24h, coin_info.volume_24h),
+    change_24h = COALESCE(excluded.change_24h, coin_info.change_24h),
+    description = excluded.description,
+    features = excluded.features,
+    last_updated = excluded.last_updated
+"""
+
+WHALE_TRANSACTION_UPSERT_SQL = """
+INSERT INTO whale_transactions (tx_hash, from_address, to_address, value, coin, block_number, timestamp)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(tx_hash) DO UPDATE SET
+    from_address = excluded.from_address,
+    to_address = excluded.to_address,
+    value = excluded.value,
+    coin = excluded.coin,
+    block_number = excluded.block_number,
+    timestamp = excluded.timestamp
+"""
+
+CEX_WITHDRAWAL_UPSERT_SQL = """
+INSERT INTO cex_withdrawals (tx_hash, from_address, to_address, value, timestamp)
+VALUES (?, ?, ?, ?, ?)
+ON CONFLICT(tx_hash) DO UPDATE SET
+    from_address = excluded.from_address,
+    to_address = excluded.to_address,
+    value = excluded.value,
+    timestamp = excluded.timestamp
+"""
+
+CONTRACT_ACTIVITY_UPSERT_SQL = """
+INSERT INTO contract_activities (tx_hash, contract_address, contract_type, from_address, value, timestamp, block_number)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(tx_hash) DO UPDATE SET
+    contract_address = excluded.contract_address,
+    contract_type = excluded.contract_type,
+    from_address = excluded.from_address,
+    value = excluded.value,
+    timestamp = excluded.timestamp,
+    block_number = excluded.block_number
+"""
+
+# 各追加表推送给订阅者的列
+INSERT_COLUMNS = {
+    "whale_transactions": ("tx_hash", "from_address", "to_address", "value", "coin", "block_number", "timestamp"),
+    "cex_withdrawals": ("tx_hash", "from_address", "to_address", "value", "timestamp"),
+    "contract_activities": ("tx_hash", "contract_address", "contract_type", "from_address", "value",
+                            "timestamp", "block_number")
+}
+
+# 冲突时保留已有的first_seen，无需先查询再写入
+FREQUENT_ADDRESS_UPSERT_SQL = """
+INSERT INTO frequent_addresses (address, transaction_count, first_seen, last_seen)
+VALUES (?, ?, ?, ?)
+ON CONFLICT(address) DO UPDATE SET
+    transaction_count = excluded.transaction_count,
+    last_seen = excluded.last_seen
+"""
+
+def _wei_to_eth(value):
+    """将wei字符串转换为ETH，无法解析时返回0"""
+    return float(value) / 1e18 if str(value).isdigit() else 0
+
+def _to_int(value):
+    """将数字字符串转换为整数，无法解析时返回0"""
+    return int(value) if str(value).isdigit() else 0
+
 class DataCleanAgent(BaseAgent):
     def __init__(self):
         super().__init__(name="DataCleanAgent")
+        self.last_pruned_at = 0
+        self._insert_subscribers = []
         self.initialize_database()
     
     def initialize_database(self):
@@ -14,76 +93,55 @@ class DataCleanAgent(BaseAgent):
         self._create_tables()
     
     def _create_tables(self):
-        """创建数据库表"""
-        # 币种信息表
-        coin_info_table = """
-        CREATE TABLE IF NOT EXISTS coin_info (
-            symbol TEXT PRIMARY KEY,
-            name TEXT,
-            contract TEXT,
-            price REAL,
-            market_cap REAL,
-            volume_24h REAL,
-            change_24h REAL,
-            description TEXT,
-            features TEXT,
-            last_updated INTEGER
-        )
-        """
-        
-        # 鲸鱼交易表
-        whale_transaction_table = """
-        CREATE TABLE IF NOT EXISTS whale_transactions (
-            tx_hash TEXT PRIMARY KEY,
-            from_address TEXT,
-            to_address TEXT,
-            value REAL,
-            coin TEXT,
-            block_number INTEGER,
-            timestamp INTEGER
-        )
+        """创建数据库表并应用版本化迁移(索引、按天分桶等)"""
+        apply_migrations(get_db_manager())
+    
+    def subscribe_inserts(self, callback):
         """
-        
-        # 交易所提款表
-        cex_withdrawal_table = """
-        CREATE TABLE IF NOT EXISTS cex_withdrawals (
-            tx_hash TEXT PRIMARY KEY,
-            from_address TEXT,
-            to_address TEXT,
-            value REAL,
-            timestamp INTEGER
-        )
+        订阅追加表的写入事件
+
+        参数:
+        callback (callable): callback(table, rows)，rows为本批次真正新插入的行(dict列表，含rowid)，
+                             已存在而被更新的行不会推送；在写入事务提交后于写入线程中按提交顺序
+                             同步调用(仍持有写锁)，应尽快返回
         """
+        self._insert_subscribers.append(callback)
+    
+    def _publish_inserts(self, table, rows):
+        """把已提交的新行推送给订阅者"""
+        if not self._insert_subscribers or not rows:
+            return
+        for callback in list(self._insert_subscribers):
+            try:
+                callback(table, rows)
+            except Exception as e:
+                self.log_action("错误", f"推送{table}写入事件失败: {str(e)}")
+    
+    def _insert_rows(self, table, query, rows):
+        """批量写入追加表，只把新插入的行推送给订阅者"""
+        on_insert = (lambda inserted: self._publish_inserts(table, inserted)) if self._insert_subscribers else None
+        return self.api_caller.insert_many(query, rows, table, INSERT_COLUMNS[table], on_insert=on_insert)
+    
+    def prune_expired_data(self, force=False):
+        """按DATA_RETENTION_DAYS清理过期的分析数据，默认最多每RETENTION_PRUNE_INTERVAL秒执行一次"""
+        retention_days = float(self.config.get("DATA_RETENTION_DAYS", "0"))
+        if retention_days <= 0:
+            return {"status": "warning", "message": "未配置数据保留期"}
         
-        # 合约活动表
-        contract_activity_table = """
-        CREATE TABLE IF NOT EXISTS contract_activities (
-            tx_hash TEXT PRIMARY KEY,
-            contract_address TEXT,
-            contract_type TEXT,
-            from_address TEXT,
-            value REAL,
-            timestamp INTEGER,
-            block_number INTEGER
-        )
-        """
+        now = time.time()
+        interval = float(self.config.get("RETENTION_PRUNE_INTERVAL", "3600"))
+        if not force and now - self.last_pruned_at < interval:
+            return {"status": "success", "message": "距离上次清理时间过短，跳过"}
         
-        # 高频交易地址表
-        frequent_address_table = """
-        CREATE TABLE IF NOT EXISTS frequent_addresses (
-            address TEXT PRIMARY KEY,
-            transaction_count INTEGER,
-            first_seen INTEGER,
-            last_seen INTEGER
-        )
-        """
+        self.last_pruned_at = now
+        try:
+            deleted = prune_expired_rows(get_db_manager(), retention_days, now)
+        except Exception as e:
+            self.log_action("错误", f"清理过期数据失败: {str(e)}")
+            return {"status": "error", "message": f"清理过期数据失败: {str(e)}"}
         
-        # 执行创建表的SQL
-        self.api_caller.execute_sql(coin_info_table)
-        self.api_caller.execute_sql(whale_transaction_table)
-        self.api_caller.execute_sql(cex_withdrawal_table)
-        self.api_caller.execute_sql(contract_activity_table)
-        self.api_caller.execute_sql(frequent_address_table)
+        self.log_action("清理过期数据", deleted)
+        return {"status": "success", "deleted": deleted}
     
     def receive_message(self, message):
         """接收消息"""
@@ -91,7 +149,7 @@ class DataCleanAgent(BaseAgent):
             return self.process_data(message["content"])
         elif message["type"] == "sql_query":
             if "query" in message["content"]:
-                return self.execute_query(message["content"]["query"])
+                return self.execute_query(message["content"]["query"], message["content"].get("params"))
             return {"status": "error", "message": "未提供SQL查询"}
         return {"status": "error", "message": "未支持的消息类型"}
     
@@ -103,6 +161,8 @@ class DataCleanAgent(BaseAgent):
         data_type = content["type"]
         data = content["data"]
         
+        self.prune_expired_data()
+        
         if data_type == "basic_coin_info":
             return self._process_coin_info(data)
         elif data_type == "whale_activities":
@@ -116,9 +176,9 @@ class DataCleanAgent(BaseAgent):
         
         return {"status": "error", "message": f"未知的数据类型: {data_type}"}
     
-    def execute_query(self, query):
-        """执行SQL查询"""
-        result = self.api_caller.execute_sql(query)
+    def execute_query(self, query, params=None):
+        """执行SQL查询(params为可选的绑定参数)"""
+        result = self.api_caller.execute_sql(query, params)
         return {
             "status": "success" if "error" not in result else "error",
             "result": result
@@ -144,36 +204,26 @@ class DataCleanAgent(BaseAgent):
         coins = data["coins"]
         timestamp = data.get("timestamp", int(time.time()))
         
+        rows = []
         for coin in coins:
-            # 准备数据
-            coin_data = {
-                "symbol": coin.get("symbol", ""),
-                "name": coin.get("name", ""),
-                "contract": coin.get("contract", ""),
-                "price": coin.get("price"),
-                "market_cap": coin.get("market_cap"),
-                "volume_24h": coin.get("volume_24h"),
-                "change_24h": coin.get("change_24h"),
-                "description": coin.get("description", ""),
-                "features": json.dumps(coin.get("features", {})) if isinstance(coin.get("features"), dict) else coin.get("features", ""),
-                "last_updated": timestamp
-            }
-            
-            # 过滤掉None值
-            coin_data = {k: v for k, v in coin_data.items() if v is not None}
-            
-            # 构建SQL
-            placeholders = ", ".join(["?" for _ in coin_data])
-            columns = ", ".join(coin_data.keys())
-            values = tuple(coin_data.values())
-            
-            # 更新币种信息
-            upsert_sql = f"""
-            INSERT OR REPLACE INTO coin_info ({columns})
-            VALUES ({placeholders})
-            """
-            
-            self.api_caller.execute_sql(upsert_sql, values)
+            features = coin.get("features", "")
+            rows.append((
+                coin.get("symbol", ""),
+                coin.get("name", ""),
+                coin.get("contract", ""),
+                coin.get("price"),
+                coin.get("market_cap"),
+                coin.get("volume_24h"),
+                coin.get("change_24h"),
+                coin.get("description", ""),
+                json.dumps(features) if isinstance(features, dict) else features,
+                timestamp
+            ))
+        
+        # 一个事务内批量更新币种信息
+        result = self.api_caller.execute_many(COIN_INFO_UPSERT_SQL, rows)
+        if "error" in result:
+            return {"status": "error", "message": "币种信息写入失败"}
         
         return {"status": "success", "message": f"已处理 {len(coins)} 个币种信息"}
     
@@ -184,34 +234,26 @@ class DataCleanAgent(BaseAgent):
         
         transactions = data["whale_transactions"]
         
+        rows = []
         for tx in transactions:
-            # 准备数据
-            tx_data = {
-                "tx_hash": tx.get("hash", ""),
-                "from_address": tx.get("from", ""),
-                "to_address": tx.get("to", ""),
-                "value": float(tx.get("value", 0)) / 1e18 if tx.get("value", "").isdigit() else 0,
-                "coin": tx.get("detected_coin", "ETH"),
-                "block_number": int(tx.get("blockNumber", 0)) if tx.get("blockNumber", "").isdigit() else 0,
-                "timestamp": int(tx.get("timeStamp", 0)) if tx.get("timeStamp", "").isdigit() else 0
-            }
-            
             # 过滤掉空哈希值
-            if not tx_data["tx_hash"]:
+            if not tx.get("hash", ""):
                 continue
             
-            # 构建SQL
-            placeholders = ", ".join(["?" for _ in tx_data])
-            columns = ", ".join(tx_data.keys())
-            values = tuple(tx_data.values())
-            
-            # 插入鲸鱼交易
-            insert_sql = f"""
-            INSERT OR REPLACE INTO whale_transactions ({columns})
-            VALUES ({placeholders})
-            """
-            
-            self.api_caller.execute_sql(insert_sql, values)
+            rows.append((
+                tx.get("hash", ""),
+                tx.get("from", ""),
+                tx.get("to", ""),
+                _wei_to_eth(tx.get("value", "")),
+                tx.get("detected_coin", "ETH"),
+                _to_int(tx.get("blockNumber", "")),
+                _to_int(tx.get("timeStamp", ""))
+            ))
+        
+        # 一个事务内批量插入鲸鱼交易
+        result = self._insert_rows("whale_transactions", WHALE_TRANSACTION_UPSERT_SQL, rows)
+        if "error" in result:
+            return {"status": "error", "message": "鲸鱼交易写入失败"}
         
         return {"status": "success", "message": f"已处理 {len(transactions)} 个鲸鱼交易"}
     
@@ -222,32 +264,24 @@ class DataCleanAgent(BaseAgent):
         
         withdrawals = data["withdrawals"]
         
+        rows = []
         for withdrawal in withdrawals:
-            # 准备数据
-            withdrawal_data = {
-                "tx_hash": withdrawal.get("hash", ""),
-                "from_address": withdrawal.get("from", ""),
-                "to_address": withdrawal.get("to", ""),
-                "value": float(withdrawal.get("value", 0)) / 1e18 if withdrawal.get("value", "").isdigit() else 0,
-                "timestamp": int(withdrawal.get("timeStamp", 0)) if withdrawal.get("timeStamp", "").isdigit() else 0
-            }
-            
             # 过滤掉空哈希值
-            if not withdrawal_data["tx_hash"]:
+            if not withdrawal.get("hash", ""):
                 continue
             
-            # 构建SQL
-            placeholders = ", ".join(["?" for _ in withdrawal_data])
-            columns = ", ".join(withdrawal_data.keys())
-            values = tuple(withdrawal_data.values())
-            
-            # 插入交易所提款
-            insert_sql = f"""
-            INSERT OR REPLACE INTO cex_withdrawals ({columns})
-            VALUES ({placeholders})
-            """
-            
-            self.api_caller.execute_sql(insert_sql, values)
+            rows.append((
+                withdrawal.get("hash", ""),
+                withdrawal.get("from", ""),
+                withdrawal.get("to", ""),
+                _wei_to_eth(withdrawal.get("value", "")),
+                _to_int(withdrawal.get("timeStamp", ""))
+            ))
+        
+        # 一个事务内批量插入交易所提款
+        result = self._insert_rows("cex_withdrawals", CEX_WITHDRAWAL_UPSERT_SQL, rows)
+        if "error" in result:
+            return {"status": "error", "message": "交易所提款写入失败"}
         
         return {"status": "success", "message": f"已处理 {len(withdrawals)} 个交易所提款"}
     
@@ -258,39 +292,31 @@ class DataCleanAgent(BaseAgent):
         
         contracts = data["contracts"]
         
+        rows = []
         for contract in contracts:
             contract_address = contract.get("address", "")
             contract_type = contract.get("type", "未知")
             interactions = contract.get("interactions", [])
             
             for interaction in interactions:
-                # 准备数据
-                interaction_data = {
-                    "tx_hash": interaction.get("hash", ""),
-                    "contract_address": contract_address,
-                    "contract_type": contract_type,
-                    "from_address": interaction.get("from", ""),
-                    "value": float(interaction.get("value", 0)) / 1e18 if interaction.get("value", "").isdigit() else 0,
-                    "timestamp": int(interaction.get("timeStamp", 0)) if interaction.get("timeStamp", "").isdigit() else 0,
-                    "block_number": int(interaction.get("blockNumber", 0)) if interaction.get("blockNumber", "").isdigit() else 0
-                }
-                
                 # 过滤掉空哈希值
-                if not interaction_data["tx_hash"]:
+                if not interaction.get("hash", ""):
                     continue
                 
-                # 构建SQL
-                placeholders = ", ".join(["?" for _ in interaction_data])
-                columns = ", ".join(interaction_data.keys())
-                values = tuple(interaction_data.values())
-                
-                # 插入合约活动
-                insert_sql = f"""
-                INSERT OR REPLACE INTO contract_activities ({columns})
-                VALUES ({placeholders})
-                """
-                
-                self.api_caller.execute_sql(insert_sql, values)
+                rows.append((
+                    interaction.get("hash", ""),
+                    contract_address,
+                    contract_type,
+                    interaction.get("from", ""),
+                    _wei_to_eth(interaction.get("value", "")),
+                    _to_int(interaction.get("timeStamp", "")),
+                    _to_int(interaction.get("blockNumber", ""))
+                ))
+        
+        # 一个事务内批量插入合约活动
+        result = self._insert_rows("contract_activities", CONTRACT_ACTIVITY_UPSERT_SQL, rows)
+        if "error" in result:
+            return {"status": "error", "message": "合约活动写入失败"}
         
         return {"status": "success", "message": f"已处理 {len(contracts)} 个合约的活动数据"}
     
@@ -302,40 +328,17 @@ class DataCleanAgent(BaseAgent):
         addresses = data["frequent_addresses"]
         timestamp = data.get("timestamp", int(time.time()))
         
+        rows = []
         for addr_data in addresses:
             address = addr_data.get("address", "")
-            transaction_count = addr_data.get("transaction_count", 0)
-            
             if not address:
                 continue
             
-            # 查询地址是否已存在
-            query_sql = "SELECT first_seen FROM frequent_addresses WHERE address = ?"
-            result = self.api_caller.execute_sql(query_sql, (address,))
-            
-            first_seen = timestamp
-            if result and len(result) > 0:
-                first_seen = result[0].get("first_seen", timestamp)
-            
-            # 准备数据
-            address_data = {
-                "address": address,
-                "transaction_count": transaction_count,
-                "first_seen": first_seen,
-                "last_seen": timestamp
-            }
-            
-            # 构建SQL
-            placeholders = ", ".join(["?" for _ in address_data])
-            columns = ", ".join(address_data.keys())
-            values = tuple(address_data.values())
-            
-            # 更新频繁交易地址信息
-            upsert_sql = f"""
-            INSERT OR REPLACE INTO frequent_addresses ({columns})
-            VALUES ({placeholders})
-            """
-            
-            self.api_caller.execute_sql(upsert_sql, values)
+            rows.append((address, addr_data.get("transaction_count", 0), timestamp, timestamp))
+        
+        # 一个事务内批量更新频繁交易地址信息
+        result = self.api_caller.execute_many(FREQUENT_ADDRESS_UPSERT_SQL, rows)
+        if "error" in result:
+            return {"status": "error", "message": "频繁交易地址写入失败"}
         
-        return {"status": "success", "message": f"已处理 {len(addresses)} 个频繁交易地址"} 
\ No newline at end of file
+        return {"status": "success", "message": f"已处理 {len(addresses)} 个频繁交易地址"}
@@ -0,0 +1,308 @@
+import re
+import sqlite3
+import threading
+
+ADDRESS_RE = re.compile(r"(?<![0-9a-fA-Fx])0x[0-9a-fA-F]{40}(?![0-9a-fA-F])")
+TX_HASH_RE = re.compile(r"(?<![0-9a-fA-Fx])0x[0-9a-fA-F]{64}(?![0-9a-fA-F])")
+# SQL在第一个非SQL字符(中文、全角标点、分号)处结束，引号内的字符串常量除外
+_SQL_CHAR = r"(?:'[^']*'|\"[^\"]*\"|[^'\";\u3000-\u303f\u4e00-\u9fff\uff00-\uffef])"
+SQL_RE = re.compile(rf"(?is)\b(?:select|with)\b{_SQL_CHAR}*?\bfrom\b{_SQL_CHAR}*")
+TOKEN_RE = re.compile(r"[A-Za-z][A-Za-z0-9]{1,14}")
+QUOTE_ASSETS = ("USDT", "USDC", "BUSD", "BTC", "ETH")
+
+# 常见币种，数据库coin_info中的币种会在运行时补充进来
+DEFAULT_TICKERS = {"BTC", "ETH", "USDT", "USDC", "BNB", "SOL", "XRP", "DOGE", "ADA", "DAI",
+                   "LINK", "UNI", "MATIC", "WBTC", "WETH", "SHIB", "AAVE", "ARB", "OP", "LDO"}
+DEFAULT_COIN_NAMES = {"比特币": "BTC", "以太坊": "ETH", "以太币": "ETH", "泰达币": "USDT",
+                      "bitcoin": "BTC", "ethereum": "ETH", "tether": "USDT"}
+
+# 请求类型 -> [(关键词, 权重)]
+KEYWORD_TABLE = {
+    "trade_operation": [("买入", 2), ("卖出", 2), ("购买", 2), ("出售", 2), ("下单", 2), ("兑换", 1.5),
+                        ("转账", 2), ("提币", 1.5), ("买", 1), ("卖", 1), ("buy", 2), ("sell", 2), ("swap", 1.5)],
+    "set_alarm": [("警报", 2), ("报警", 2), ("预警", 2), ("提醒我", 2), ("通知我", 2), ("监控", 1),
+                  ("alert", 2), ("alarm", 2)],
+    "whale_analysis": [("鲸鱼", 2), ("巨鲸", 2), ("大户", 1.5), ("whale", 2)],
+    "contract_analysis": [("合约", 2), ("contract", 2)],
+    "transaction_analysis": [("高频", 2), ("频繁", 1.5), ("提款", 2), ("提现", 2), ("交易所流出", 2),
+                             ("withdraw", 2)],
+    "market_analysis": [("市场", 1.5), ("行情", 2), ("大盘", 2), ("market", 1.5)],
+    "coin_info": [("价格", 1), ("介绍", 1.5), ("是什么", 1.5), ("基本信息", 2), ("币种信息", 2),
+                  ("price", 1)]
+}
+
+# 交易动作关键词；转账、提币不是买卖，动作交给LLM判断
+TRADE_ACTIONS = [("卖出", "sell"), ("出售", "sell"), ("sell", "sell"), ("卖", "sell"),
+                 ("兑换", "swap"), ("swap", "swap"), ("授权", "approve"), ("approve", "approve"),
+                 ("买入", "buy"), ("购买", "buy"), ("buy", "buy"), ("买", "buy"),
+                 ("转账", None), ("提币", None), ("transfer", None), ("withdraw", None)]
+NEGATIONS = ("不要", "不想", "别", "不", "勿", "don't", "dont", "do not", "not", "never")
+MIXED_TRADE_WORDS = ("买卖", "buy and sell", "buy/sell")
+
+# 会产生真实副作用的请求类型，即使规则很确定也必须经过LLM确认
+LLM_ONLY_TYPES = ("trade_operation",)
+
+class FastRouter:
+    """
+    基于规则的快速意图路由：用正则识别地址/交易哈希/SQL，用币种字典识别币种，
+    用关键词表识别交易、警报等意图，给出置信度；置信度足够高时可跳过LLM分类
+    """
+
+    def __init__(self, threshold=0.8, tickers=None, coin_names=None, sql_validator=None):
+        """
+        参数:
+        threshold (float): 跳过LLM所需的最低置信度
+        tickers (iterable, 可选): 初始币种符号
+        coin_names (dict, 可选): 币种名称 -> 符号
+        sql_validator (callable, 可选): 校验提取出的SQL，返回False时不使用该SQL
+        """
+        self.threshold = threshold
+        self.sql_validator = sql_validator
+        self._lock = threading.Lock()
+        self.tickers = set(tickers or DEFAULT_TICKERS)
+        self.coin_names = dict(coin_names or DEFAULT_COIN_NAMES)
+        self.stats = {"routed": 0, "fast_path": 0, "llm_fallback": 0, "slot_hits": 0, "slot_misses": 0}
+
+    def update_tickers(self, coins):
+        """
+        补充币种字典
+
+        参数:
+        coins (iterable): 币种符号，或 (符号, 名称) 元组
+        """
+        with self._lock:
+            for coin in coins:
+                symbol, name = coin if isinstance(coin, (tuple, list)) else (coin, None)
+                if not symbol:
+                    continue
+                symbol = str(symbol).upper()
+                self.tickers.add(symbol)
+                if name:
+                    self.coin_names[str(name).lower()] = symbol
+
+    def load_tickers(self, api_caller):
+        """从coin_info表加载币种字典"""
+        rows = api_caller.execute_sql("SELECT symbol, name FROM coin_info")
+        if isinstance(rows, list):
+            self.update_tickers([(row["symbol"], row["name"]) for row in rows])
+
+    def extract_entities(self, query):
+        """
+        从查询中提取实体
+
+        返回:
+        dict: addresses, tx_hashes, tickers(按出现顺序), pairs, sql
+        """
+        tx_hashes = TX_HASH_RE.findall(query)
+        addresses = ADDRESS_RE.findall(query)
+        sql = self._extract_sql(query)
+
+        with self._lock:
+            tickers = []
+            pairs = []
+            for token in TOKEN_RE.findall(query):
+                upper = token.upper()
+                if upper in self.tickers:
+                    if upper not in tickers:
+                        tickers.append(upper)
+                    continue
+                # ETHUSDT之类的交易对
+                for quote in QUOTE_ASSETS:
+                    base = upper[:-len(quote)]
+                    if upper.endswith(quote) and base in self.tickers:
+                        pairs.append(upper)
+                        if base not in tickers:
+                            tickers.append(base)
+                        break
+            lowered = query.lower()
+            for name, symbol in self.coin_names.items():
+                if name in lowered and symbol not in tickers:
+                    tickers.append(symbol)
+
+        return {
+            "addresses": addresses,
+            "tx_hashes": tx_hashes,
+            "tickers": tickers,
+            "pairs": pairs,
+            "sql": sql
+        }
+
+    def _extract_sql(self, query):
+        """提取查询中的SQL语句，不完整或校验失败时返回None"""
+        match = SQL_RE.search(query)
+        # 停在未闭合的引号前说明语句不完整
+        if not match or query[match.end():].startswith(("'", '"')):
+            return None
+        sql = match.group(0).strip().rstrip(",.")
+        if not sqlite3.complete_statement(sql + ";"):
+            return None
+        if self.sql_validator is not None:
+            try:
+                if not self.sql_validator(sql):
+                    return None
+            except Exception:
+                return None
+        return sql
+
+    @staticmethod
+    def _trade_action(query):
+        """
+        识别明确的交易动作：被否定的关键词忽略，出现多个不同动作(如"买卖")
+        或转账、提币时返回None
+        """
+        lowered = query.lower()
+        if any(word in lowered for word in MIXED_TRADE_WORDS):
+            return None
+        actions = set()
+        matched = []
+        for keyword, action in TRADE_ACTIONS:
+            for found in re.finditer(re.escape(keyword), lowered):
+                start, end = found.span()
+                # "买入"已匹配时跳过其中的"买"
+                if any(s <= start and end <= e for s, e in matched):
+                    continue
+                matched.append((start, end))
+                prefix = lowered[max(0, start - 6):start].rstrip()
+                if prefix.endswith(NEGATIONS):
+                    continue
+                actions.add(action)
+        if len(actions) != 1:
+            return None
+        return actions.pop()
+
+    def _score_keywords(self, query):
+        """按关键词表为各请求类型打分"""
+        lowered = query.lower()
+        scores = {}
+        for request_type, keywords in KEYWORD_TABLE.items():
+            score = sum(weight for keyword, weight in keywords if keyword in lowered)
+            if score > 0:
+                scores[request_type] = score
+        # 警报请求通常同时描述触发的话题(鲸鱼、价格等)，警报意图优先
+        if "set_alarm" in scores:
+            scores["set_alarm"] += 1
+        return scores
+
+    def route(self, query):
+        """
+        对查询做规则路由
+
+        返回:
+        dict: request_type(无法判断时为None)、parameters、confidence、entities
+        """
+        entities = self.extract_entities(query)
+        request_type, parameters, confidence = self._classify(query, entities)
+
+        with self._lock:
+            self.stats["routed"] += 1
+            if self._is_confident(request_type, confidence):
+                self.stats["fast_path"] += 1
+            else:
+                self.stats["llm_fallback"] += 1
+
+        return {
+            "request_type": request_type,
+            "parameters": parameters,
+            "confidence": confidence,
+            "entities": entities
+        }
+
+    def _classify(self, query, entities):
+        """根据实体和关键词判断请求类型并填充参数"""
+        # 直接给出SQL语句
+        if entities["sql"] and not self._score_keywords(query).get("set_alarm"):
+            return "sql_query", {"sql": entities["sql"]}, 0.95
+
+        scores = self._score_keywords(query)
+        if not scores:
+            if entities["tickers"] and len(query.strip()) <= 12:
+                # 只有一个币种名，如 "ETH" 或 "比特币?"
+                return "coin_info", {"coin": entities["tickers"][0]}, 0.85
+            return None, {}, 0.0
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        request_type, best = ranked[0]
+        runner_up = ranked[1][1] if len(ranked) > 1 else 0
+        # 分差越大越确定，出现同分时只作为LLM的提示
+        margin = (best - runner_up) / best
+        confidence = 0.5 + 0.25 * min(best, 2) / 2 + 0.2 * margin
+
+        parameters = {}
+        if request_type == "trade_operation":
+            lowered = query.lower()
+            action = self._trade_action(query)
+            if action:
+                parameters["action"] = action
+            parameters["target"] = "dex" if ("dex" in lowered or "uniswap" in lowered) else "cex"
+            symbol = entities["pairs"][0] if entities["pairs"] else (entities["tickers"][0] if entities["tickers"] else None)
+            if symbol:
+                parameters["symbol"] = symbol
+                base = entities["tickers"][0]
+                amount = re.search(rf"(\d+(?:\.\d+)?)\s*(?:个|枚)?\s*{re.escape(base)}", query, re.IGNORECASE)
+                if amount:
+                    parameters["quantity"] = amount.group(1)
+            else:
+                confidence -= 0.1
+        elif request_type in ("whale_analysis", "coin_info"):
+            if entities["tickers"]:
+                parameters["coin"] = entities["tickers"][0]
+            elif request_type == "coin_info":
+                confidence -= 0.2
+        elif request_type == "contract_analysis":
+            if entities["addresses"]:
+                parameters["address"] = entities["addresses"][0]
+            else:
+                confidence -= 0.2
+        elif request_type == "transaction_analysis":
+            lowered = query.lower()
+            if any(keyword in lowered for keyword in ("高频", "频繁")):
+                parameters["analysis_type"] = "high_freq"
+            elif any(keyword in lowered for keyword in ("提款", "提现", "交易所流出", "withdraw")):
+                parameters["analysis_type"] = "cex_withdrawal"
+            if entities["addresses"]:
+                parameters["address"] = entities["addresses"][0]
+        elif request_type == "set_alarm" and entities["sql"]:
+            parameters["condition"] = entities["sql"]
+
+        return request_type, parameters, round(max(0.0, min(confidence, 1.0)), 3)
+
+    def extract_slot(self, request_type, slot_name, query):
+        """
+        用规则提取单个参数，提取不到返回None
+
+        参数:
+        request_type (str): 请求类型
+        slot_name (str): 参数名
+        query (str): 用户原始请求
+        """
+        entities = self.extract_entities(query)
+        value = None
+        if slot_name == "coin" and entities["tickers"]:
+            value = entities["tickers"][0]
+        elif slot_name == "address" and entities["addresses"]:
+            value = entities["addresses"][0]
+        elif slot_name in ("sql", "condition") and entities["sql"]:
+            value = entities["sql"]
+        elif slot_name == "action" and request_type == "trade_operation":
+            value = self._trade_action(query)
+        elif slot_name == "analysis_type" or slot_name == "symbol":
+            value = self._classify(query, entities)[1].get(slot_name)
+
+        with self._lock:
+            self.stats["slot_hits" if value is not None else "slot_misses"] += 1
+        return value
+
+    def _is_confident(self, request_type, confidence):
+        return (request_type is not None and request_type not in LLM_ONLY_TYPES
+                and confidence >= self.threshold)
+
+    def is_confident(self, route):
+        """判断路由结果是否可以跳过LLM(交易操作总是交给LLM确认)"""
+        return self._is_confident(route["request_type"], route["confidence"])
+
+    def get_stats(self):
+        """获取命中统计"""
+        with self._lock:
+            stats = dict(self.stats)
+        stats["hit_rate"] = stats["fast_path"] / stats["routed"] if stats["routed"] else 0.0
+        return stats
@@ -1,13 +1,18 @@
 from base_agent import BaseAgent
-from collections import defaultdict
+from frequency_window import SlidingWindowCounter
 import json
+import time
 
 class FreqTxAgent(BaseAgent):
     def __init__(self):
         super().__init__(name="FreqTxAgent")
         self.data_clean_agent = None
         self.latest_info = {}
-        self.transaction_history = defaultdict(list)  # 地址 -> 交易列表
+        # 滑动窗口内按地址统计交易频率(按哈希去重，内存随窗口有界)
+        self.frequency_window = SlidingWindowCounter(
+            window_seconds=float(self.config.get("FREQ_WINDOW_SECONDS", "3600")),
+            max_recent_per_address=int(self.config.get("FREQ_RECENT_PER_ADDRESS", "20"))
+        )
         self.frequency_threshold = 5  # 短时间内超过这个数量视为高频
     
     def set_data_clean_agent(self, agent):
@@ -98,7 +103,7 @@ class FreqTxAgent(BaseAgent):
             sample_addresses = frequent_addresses[:3]
         else:
             # 使用指定的地址
-            if address in self.transaction_history:
+            if self.frequency_window.count(address) > 0:
                 sample_addresses = [address]
             else:
                 return {"status": "warning", "message": f"地址 {address} 没有交易记录"}
@@ -106,11 +111,10 @@ class FreqTxAgent(BaseAgent):
         # 构建地址交易数据
         address_data = []
         for addr in sample_addresses:
-            txs = self.transaction_history[addr]
             address_data.append({
                 "address": addr,
-                "transaction_count": len(txs),
-                "recent_transactions": txs[:5]  # 最近5笔交易
+                "transaction_count": self.frequency_window.count(addr),
+                "recent_transactions": self.frequency_window.recent(addr, 5)  # 最近5笔交易
             })
         
         # 使用LLM分析高频交易行为
@@ -128,7 +132,7 @@ class FreqTxAgent(BaseAgent):
         请返回你的分析结果，格式为<o>分析结果</o>
         """
         
-        analysis_result = self.call_llm(analysis_prompt)
+        analysis_result = self.call_llm(analysis_prompt, use_cache=False)
         extracted_analysis = self.extract_output(analysis_result)
         
         return {
@@ -183,7 +187,7 @@ class FreqTxAgent(BaseAgent):
             transactions = result
             self.log_action("获取交易数据", f"共 {len(transactions)} 条")
             
-            # 更新交易历史
+            # 更新滑动窗口(重复拉取的交易按哈希去重)
             for tx in transactions:
                 if not isinstance(tx, dict):
                     self.log_action("警告", f"交易不是字典，而是 {type(tx)}")
@@ -191,39 +195,41 @@ class FreqTxAgent(BaseAgent):
                 
                 from_addr = tx.get("from", "")
                 to_addr = tx.get("to", "")
+                tx_hash = tx.get("hash", "")
+                timestamp = int(tx["timeStamp"]) if str(tx.get("timeStamp", "")).isdigit() else time.time()
                 
+                records = []
                 if from_addr:
-                    tx_data = {
-                        "hash": tx.get("hash", ""),
+                    records.append((from_addr, {
+                        "hash": tx_hash,
                         "to": to_addr,
                         "value": tx.get("value", "0"),
                         "timeStamp": tx.get("timeStamp", ""),
                         "blockNumber": tx.get("blockNumber", ""),
                         "type": "send"
-                    }
-                    self.transaction_history[from_addr].append(tx_data)
+                    }))
                 
                 if to_addr:
-                    tx_data = {
-                        "hash": tx.get("hash", ""),
+                    records.append((to_addr, {
+                        "hash": tx_hash,
                         "from": from_addr,
                         "value": tx.get("value", "0"),
                         "timeStamp": tx.get("timeStamp", ""),
                         "blockNumber": tx.get("blockNumber", ""),
                         "type": "receive"
-                    }
-                    self.transaction_history[to_addr].append(tx_data)
+                    }))
+                
+                self.frequency_window.add(tx_hash, timestamp, records)
             
             # 找出频繁交易的地址
             frequent_addresses = self._get_frequent_addresses()
             
             # 为每个高频地址添加数据
             for addr in frequent_addresses:
-                txs = self.transaction_history[addr]
                 freq_tx_data["frequent_addresses"].append({
                     "address": addr,
-                    "transaction_count": len(txs),
-                    "recent_transactions": txs[:10]  # 最近10笔交易
+                    "transaction_count": self.frequency_window.count(addr),
+                    "recent_transactions": self.frequency_window.recent(addr, 10)  # 最近10笔交易
                 })
             
             self.log_action("频繁交易地址", f"共 {len(freq_tx_data['frequent_addresses'])} 个")
@@ -233,16 +239,5 @@ class FreqTxAgent(BaseAgent):
         return freq_tx_data
     
     def _get_frequent_addresses(self):
-        """获取交易频繁的地址列表"""
-        # 计算每个地址的交易频率
-        address_frequency = {}
-        for addr, txs in self.transaction_history.items():
-            address_frequency[addr] = len(txs)
-        
-        # 按交易频率降序排序
-        sorted_addresses = sorted(address_frequency.items(), key=lambda x: x[1], reverse=True)
-        
-        # 过滤出交易频率超过阈值的地址
-        frequent_addresses = [addr for addr, freq in sorted_addresses if freq >= self.frequency_threshold]
-        
-        return frequent_addresses 
\ No newline at end of file
+        """获取交易频繁的地址列表(按窗口内交易数降序)"""
+        return self.frequency_window.top(min_count=self.frequency_threshold)
@@ -0,0 +1,125 @@
+import heapq
+import itertools
+from collections import deque
+
+class SlidingWindowCounter:
+    """
+    滑动时间窗口内的地址交易频率统计：
+    - 按交易哈希去重，重复拉取的交易不会被重复计数
+    - 窗口以已观察到的最新交易时间为基准，过期事件自动移出
+    - 每个地址只保留最近N笔交易(环形缓冲区)，内存随窗口有界
+    - 惰性维护的最大堆用于取Top-K，每个事件O(log n)
+    """
+
+    def __init__(self, window_seconds=3600, max_recent_per_address=20):
+        """
+        参数:
+        window_seconds (float): 时间窗口长度(秒)
+        max_recent_per_address (int): 每个地址保留的最近交易数
+        """
+        self.window_seconds = window_seconds
+        self.max_recent_per_address = max_recent_per_address
+        self._events = []  # 最小堆: (timestamp, seq, tx_hash, addresses)
+        self._seq = itertools.count()
+        self._seen = set()  # 窗口内已计数的交易哈希
+        self._counts = {}  # 地址 -> 窗口内交易数
+        self._recent = {}  # 地址 -> deque(最近交易)
+        self._top_heap = []  # 最大堆(取负): (-count, address)，惰性失效
+        self.watermark = 0  # 已观察到的最新交易时间
+
+    def add(self, tx_hash, timestamp, records):
+        """
+        记录一笔交易
+
+        参数:
+        tx_hash (str): 交易哈希
+        timestamp (float): 交易时间
+        records (list): [(地址, 交易记录dict), ...]，通常为发送方和接收方
+
+        返回:
+        bool: 是否为新交易(未被去重)
+        """
+        if not tx_hash or tx_hash in self._seen:
+            return False
+
+        self.watermark = max(self.watermark, timestamp)
+        if timestamp < self.watermark - self.window_seconds:
+            return False
+
+        addresses = []
+        for address, record in records:
+            if not address:
+                continue
+            addresses.append(address)
+            self._counts[address] = self._counts.get(address, 0) + 1
+            recent = self._recent.get(address)
+            if recent is None:
+                recent = deque(maxlen=self.max_recent_per_address)
+                self._recent[address] = recent
+            recent.append((timestamp, record))
+            heapq.heappush(self._top_heap, (-self._counts[address], address))
+
+        self._seen.add(tx_hash)
+        heapq.heappush(self._events, (timestamp, next(self._seq), tx_hash, tuple(addresses)))
+        self._expire()
+        return True
+
+    def _expire(self):
+        """移出窗口外的事件"""
+        cutoff = self.watermark - self.window_seconds
+        while self._events and self._events[0][0] < cutoff:
+            _, _, tx_hash, addresses = heapq.heappop(self._events)
+            self._seen.discard(tx_hash)
+            for address in addresses:
+                count = self._counts.get(address, 0) - 1
+                if count <= 0:
+                    self._counts.pop(address, None)
+                    self._recent.pop(address, None)
+                else:
+                    self._counts[address] = count
+                    heapq.heappush(self._top_heap, (-count, address))
+
+        # 失效条目过多时重建堆，保证堆大小与活跃地址数同阶
+        if len(self._top_heap) > 4 * len(self._counts) + 64:
+            self._top_heap = [(-count, address) for address, count in self._counts.items()]
+            heapq.heapify(self._top_heap)
+
+    def count(self, address):
+        """获取地址在窗口内的交易数"""
+        return self._counts.get(address, 0)
+
+    def recent(self, address, limit=10):
+        """获取地址在窗口内最近的交易(新的在前)"""
+        cutoff = self.watermark - self.window_seconds
+        recent = self._recent.get(address, ())
+        records = [record for timestamp, record in reversed(recent) if timestamp >= cutoff]
+        return records[:limit]
+
+    def top(self, min_count=1, limit=None):
+        """
+        获取交易数不低于min_count的地址，按交易数降序
+
+        返回:
+        list: 地址列表
+        """
+        result = []
+        valid_entries = []
+        emitted = set()
+        while self._top_heap:
+            neg_count, address = self._top_heap[0]
+            if -neg_count < min_count or (limit is not None and len(result) >= limit):
+                break
+            heapq.heappop(self._top_heap)
+            # 跳过计数已变化的过期条目
+            if self._counts.get(address) != -neg_count or address in emitted:
+                continue
+            emitted.add(address)
+            result.append(address)
+            valid_entries.append((neg_count, address))
+
+        for entry in valid_entries:
+            heapq.heappush(self._top_heap, entry)
+        return result
+
+    def __len__(self):
+        return len(self._counts)
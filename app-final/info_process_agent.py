@@ -1,11 +1,53 @@
-from base_agent import BaseAgent
+from async_agent import AsyncBaseAgent
+from api_caller import get_http_timeout
+from snapshot_cache import SnapshotCache
+from single_flight import SingleFlight
+from block_cursor import BlockCursorStore, fetch_incremental, merge_window
+from rate_limiter import background_priority, submit_with_context
+from specific_coin_whale_agent import ERC20_TRANSFER_SELECTOR
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+import asyncio
 import time
 import json
+import threading
+
+class InfoProcessAgent(AsyncBaseAgent):
+    """
+    信息处理代理：运行在异步运行时上，快照并发分发给各专业代理；
+    数据获取仍使用同步API调用器(限流、游标)，在专用线程池中执行
+    """
 
-class InfoProcessAgent(BaseAgent):
     def __init__(self):
         super().__init__(name="InfoProcessAgent")
         self.target_agents = []
+        # 获取和刷新请求使用各自的有界线程池：超时后仍在运行的获取任务无法取消，
+        # 等待同一次刷新的请求也不能占满分发所需的线程。默认等待时间与单次HTTP请求的超时一致
+        self.fetch_timeout = float(self.config.get("INFO_FETCH_TIMEOUT", sum(get_http_timeout())))
+        self.delivery_timeout = float(self.config.get("INFO_DELIVERY_TIMEOUT", "120"))
+        max_workers = int(self.config.get("INFO_MAX_WORKERS", "8"))
+        self.fetch_executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="info-fetch")
+        self.request_executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="info-request")
+        # 按数据类别设置TTL的快照缓存，用户请求读取快照，仅在过期时等待刷新
+        self.snapshot_cache = SnapshotCache({
+            "market_info": float(self.config.get("SNAPSHOT_TTL_MARKET_INFO", "30")),
+            "transaction_info": float(self.config.get("SNAPSHOT_TTL_TRANSACTION_INFO", "60")),
+            "whale_activity": float(self.config.get("SNAPSHOT_TTL_WHALE_ACTIVITY", "60")),
+            "contract_activity": float(self.config.get("SNAPSHOT_TTL_CONTRACT_ACTIVITY", "120")),
+            "coin_info": float(self.config.get("SNAPSHOT_TTL_COIN_INFO", "60"))
+        })
+        self.refresh_flight = SingleFlight()
+        self.refresh_lock = threading.Lock()
+        # 增量拉取：每个数据流记录区块高水位，只获取新交易
+        self.cursor_store = BlockCursorStore(self.api_caller)
+        self.ingest_page_size = int(self.config.get("INGEST_PAGE_SIZE", "100"))
+        self.ingest_max_pages = int(self.config.get("INGEST_MAX_PAGES", "10"))
+        # 快照展示每个数据流最近的交易窗口；游标在快照成功分发后才确认
+        self.tx_window_size = int(self.config.get("INGEST_WINDOW_SIZE", "100"))
+        self.tx_windows = {}
+        self.pending_cursors = {}
+        self.cursor_lock = threading.Lock()
+        self.refresh_running = False
+        self.refresh_thread = None
     
     def register_agent(self, agent):
         """注册接收信息的Agent"""
@@ -13,43 +55,177 @@ class InfoProcessAgent(BaseAgent):
             self.target_agents.append(agent)
             self.log_action("注册代理", f"{agent.name}")
     
-    def receive_message(self, message):
+    async def receive_message(self, message):
         """接收消息"""
         self.log_action("接收消息", f"类型: {message['type']}")
         if message["type"] == "request_info_update":
-            return self.update_info()
+            return await self._run_blocking(self.update_info)
+        elif message["type"] == "request_info_snapshot":
+            return await self._run_blocking(self.ensure_fresh_snapshot)
         return {"status": "error", "message": "未支持的消息类型"}
     
+    async def _run_blocking(self, fn):
+        """刷新会阻塞等待数据获取，在请求线程池中执行，不占用事件循环"""
+        return await asyncio.wrap_future(submit_with_context(self.request_executor, fn))
+    
     def update_info(self):
-        """更新信息并分发给已注册的代理"""
-        self.log_action("开始更新信息")
-        # 获取市场信息
-        market_info = self._fetch_market_info()
-        transaction_info = self._fetch_transaction_info()
-        whale_activity = self._fetch_whale_activity()
-        contract_activity = self._fetch_contract_activity()
-        coin_info = self._fetch_coin_info()
-        
-        # 整合所有信息
-        all_info = {
-            "market_info": market_info,
-            "transaction_info": transaction_info,
-            "whale_activity": whale_activity,
-            "contract_activity": contract_activity,
-            "coin_info": coin_info,
-            "timestamp": time.time()
+        """强制更新全部信息并分发给已注册的代理"""
+        return self._refresh(force=True)
+    
+    def ensure_fresh_snapshot(self):
+        """快照新鲜时直接返回，过期时等待(或加入进行中的)刷新"""
+        if self.snapshot_cache.is_fresh():
+            return {"status": "success", "message": "使用缓存的市场信息快照", "refreshed": []}
+        return self._refresh(force=False)
+    
+    def get_snapshot(self):
+        """获取最新的市场信息快照"""
+        return self.snapshot_cache.snapshot()
+    
+    def _refresh(self, force=False):
+        """
+        刷新过期的数据类别：相同模式的并发刷新合并为一次，
+        强制刷新不并入进行中的普通刷新(后者会跳过未过期的类别)，同一时间只有一个刷新在执行
+        """
+        return self.refresh_flight.do(("refresh", force), self._refresh_serialized, force)
+    
+    def _refresh_serialized(self, force):
+        """串行执行刷新，避免并发刷新重复拉取和分发"""
+        with self.refresh_lock:
+            return self._do_refresh(force)
+    
+    def _do_refresh(self, force):
+        """获取过期数据、合并到快照并分发"""
+        fetchers = {
+            "market_info": self._fetch_market_info,
+            "transaction_info": self._fetch_transaction_info,
+            "whale_activity": self._fetch_whale_activity,
+            "contract_activity": self._fetch_contract_activity,
+            "coin_info": self._fetch_coin_info
         }
+        families = list(fetchers.keys()) if force else self.snapshot_cache.stale_families()
+        if not families:
+            return {"status": "success", "message": "市场信息快照已是最新", "refreshed": []}
+        
+        self.log_action("开始更新信息", f"数据类别: {families}")
+        # 并行获取市场信息，整体耗时取决于最慢的数据源
+        results = self._fetch_all({key: fetchers[key] for key in families})
+        with self.cursor_lock:
+            pending, self.pending_cursors = self.pending_cursors, {}
+        self.snapshot_cache.update(results)
         
-        # 向所有注册的Agent分发信息
+        # 并行向所有注册的Agent分发合并后的快照
+        if self._distribute(self.snapshot_cache.snapshot()):
+            for cursor in pending.values():
+                self.cursor_store.commit(cursor)
+        else:
+            # 分发未完成时不移动游标，下次刷新重新拉取这批交易
+            with self.cursor_lock:
+                for stream, cursor in pending.items():
+                    self.pending_cursors.setdefault(stream, cursor)
+        
+        return {"status": "success", "message": "信息已更新并分发", "refreshed": families}
+    
+    def start_background_refresh(self, interval=None):
+        """启动后台刷新线程，定期刷新过期的数据类别"""
+        if self.refresh_running:
+            return {"status": "warning", "message": "后台刷新已经在运行"}
+        
+        interval = interval or float(self.config.get("SNAPSHOT_REFRESH_INTERVAL", "0"))
+        if interval <= 0:
+            return {"status": "error", "message": "无效的后台刷新间隔"}
+        
+        self.refresh_running = True
+        self.refresh_thread = threading.Thread(target=self._refresh_loop, args=(interval,))
+        self.refresh_thread.daemon = True
+        self.refresh_thread.start()
+        
+        return {"status": "success", "message": f"后台刷新已启动，间隔 {interval} 秒"}
+    
+    def stop_background_refresh(self):
+        """停止后台刷新线程"""
+        if not self.refresh_running:
+            return {"status": "warning", "message": "后台刷新未在运行"}
+        
+        self.refresh_running = False
+        if self.refresh_thread and self.refresh_thread.is_alive():
+            self.refresh_thread.join(timeout=1.0)
+        
+        return {"status": "success", "message": "后台刷新已停止"}
+    
+    def _refresh_loop(self, interval):
+        """后台刷新循环"""
+        while self.refresh_running:
+            try:
+                # 后台刷新的上游调用让行于用户请求
+                with background_priority():
+                    self._refresh(force=False)
+            except Exception as e:
+                self.log_action("错误", f"后台刷新失败: {str(e)}")
+            time.sleep(interval)
+    
+    def _fetch_all(self, fetchers):
+        """并行执行数据获取，超时或失败的数据源返回错误信息(部分结果)"""
+        start = time.time()
+        futures = {key: submit_with_context(self.fetch_executor, fetch) for key, fetch in fetchers.items()}
+        
+        results = {}
+        for key, future in futures.items():
+            # 每个数据源可单独配置超时，如 INFO_FETCH_TIMEOUT_WHALE_ACTIVITY
+            timeout = float(self.config.get(f"INFO_FETCH_TIMEOUT_{key.upper()}", self.fetch_timeout))
+            try:
+                results[key] = future.result(timeout=max(0, start + timeout - time.time()))
+            except FuturesTimeoutError:
+                # 已开始运行的任务无法取消，会在获取线程池中继续运行，
+                # 其中每次HTTP请求都受HTTP_CONNECT_TIMEOUT/HTTP_READ_TIMEOUT限制，不会永久占用线程
+                future.cancel()
+                self.log_action("警告", f"{key} 获取超时({timeout}秒)")
+                results[key] = {"error": f"获取{key}超时"}
+            except Exception as e:
+                self.log_action("错误", f"{key} 获取失败: {str(e)}")
+                results[key] = {"error": f"获取{key}失败: {str(e)}"}
+        return results
+    
+    def _distribute(self, all_info):
+        """向所有注册的代理分发信息(在异步运行时中并发执行)，全部成功送达时返回True"""
+        return self.runtime.run(self._distribute_async(all_info))
+    
+    async def _distribute_async(self, all_info):
+        """并发向所有注册的代理分发信息：异步代理直接投递到邮箱，同步代理在线程中调用"""
         self.log_action("分发信息", f"给 {len(self.target_agents)} 个代理")
+        if not self.target_agents:
+            return True
+        tasks = {}
         for agent in self.target_agents:
+            message = self.create_mcp_message("info_update", all_info)
+            tasks[asyncio.ensure_future(self.send_message_async(agent, message))] = agent
+        
+        done, not_done = await asyncio.wait(tasks.keys(), timeout=self.delivery_timeout)
+        delivered = not not_done
+        for task in done:
             try:
-                message = self.create_mcp_message("info_update", all_info)
-                self.send_message(agent, message)
+                task.result()
             except Exception as e:
-                self.log_action("错误", f"向 {agent.name} 分发信息失败: {str(e)}")
-        
-        return {"status": "success", "message": "信息已更新并分发"}
+                delivered = False
+                self.log_action("错误", f"向 {tasks[task].name} 分发信息失败: {str(e)}")
+        for task in not_done:
+            self.log_action("警告", f"向 {tasks[task].name} 分发信息超时，继续在后台处理")
+        return delivered
+    
+    def _fetch_window(self, stream, params):
+        """增量拉取新交易并合并到该数据流的最近交易窗口，游标待分发成功后确认"""
+        response, pending = fetch_incremental(
+            self.api_caller, self.cursor_store, stream, "txlist", params,
+            page_size=self.ingest_page_size, max_pages=self.ingest_max_pages
+        )
+        if not isinstance(response.get("result"), list):
+            return response
+        with self.cursor_lock:
+            window = merge_window(self.tx_windows.get(stream, []), response["result"], self.tx_window_size)
+            self.tx_windows[stream] = window
+            if pending:
+                self.pending_cursors[stream] = pending
+        return {"status": "1", "message": "OK", "result": window}
     
     def process(self, data=None):
         """处理数据请求"""
@@ -92,18 +268,14 @@ class InfoProcessAgent(BaseAgent):
             }
             latest_block = self.api_caller.call_blockchain_api("eth_blockNumber", block_params)
             
-            # 获取最新交易
+            # 获取上次游标之后的新交易，合并到最近交易窗口
+            address = "0xaa7a9ca87d3694b5755f213b5d04094b8d0f0a6f" # 示例地址，可以更改
             tx_params = {
                 "module": "account",
                 "action": "txlist",
-                "address": "0xaa7a9ca87d3694b5755f213b5d04094b8d0f0a6f", # 示例地址，可以更改
-                "startblock": "0",
-                "endblock": "99999999",
-                "sort": "desc",
-                "page": "1",
-                "offset": "10"
+                "address": address
             }
-            latest_transactions = self.api_caller.call_blockchain_api("txlist", tx_params)
+            latest_transactions = self._fetch_window(f"txlist:{address}", tx_params)
             
             # 由于缺少真实的API密钥，可能会返回错误，这里提供模拟数据
             if "error" in latest_transactions or (isinstance(latest_transactions, dict) and "result" in latest_transactions and latest_transactions["result"] == "Error! Invalid API Key"):
@@ -147,15 +319,12 @@ class InfoProcessAgent(BaseAgent):
         """获取大额交易活动"""
         self.log_action("获取大额交易活动")
         try:
-            # 获取最近的大额交易
+            # 获取上次游标之后的新交易，合并到最近交易窗口
             whale_params = {
                 "module": "account",
-                "action": "txlist",
-                "sort": "desc",
-                "page": "1",
-                "offset": "50"
+                "action": "txlist"
             }
-            transactions = self.api_caller.call_blockchain_api("txlist", whale_params)
+            transactions = self._fetch_window("whale:txlist", whale_params)
             
             # 同样提供模拟数据
             if "error" in transactions or (isinstance(transactions, dict) and "result" in transactions and transactions["result"] == "Error! Invalid API Key"):
@@ -189,14 +358,19 @@ class InfoProcessAgent(BaseAgent):
             
             # 过滤大额交易
             whale_txs = []
+            token_transfers = []
             if "result" in transactions and isinstance(transactions["result"], list):
                 for tx in transactions["result"]:
+                    # ERC-20转账的value为0，金额在调用数据中，由鲸鱼Agent按代币精度解码后判断
+                    if (tx.get("input") or "").lower().startswith(ERC20_TRANSFER_SELECTOR):
+                        token_transfers.append(tx)
                     # 假设大于1000 ETH的交易为大额交易
-                    if float(tx.get("value", 0)) / 1e18 > 1000:
+                    elif float(tx.get("value", 0)) / 1e18 > 1000:
                         whale_txs.append(tx)
             
             return {
-                "whale_transactions": whale_txs[:10] # 仅返回前10条
+                "whale_transactions": whale_txs[:10], # 仅返回前10条
+                "token_transfers": token_transfers
             }
         except Exception as e:
             self.log_action("错误", f"获取大额交易活动失败: {str(e)}")
@@ -265,8 +439,8 @@ class InfoProcessAgent(BaseAgent):
             # 实际应用中可能需要调用其他API
             tokens = [
                 {"symbol": "ETH", "name": "Ethereum"},
-                {"symbol": "USDT", "name": "Tether USD", "contract": "0xdac17f958d2ee523a2206206994597c13d831ec7"},
-                {"symbol": "USDC", "name": "USD Coin", "contract": "0xa0b86991c6218b36c1d19d4a2e9eb0ce3606eb48"},
+                {"symbol": "USDT", "name": "Tether USD", "contract": "0xdac17f958d2ee523a2206206994597c13d831ec7", "decimals": 6},
+                {"symbol": "USDC", "name": "USD Coin", "contract": "0xa0b86991c6218b36c1d19d4a2e9eb0ce3606eb48", "decimals": 6},
                 {"symbol": "BNB", "name": "Binance Coin"},
                 {"symbol": "MATIC", "name": "Polygon"}
             ]
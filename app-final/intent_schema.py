@@ -0,0 +1,217 @@
+import json
+import re
+import time
+
+ADDRESS_PATTERN = r"^0x[0-9a-fA-F]{40}$"
+SYMBOL_PATTERN = r"^[A-Z0-9]{2,10}$"
+
+# 每种请求类型对应的参数(槽位)定义，键名与CentralAgent各处理函数读取的参数一致
+# 槽位字段: type(string/number/enum) description required default values pattern normalize
+INTENT_SCHEMAS = {
+    "market_analysis": {
+        "description": "市场分析请求",
+        "slots": {}
+    },
+    "coin_info": {
+        "description": "币种信息请求",
+        "slots": {
+            "coin": {"type": "string", "description": "币种符号，如BTC、ETH、USDT", "required": True,
+                     "pattern": SYMBOL_PATTERN, "normalize": "upper"}
+        }
+    },
+    "whale_analysis": {
+        "description": "鲸鱼活动分析请求",
+        "slots": {
+            "coin": {"type": "string", "description": "要分析的币种符号，未提到时为ETH", "required": True,
+                     "pattern": SYMBOL_PATTERN, "normalize": "upper", "default": "ETH"}
+        }
+    },
+    "contract_analysis": {
+        "description": "合约分析请求",
+        "slots": {
+            "address": {"type": "string", "description": "0x开头的智能合约地址", "required": True,
+                        "pattern": ADDRESS_PATTERN}
+        }
+    },
+    "transaction_analysis": {
+        "description": "交易分析请求(高频交易地址或交易所提款)",
+        "slots": {
+            "analysis_type": {"type": "enum", "values": ["high_freq", "cex_withdrawal"], "required": True,
+                              "description": "high_freq=高频交易地址分析，cex_withdrawal=交易所提款分析"},
+            "address": {"type": "string", "description": "要分析的具体地址，没有则为all", "required": False,
+                        "pattern": r"^(0x[0-9a-fA-F]{40}|all)$", "default": "all"}
+        }
+    },
+    "set_alarm": {
+        "description": "设置警报请求",
+        "slots": {
+            "id": {"type": "string", "description": "警报ID", "required": True,
+                   "default": lambda: f"alarm_{int(time.time())}"},
+            "description": {"type": "string", "description": "警报的自然语言描述", "required": False},
+            "condition": {"type": "string", "required": True, "pattern": r"(?is)^\s*select\b.*\bfrom\b",
+                          "description": "触发条件，一条返回结果即触发的SQLite SELECT语句，"
+                                         "可用表: whale_transactions(tx_hash, from_address, to_address, value, coin, block_number, timestamp), "
+                                         "cex_withdrawals(tx_hash, from_address, to_address, value, timestamp), "
+                                         "contract_activities(tx_hash, contract_address, contract_type, from_address, value, timestamp, block_number), "
+                                         "frequent_addresses(address, transaction_count, first_seen, last_seen), "
+                                         "coin_info(symbol, name, contract, price, market_cap, volume_24h, change_24h, description, features, last_updated)"},
+            "interval": {"type": "number", "description": "检查间隔(秒)", "required": False},
+            "cooldown": {"type": "number", "description": "触发后的冷却时间(秒)，期间不重复提醒", "required": False},
+            "debounce": {"type": "number", "description": "连续满足条件多少次检查才提醒", "required": False}
+        }
+    },
+    "trade_operation": {
+        "description": "交易操作请求(包括任何购买、出售、转账、提款币种的请求)",
+        "slots": {
+            "target": {"type": "enum", "values": ["cex", "dex"], "required": True, "default": "cex",
+                       "description": "交易场所，cex=中心化交易所，dex=去中心化交易所"},
+            "action": {"type": "enum", "values": ["buy", "sell", "approve", "swap"], "required": True,
+                       "description": "交易动作，转账、提币或无法确定时填null"},
+            "symbol": {"type": "string", "description": "交易对或币种，如ETHUSDT", "required": False,
+                       "normalize": "upper"},
+            "quantity": {"type": "number", "description": "数量", "required": False},
+            "price": {"type": "number", "description": "限价价格", "required": False},
+            "order_type": {"type": "enum", "values": ["limit", "market"], "required": False,
+                           "description": "订单类型"}
+        }
+    },
+    "sql_query": {
+        "description": "SQL查询请求",
+        "slots": {
+            "sql": {"type": "string", "required": True, "pattern": r"(?is)^\s*(select|with)\b",
+                    "description": "可直接执行的SQLite查询语句，可用表同set_alarm的condition"}
+        }
+    }
+}
+
+def _describe_slot(name, slot):
+    """生成槽位的文字说明"""
+    parts = [slot.get("description", "")]
+    if slot.get("type") == "enum":
+        parts.append(f"取值: {'/'.join(slot['values'])}")
+    elif slot.get("type") == "number":
+        parts.append("数字")
+    parts.append("必填" if slot.get("required") else "可选")
+    return f"{name}: {'，'.join(part for part in parts if part)}"
+
+def build_extraction_prompt(user_query):
+    """
+    生成一次性完成意图识别和参数提取的提示
+
+    参数:
+    user_query (str): 用户原始请求
+    """
+    type_lines = []
+    for request_type, schema in INTENT_SCHEMAS.items():
+        slot_lines = [_describe_slot(name, slot) for name, slot in schema["slots"].items()]
+        slots_text = "; ".join(slot_lines) if slot_lines else "无参数"
+        type_lines.append(f"- {request_type}: {schema['description']}。参数: {slots_text}")
+    types_text = "\n        ".join(type_lines)
+
+    return f"""
+        请分析以下用户请求，识别请求类型，并一次性提取该类型需要的全部参数。
+        你只需要识别请求类型和提取参数，不需要判断请求是否可以执行。
+
+        用户请求:
+        {user_query}
+
+        可选的请求类型及其参数:
+        {types_text}
+        - other: 其他请求。参数: 无参数
+
+        注意：所有涉及"购买"、"卖出"、"出售"、"交易"、"转账"、"提款"等操作的请求，都应该归类为trade_operation。
+        parameters中只使用上面列出的参数名；请求中没有提到的可选参数不要填写，必填参数无法确定时填null。
+
+        请以JSON格式返回，格式为<o>
+        {{
+            "request_type": "操作类型",
+            "parameters": {{
+                "参数名": "值"
+            }},
+            "additional_info": "附加信息"
+        }}
+        </o>
+        """
+
+def build_followup_prompt(request_type, slot_name, user_query):
+    """
+    生成只补全单个缺失参数的提示
+
+    参数:
+    request_type (str): 请求类型
+    slot_name (str): 缺失的参数名
+    user_query (str): 用户原始请求
+    """
+    slot = INTENT_SCHEMAS[request_type]["slots"][slot_name]
+    return f"""
+        请从以下用户请求中确定参数 {_describe_slot(slot_name, slot)}
+
+        用户请求:
+        {user_query}
+
+        请只返回该参数的值，格式为<o>参数值</o>
+        """
+
+def _coerce(slot, value):
+    """按槽位定义规范化并校验取值，不合法时返回None"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = value.strip().strip('"').strip("'").strip()
+        if value == "" or value.lower() in ("null", "none"):
+            return None
+
+    slot_type = slot.get("type", "string")
+    if slot_type == "number":
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return None
+
+    if not isinstance(value, str):
+        value = json.dumps(value, ensure_ascii=False) if isinstance(value, (dict, list)) else str(value)
+    if slot.get("normalize") == "upper":
+        value = value.upper()
+    if slot_type == "enum":
+        value = value.lower()
+        return value if value in slot["values"] else None
+    if "pattern" in slot and not re.search(slot["pattern"], value):
+        return None
+    return value
+
+def validate_slots(request_type, parameters):
+    """
+    按请求类型的schema校验参数
+
+    参数:
+    request_type (str): 请求类型
+    parameters (dict): LLM提取的参数
+
+    返回:
+    tuple: (校验后的参数dict, 缺失的必填参数列表)
+    """
+    schema = INTENT_SCHEMAS.get(request_type)
+    parameters = dict(parameters) if isinstance(parameters, dict) else {}
+    if schema is None:
+        return parameters, []
+
+    # 未在schema中声明的参数原样保留(如DEX交易的router、data)
+    validated = {name: value for name, value in parameters.items()
+                 if name not in schema["slots"] and value is not None}
+    missing = []
+    for name, slot in schema["slots"].items():
+        value = _coerce(slot, parameters.get(name))
+        if value is None and "default" in slot:
+            default = slot["default"]
+            value = default() if callable(default) else default
+        if value is None:
+            if slot.get("required"):
+                missing.append(name)
+            continue
+        validated[name] = value
+    return validated, missing
+
+def fill_slot(request_type, slot_name, raw_value):
+    """校验单个补全的参数值，不合法时返回None"""
+    slot = INTENT_SCHEMAS[request_type]["slots"][slot_name]
+    return _coerce(slot, raw_value)
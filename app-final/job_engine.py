@@ -0,0 +1,223 @@
+import itertools
+import threading
+import time
+import traceback
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+class JobCancelled(Exception):
+    """任务被取消时在任务线程中抛出"""
+    pass
+
+class Job:
+    """一个异步执行的任务"""
+
+    def __init__(self, job_id, description, owner=None):
+        self.id = job_id
+        self.description = description
+        self.owner = owner  # 提交方(如Socket.IO会话ID)，状态只推送给它
+        self.status = "queued"
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.result = None
+        self.error = None
+        self.progress = None
+        self.future = None
+        self._cancel_event = threading.Event()
+        self._cancel_lock = threading.Lock()
+        self.cancellable = True
+
+    @property
+    def cancelled(self):
+        """是否已请求取消"""
+        return self._cancel_event.is_set()
+
+    def check_cancelled(self):
+        """在任务的检查点调用，已取消时抛出JobCancelled"""
+        if self._cancel_event.is_set():
+            raise JobCancelled(self.id)
+
+    def disable_cancel(self):
+        """
+        任务即将产生副作用(如下单)时调用：已取消时抛出JobCancelled，
+        否则此后不再接受取消，任务一定执行完成并返回结果
+        """
+        with self._cancel_lock:
+            self.check_cancelled()
+            self.cancellable = False
+
+    def _request_cancel(self):
+        """请求取消，任务已不可取消时返回False"""
+        with self._cancel_lock:
+            if not self.cancellable:
+                return False
+            self._cancel_event.set()
+            return True
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "description": self.description,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "progress": self.progress,
+            "cancellable": self.cancellable,
+            "result": self.result,
+            "error": self.error
+        }
+
+class JobEngine:
+    """
+    任务执行引擎：提交后立即返回任务ID，由有界线程池执行，
+    限制排队深度，支持取消，并通过notify回调推送状态和进度
+    """
+
+    FINISHED_STATES = ("succeeded", "failed", "cancelled")
+
+    def __init__(self, max_workers=4, max_queue=50, notify=None, max_finished=500):
+        """
+        参数:
+        max_workers (int): 同时执行的任务数
+        max_queue (int): 最多排队等待的任务数，超出时拒绝提交
+        notify (callable, 可选): notify(event, payload, owner)，用于向任务的提交方推送状态
+        max_finished (int): 保留的已结束任务数
+        """
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.notify = notify
+        self.max_finished = max_finished
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()
+        self._ids = itertools.count(1)
+        self.stats = {"submitted": 0, "rejected": 0, "succeeded": 0, "failed": 0, "cancelled": 0}
+
+    def _pending_count(self):
+        return sum(1 for job in self._jobs.values() if job.status in ("queued", "running"))
+
+    def submit(self, fn, description="", owner=None):
+        """
+        提交任务
+
+        参数:
+        fn (callable): fn(job)，返回任务结果，应在适当位置调用job.check_cancelled()，
+                       产生副作用之前调用job.disable_cancel()
+        description (str): 任务描述
+        owner (可选): 提交方标识，随状态推送传给notify
+
+        返回:
+        dict: 成功时包含job_id，队列已满时返回错误
+        """
+        with self._lock:
+            if self._pending_count() >= self.max_workers + self.max_queue:
+                self.stats["rejected"] += 1
+                return {"status": "error", "message": "任务队列已满，请稍后再试"}
+            job = Job(f"job-{int(time.time())}-{next(self._ids)}", description, owner)
+            self._jobs[job.id] = job
+            self.stats["submitted"] += 1
+            self._prune()
+            job.future = self._executor.submit(self._run, job, fn)
+
+        self._notify(job)
+        return {"status": "success", "job_id": job.id}
+
+    def _run(self, job, fn):
+        """在工作线程中执行任务"""
+        with self._lock:
+            if job.status != "queued":
+                return
+            job.status = "running"
+            job.started_at = time.time()
+        self._notify(job)
+
+        try:
+            job.check_cancelled()
+            result = fn(job)
+            job.check_cancelled()
+            self._finish(job, "succeeded", result=result)
+        except JobCancelled:
+            self._finish(job, "cancelled")
+        except Exception as e:
+            print(f"❌ 任务{job.id}执行失败: {str(e)}\n{traceback.format_exc()}")
+            self._finish(job, "failed", error=str(e))
+
+    def _finish(self, job, status, result=None, error=None):
+        """记录任务结束状态"""
+        with self._lock:
+            if job.status in self.FINISHED_STATES:
+                return
+            job.status = status
+            job.result = result
+            job.error = error
+            job.finished_at = time.time()
+            self.stats[status] += 1
+        self._notify(job)
+
+    def report_progress(self, job, progress):
+        """更新并推送任务进度"""
+        job.progress = progress
+        self._notify(job)
+
+    def cancel(self, job_id):
+        """
+        取消任务：排队中的任务直接取消，运行中的任务在下一个检查点结束；
+        已开始产生副作用的任务不能取消
+
+        返回:
+        dict: 操作结果
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            return {"status": "error", "message": f"任务不存在: {job_id}"}
+        if job.status in self.FINISHED_STATES:
+            return {"status": "error", "message": f"任务已结束: {job.status}"}
+
+        if not job._request_cancel():
+            return {"status": "error", "message": "任务已开始执行操作，无法取消"}
+        if job.future is not None and job.future.cancel():
+            self._finish(job, "cancelled")
+        return {"status": "success", "message": f"已请求取消任务 {job_id}"}
+
+    def get(self, job_id):
+        """获取任务状态，不存在时返回None"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job.to_dict() if job is not None else None
+
+    def get_stats(self):
+        """获取队列统计"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats["queued"] = sum(1 for job in self._jobs.values() if job.status == "queued")
+            stats["running"] = sum(1 for job in self._jobs.values() if job.status == "running")
+        stats["max_workers"] = self.max_workers
+        stats["max_queue"] = self.max_queue
+        return stats
+
+    def _prune(self):
+        """丢弃最早结束的任务记录"""
+        finished = [job_id for job_id, job in self._jobs.items() if job.status in self.FINISHED_STATES]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job_id]
+
+    def _notify(self, job):
+        """推送任务状态"""
+        if self.notify is None:
+            return
+        try:
+            self.notify("job_update", job.to_dict(), job.owner)
+        except Exception as e:
+            print(f"❌ 推送任务状态失败: {str(e)}")
+
+    def shutdown(self, wait=False):
+        """停止接收任务并取消排队中的任务"""
+        with self._lock:
+            jobs = list(self._jobs.values())
+        for job in jobs:
+            if job.status in ("queued", "running"):
+                self.cancel(job.id)
+        self._executor.shutdown(wait=wait)
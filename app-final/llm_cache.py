@@ -0,0 +1,156 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+class LLMCache:
+    """
+    LLM响应缓存：以(模型, 规范化后的prompt)为键，
+    内存LRU层 + 可选的SQLite磁盘层，支持TTL和容量上限
+    """
+
+    def __init__(self, max_entries=1024, ttl=3600, db_path=None, max_disk_entries=100000):
+        """
+        参数:
+        max_entries (int): 内存层最大条目数
+        ttl (float): 缓存有效期(秒)，<=0表示永不过期
+        db_path (str, 可选): SQLite磁盘层路径，为空时仅使用内存层
+        max_disk_entries (int): 磁盘层最大条目数
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.db_path = db_path
+        self.max_disk_entries = max_disk_entries
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()  # key -> (created_at, response)
+        self._disk = None
+        self._disk_writes = 0
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+        if db_path:
+            self._open_disk(db_path)
+
+    def _open_disk(self, db_path):
+        """打开SQLite磁盘层"""
+        try:
+            dir_name = os.path.dirname(db_path)
+            if dir_name and not os.path.exists(dir_name):
+                os.makedirs(dir_name)
+            self._disk = sqlite3.connect(db_path, check_same_thread=False)
+            self._disk.execute("PRAGMA journal_mode=WAL")
+            self._disk.execute("""
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                cache_key TEXT PRIMARY KEY,
+                model TEXT,
+                response TEXT,
+                created_at REAL
+            )
+            """)
+            self._disk.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_created_at ON llm_cache (created_at)")
+            self._disk.commit()
+        except Exception as e:
+            print(f"❌ 打开LLM磁盘缓存失败: {str(e)}")
+            self._disk = None
+
+    @staticmethod
+    def normalize_prompt(prompt):
+        """规范化prompt：合并空白字符，去除首尾空白"""
+        return re.sub(r"\s+", " ", prompt).strip()
+
+    def make_key(self, prompt, model):
+        """生成内容寻址的缓存键"""
+        normalized = self.normalize_prompt(prompt)
+        return hashlib.sha256(f"{model}\x00{normalized}".encode("utf-8")).hexdigest()
+
+    def _expired(self, created_at, now):
+        return self.ttl > 0 and now - created_at >= self.ttl
+
+    def get(self, prompt, model):
+        """查询缓存，未命中返回None"""
+        key = self.make_key(prompt, model)
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                created_at, response = entry
+                if not self._expired(created_at, now):
+                    self._memory.move_to_end(key)
+                    self.stats["hits"] += 1
+                    return response
+                del self._memory[key]
+
+            if self._disk is not None:
+                try:
+                    row = self._disk.execute(
+                        "SELECT response, created_at FROM llm_cache WHERE cache_key = ?", (key,)
+                    ).fetchone()
+                except Exception as e:
+                    print(f"❌ 读取LLM磁盘缓存失败: {str(e)}")
+                    row = None
+                if row is not None and not self._expired(row[1], now):
+                    self._remember(key, row[1], row[0])
+                    self.stats["hits"] += 1
+                    self.stats["disk_hits"] += 1
+                    return row[0]
+
+            self.stats["misses"] += 1
+            return None
+
+    def set(self, prompt, model, response):
+        """写入缓存"""
+        key = self.make_key(prompt, model)
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, response)
+            self.stats["stores"] += 1
+            if self._disk is not None:
+                try:
+                    self._disk.execute(
+                        "INSERT OR REPLACE INTO llm_cache (cache_key, model, response, created_at) VALUES (?, ?, ?, ?)",
+                        (key, model, response, now)
+                    )
+                    self._disk_writes += 1
+                    # 周期性清理过期和超量的磁盘条目
+                    if self._disk_writes % 100 == 0:
+                        self._prune_disk(now)
+                    self._disk.commit()
+                except Exception as e:
+                    print(f"❌ 写入LLM磁盘缓存失败: {str(e)}")
+
+    def _remember(self, key, created_at, response):
+        """写入内存层并按LRU淘汰"""
+        self._memory[key] = (created_at, response)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def _prune_disk(self, now):
+        """清理磁盘层中过期和超出容量的条目"""
+        if self.ttl > 0:
+            self._disk.execute("DELETE FROM llm_cache WHERE created_at < ?", (now - self.ttl,))
+        self._disk.execute("""
+        DELETE FROM llm_cache WHERE cache_key IN (
+            SELECT cache_key FROM llm_cache ORDER BY created_at DESC LIMIT -1 OFFSET ?
+        )
+        """, (self.max_disk_entries,))
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._memory.clear()
+            if self._disk is not None:
+                self._disk.execute("DELETE FROM llm_cache")
+                self._disk.commit()
+
+    def get_stats(self):
+        """获取命中统计"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats["memory_entries"] = len(self._memory)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
@@ -0,0 +1,190 @@
+import atexit
+import gzip
+import json
+import os
+import queue
+import shutil
+import threading
+import time
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+class LogSink:
+    """
+    后台日志写入器：调用方只把日志条目放入有界内存队列，
+    由后台线程批量写入JSONL文件，并按大小/时间滚动、压缩旧分段
+    """
+
+    def __init__(self, path, max_bytes=50 * 1024 * 1024, rotate_seconds=86400, compression="gzip",
+                 max_queue=10000, flush_interval=1.0, batch_size=500):
+        """
+        参数:
+        path (str): 日志文件路径
+        max_bytes (int): 单个分段最大字节数，<=0表示不按大小滚动
+        rotate_seconds (float): 单个分段最长时间(秒)，<=0表示不按时间滚动
+        compression (str): 旧分段压缩方式 "zstd"/"gzip"/"none"，zstd不可用时退回gzip
+        max_queue (int): 内存队列上限，队列满时丢弃新条目
+        flush_interval (float): 最长刷盘间隔(秒)
+        batch_size (int): 每批最多写入的条目数
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.rotate_seconds = rotate_seconds
+        if compression == "zstd" and zstandard is None:
+            compression = "gzip"
+        self.compression = compression
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._file = None
+        self._opened_at = 0
+        self._stopped = False
+        self.stats = {"written": 0, "dropped": 0, "rotations": 0}
+
+        self._thread = threading.Thread(target=self._run, name=f"log-sink-{os.path.basename(path)}")
+        self._thread.daemon = True
+        self._thread.start()
+        atexit.register(self.close)
+
+    def write(self, entry):
+        """
+        非阻塞地提交一条日志
+
+        参数:
+        entry (dict): 日志条目
+
+        返回:
+        bool: 是否成功入队
+        """
+        if self._stopped:
+            return False
+        try:
+            self._queue.put_nowait(entry)
+            return True
+        except queue.Full:
+            self.stats["dropped"] += 1
+            return False
+
+    def flush(self, timeout=5.0):
+        """等待队列中的日志全部落盘"""
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def close(self):
+        """写完剩余日志并停止后台线程"""
+        if self._stopped:
+            return
+        self.flush()
+        self._stopped = True
+        self._queue.put(None)
+        self._thread.join(timeout=5.0)
+
+    def _run(self):
+        """后台写入循环"""
+        while True:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                self._maybe_rotate()
+                continue
+
+            batch = [item]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            lines = []
+            waiters = []
+            stop = False
+            for item in batch:
+                if item is None:
+                    stop = True
+                elif isinstance(item, threading.Event):
+                    waiters.append(item)
+                else:
+                    lines.append(self._encode(item))
+
+            if lines:
+                self._write_lines(lines)
+            for waiter in waiters:
+                waiter.set()
+            if stop:
+                if self._file is not None:
+                    self._file.close()
+                    self._file = None
+                return
+
+    @staticmethod
+    def _encode(entry):
+        """序列化日志条目，不可序列化的字段转为字符串"""
+        try:
+            return json.dumps(entry, ensure_ascii=False)
+        except (TypeError, ValueError):
+            return json.dumps(entry, ensure_ascii=False, default=str)
+
+    def _write_lines(self, lines):
+        """批量写入并刷盘"""
+        try:
+            self._maybe_rotate()
+            if self._file is None:
+                self._open()
+            self._file.write("\n".join(lines) + "\n")
+            self._file.flush()
+            self.stats["written"] += len(lines)
+        except Exception as e:
+            print(f"❌ 写入日志{self.path}失败: {str(e)}")
+
+    def _open(self):
+        """以追加模式打开当前分段"""
+        dir_name = os.path.dirname(self.path)
+        if dir_name and not os.path.exists(dir_name):
+            os.makedirs(dir_name)
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._opened_at = time.time()
+
+    def _maybe_rotate(self):
+        """达到大小或时间上限时滚动当前分段"""
+        if self._file is None:
+            return
+        size = self._file.tell()
+        if size == 0:
+            return
+        too_big = self.max_bytes > 0 and size >= self.max_bytes
+        too_old = self.rotate_seconds > 0 and time.time() - self._opened_at >= self.rotate_seconds
+        if not (too_big or too_old):
+            return
+
+        self._file.close()
+        self._file = None
+        rolled = f"{self.path}.{time.strftime('%Y%m%d-%H%M%S')}"
+        suffix = 1
+        while os.path.exists(rolled) or os.path.exists(rolled + ".gz") or os.path.exists(rolled + ".zst"):
+            rolled = f"{self.path}.{time.strftime('%Y%m%d-%H%M%S')}.{suffix}"
+            suffix += 1
+        try:
+            os.replace(self.path, rolled)
+            self._compress(rolled)
+            self.stats["rotations"] += 1
+        except Exception as e:
+            print(f"❌ 滚动日志{self.path}失败: {str(e)}")
+
+    def _compress(self, rolled):
+        """压缩已滚动的分段"""
+        if self.compression == "zstd":
+            with open(rolled, "rb") as src, open(rolled + ".zst", "wb") as dst:
+                zstandard.ZstdCompressor().copy_stream(src, dst)
+        elif self.compression == "gzip":
+            with open(rolled, "rb") as src, gzip.open(rolled + ".gz", "wb") as dst:
+                shutil.copyfileobj(src, dst)
+        else:
+            return
+        os.remove(rolled)
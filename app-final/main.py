@@ -15,6 +15,26 @@ from alarm_agent import AlarmAgent
 from wallet_agent import WalletAgent
 from cex_agent import CEXAgent
 from auto_trade_agent import AutoTradeAgent
+from api_caller import load_config
+from job_engine import JobCancelled
+from transport import RemoteAgent, ZmqTransport, get_transport, get_remote_agent_keys, serve_agents_in_background
+
+# 代理键名 -> (代理类, 代理名称)
+AGENT_CLASSES = {
+    "info_process_agent": (InfoProcessAgent, "InfoProcessAgent"),
+    "cex_withdraw_agent": (CEXWithdrawAgent, "CEXWithdrawAgent"),
+    "specific_coin_whale_agent": (SpecificCoinWhaleAgent, "SpecificCoinWhaleAgent"),
+    "freq_tx_agent": (FreqTxAgent, "FreqTxAgent"),
+    "contract_monitor_agent": (ContractMonitorAgent, "ContractMonitorAgent"),
+    "basic_coin_info_agent": (BasicCoinInfoAgent, "BasicCoinInfoAgent"),
+    "data_clean_agent": (DataCleanAgent, "DataCleanAgent"),
+    "central_agent": (CentralAgent, "CentralAgent"),
+    "user_agent": (UserAgent, "UserAgent"),
+    "alarm_agent": (AlarmAgent, "AlarmAgent"),
+    "wallet_agent": (WalletAgent, "WalletAgent"),
+    "cex_agent": (CEXAgent, "CEXAgent"),
+    "auto_trade_agent": (AutoTradeAgent, "AutoTradeAgent")
+}
 
 def print_banner(text):
     """打印带边框的横幅"""
@@ -23,100 +43,145 @@ def print_banner(text):
     print(f"| {text} |")
     print("=" * width)
 
-def initialize_agents():
-    """初始化所有代理并建立连接"""
+def initialize_agents(serve_key=None):
+    """
+    初始化所有代理并建立连接
+
+    使用ZeroMQ传输时，主进程创建REMOTE_AGENTS之外的代理，并把它们注册到broker供worker调用；
+    worker进程只创建自己提供服务的代理，其余代理都通过broker访问，
+    数据库写入、警报调度和限速配额不会在每个worker中重复一份
+
+    参数:
+    serve_key (str, 可选): worker进程中要对外提供服务的代理键名
+    """
     print_banner("初始化代理")
     
-    # 创建所有代理实例
-    info_process_agent = InfoProcessAgent()
-    cex_withdraw_agent = CEXWithdrawAgent()
-    specific_coin_whale_agent = SpecificCoinWhaleAgent()
-    freq_tx_agent = FreqTxAgent()
-    contract_monitor_agent = ContractMonitorAgent()
-    basic_coin_info_agent = BasicCoinInfoAgent()
-    data_clean_agent = DataCleanAgent()
-    central_agent = CentralAgent()
-    user_agent = UserAgent()
-    alarm_agent = AlarmAgent()
-    wallet_agent = WalletAgent()
-    cex_agent = CEXAgent()
-    auto_trade_agent = AutoTradeAgent()
+    if serve_key is not None:
+        if not isinstance(get_transport(), ZmqTransport):
+            raise RuntimeError("worker进程需要配置 AGENT_TRANSPORT=zmq")
+        remote_keys = set(AGENT_CLASSES) - {serve_key}
+    else:
+        remote_keys = get_remote_agent_keys()
+    
+    # 创建代理实例，由其他进程运行的代理只创建代理对象
+    agents = {}
+    for key, (agent_class, agent_name) in AGENT_CLASSES.items():
+        if key in remote_keys:
+            print(f"🌐 {agent_name} 由远程worker提供")
+            agents[key] = RemoteAgent(agent_name, get_transport())
+        else:
+            agents[key] = agent_class()
+    
+    def is_local(key):
+        return not isinstance(agents[key], RemoteAgent)
+    
+    info_process_agent = agents["info_process_agent"]
+    cex_withdraw_agent = agents["cex_withdraw_agent"]
+    specific_coin_whale_agent = agents["specific_coin_whale_agent"]
+    freq_tx_agent = agents["freq_tx_agent"]
+    contract_monitor_agent = agents["contract_monitor_agent"]
+    basic_coin_info_agent = agents["basic_coin_info_agent"]
+    data_clean_agent = agents["data_clean_agent"]
+    central_agent = agents["central_agent"]
+    user_agent = agents["user_agent"]
+    alarm_agent = agents["alarm_agent"]
+    wallet_agent = agents["wallet_agent"]
+    cex_agent = agents["cex_agent"]
+    auto_trade_agent = agents["auto_trade_agent"]
     
     # 建立连接关系
     # 1. InfoProcessAgent 向其他代理分发信息
+    # 远程代理的连接关系由其所在的worker进程建立
     print("📡 连接 InfoProcessAgent 与其他代理...")
-    info_process_agent.register_agent(cex_withdraw_agent)
-    info_process_agent.register_agent(specific_coin_whale_agent)
-    info_process_agent.register_agent(freq_tx_agent)
-    info_process_agent.register_agent(contract_monitor_agent)
-    info_process_agent.register_agent(basic_coin_info_agent)
+    if is_local("info_process_agent"):
+        info_process_agent.register_agent(cex_withdraw_agent)
+        info_process_agent.register_agent(specific_coin_whale_agent)
+        info_process_agent.register_agent(freq_tx_agent)
+        info_process_agent.register_agent(contract_monitor_agent)
+        info_process_agent.register_agent(basic_coin_info_agent)
     
     # 2. 处理信息的代理向DataCleanAgent发送处理后的数据
     print("📡 连接处理代理与 DataCleanAgent...")
-    cex_withdraw_agent.set_data_clean_agent(data_clean_agent)
-    specific_coin_whale_agent.set_data_clean_agent(data_clean_agent)
-    freq_tx_agent.set_data_clean_agent(data_clean_agent)
-    contract_monitor_agent.set_data_clean_agent(data_clean_agent)
-    basic_coin_info_agent.set_data_clean_agent(data_clean_agent)
+    for key in ["cex_withdraw_agent", "specific_coin_whale_agent", "freq_tx_agent",
+                "contract_monitor_agent", "basic_coin_info_agent"]:
+        if is_local(key):
+            agents[key].set_data_clean_agent(data_clean_agent)
     
     # 3. 中央代理连接其他功能代理
     print("📡 连接 CentralAgent 与其他功能代理...")
-    central_agent.register_agents({
-        "info_process_agent": info_process_agent,
-        "data_clean_agent": data_clean_agent,
-        "cex_withdraw_agent": cex_withdraw_agent,
-        "specific_coin_whale_agent": specific_coin_whale_agent,
-        "freq_tx_agent": freq_tx_agent,
-        "contract_monitor_agent": contract_monitor_agent,
-        "basic_coin_info_agent": basic_coin_info_agent,
-        "wallet_agent": wallet_agent,
-        "cex_agent": cex_agent,
-        "auto_trade_agent": auto_trade_agent,
-        "alarm_agent": alarm_agent
-    })
+    if is_local("central_agent"):
+        central_agent.register_agents({
+            "info_process_agent": info_process_agent,
+            "data_clean_agent": data_clean_agent,
+            "cex_withdraw_agent": cex_withdraw_agent,
+            "specific_coin_whale_agent": specific_coin_whale_agent,
+            "freq_tx_agent": freq_tx_agent,
+            "contract_monitor_agent": contract_monitor_agent,
+            "basic_coin_info_agent": basic_coin_info_agent,
+            "wallet_agent": wallet_agent,
+            "cex_agent": cex_agent,
+            "auto_trade_agent": auto_trade_agent,
+            "alarm_agent": alarm_agent
+        })
     
     # 4. 用户代理连接中央代理
     print("📡 连接 UserAgent 与 CentralAgent...")
-    user_agent.set_central_agent(central_agent)
+    if is_local("user_agent"):
+        user_agent.set_central_agent(central_agent)
     
     # 5. 警报代理连接信息处理代理和数据清理代理
     print("📡 连接 AlarmAgent 与相关代理...")
-    alarm_agent.set_agents(info_process_agent, data_clean_agent)
+    if is_local("alarm_agent"):
+        alarm_agent.set_agents(info_process_agent, data_clean_agent)
     
     # 6. 钱包代理连接中央代理
     print("📡 连接 WalletAgent 与 CentralAgent...")
-    wallet_agent.set_central_agent(central_agent)
+    if is_local("wallet_agent"):
+        wallet_agent.set_central_agent(central_agent)
     
     # 7. 交易所代理连接中央代理
     print("📡 连接 CEXAgent 与 CentralAgent...")
-    cex_agent.set_central_agent(central_agent)
+    if is_local("cex_agent"):
+        cex_agent.set_central_agent(central_agent)
     
     # 8. 自动交易代理连接中央代理、钱包代理和交易所代理
     print("📡 连接 AutoTradeAgent 与相关代理...")
-    auto_trade_agent.set_agents(central_agent, wallet_agent, cex_agent)
+    if is_local("auto_trade_agent"):
+        auto_trade_agent.set_agents(central_agent, wallet_agent, cex_agent)
+    
+    # 9. 配置了刷新间隔时，后台定期刷新市场信息快照(worker进程不重复启动)
+    if (serve_key is None and is_local("info_process_agent")
+            and float(info_process_agent.config.get("SNAPSHOT_REFRESH_INTERVAL", "0")) > 0):
+        print("📡 启动 InfoProcessAgent 后台快照刷新...")
+        info_process_agent.start_background_refresh()
+    
+    # 10. 注册表中有保存的警报时恢复监控(只在运行AlarmAgent的进程中恢复一次)
+    if serve_key in (None, "alarm_agent") and is_local("alarm_agent"):
+        result = alarm_agent.resume_monitoring()
+        print(f"📡 恢复警报监控: {result['message']}")
+    
+    # 11. 主进程的本地代理注册到broker，worker进程中的代理可以回调它们
+    local_agents = [agent for agent in agents.values() if not isinstance(agent, RemoteAgent)]
+    if serve_key is None and remote_keys and local_agents:
+        config = load_config()
+        serve_agents_in_background(
+            local_agents,
+            config.get("AGENT_BROKER_BACKEND", "tcp://127.0.0.1:5556"),
+            max_workers=int(config.get("AGENT_SERVE_WORKERS", "4")),
+            reply_timeout=float(config.get("AGENT_RPC_TIMEOUT", "120"))
+        )
+        print(f"📡 已向broker注册 {len(local_agents)} 个本地代理")
     
     # 返回初始化完成的代理
-    return {
-        "info_process_agent": info_process_agent,
-        "cex_withdraw_agent": cex_withdraw_agent,
-        "specific_coin_whale_agent": specific_coin_whale_agent,
-        "freq_tx_agent": freq_tx_agent,
-        "contract_monitor_agent": contract_monitor_agent,
-        "basic_coin_info_agent": basic_coin_info_agent,
-        "data_clean_agent": data_clean_agent,
-        "central_agent": central_agent,
-        "user_agent": user_agent,
-        "alarm_agent": alarm_agent,
-        "wallet_agent": wallet_agent,
-        "cex_agent": cex_agent,
-        "auto_trade_agent": auto_trade_agent
-    }
+    return agents
 
-def process_user_query(user_agent, query):
-    """处理用户查询"""
+def process_user_query(user_agent, query, on_chunk=None, on_progress=None):
+    """处理用户查询，on_chunk用于接收流式生成的回复片段，on_progress用于接收处理阶段"""
     print_banner(f"处理用户查询: {query}")
     try:
-        return user_agent.process_user_request(query)
+        return user_agent.process_user_request(query, on_chunk=on_chunk, on_progress=on_progress)
+    except JobCancelled:
+        raise
     except Exception as e:
         error_detail = traceback.format_exc()
         print(f"❌ 处理用户查询时发生错误: {str(e)}\n{error_detail}")
@@ -146,10 +211,11 @@ def main():
         
         # 设置一些示例合约监控
         contract_monitor_agent = agents["contract_monitor_agent"]
-        contract_monitor_agent.add_monitored_contract(
-            "0xdac17f958d2ee523a2206206994597c13d831ec7", 
-            "USDT Token Contract"
-        )
+        if not isinstance(contract_monitor_agent, RemoteAgent):
+            contract_monitor_agent.add_monitored_contract(
+                "0xdac17f958d2ee523a2206206994597c13d831ec7", 
+                "USDT Token Contract"
+            )
         
         # 开始处理用户查询的循环
         while True:
@@ -0,0 +1,241 @@
+import contextvars
+import random
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+
+# 当前调用的优先级；后台任务(警报检查、快照刷新)在background_priority()中运行
+_priority = contextvars.ContextVar("request_priority", default=INTERACTIVE)
+
+# Binance各端点的请求权重(无symbol参数时部分端点权重更高)
+BINANCE_ENDPOINT_WEIGHTS = {
+    "/api/v3/ticker/price": (2, 4),
+    "/api/v3/ticker/24hr": (2, 80),
+    "/api/v3/depth": (5, 5),
+    "/api/v3/klines": (2, 2),
+    "/api/v3/order": (1, 1),
+    "/api/v3/account": (20, 20),
+    "/api/v3/exchangeInfo": (20, 20),
+    "/api/v3/openOrders": (6, 80)
+}
+
+def binance_weight(endpoint, params=None):
+    """计算一次Binance请求的权重"""
+    with_symbol, without_symbol = BINANCE_ENDPOINT_WEIGHTS.get(endpoint, (1, 1))
+    if isinstance(params, dict) and params.get("symbol"):
+        return with_symbol
+    return without_symbol
+
+def parse_retry_after(value):
+    """
+    解析Retry-After响应头，支持秒数和HTTP日期两种格式
+
+    返回:
+    float/None: 需要等待的秒数，无法解析时返回None
+    """
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    try:
+        retry_at = parsedate_to_datetime(str(value))
+    except (TypeError, ValueError):
+        return None
+    if retry_at is None:
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+def current_priority():
+    """当前上下文的调用优先级"""
+    return _priority.get()
+
+@contextmanager
+def background_priority():
+    """在此上下文中发起的上游调用按后台优先级排队"""
+    token = _priority.set(BACKGROUND)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+def submit_with_context(executor, fn, *args, **kwargs):
+    """向线程池提交任务并带上当前上下文(优先级)"""
+    ctx = contextvars.copy_context()
+    return executor.submit(ctx.run, fn, *args, **kwargs)
+
+class TokenBucket:
+    """
+    令牌桶：以固定速率补充令牌，交互请求优先；
+    后台请求只能使用超出保留额度的令牌，并且在有交互请求等待时让行
+    """
+
+    def __init__(self, rate, capacity, background_reserve=0.2):
+        """
+        参数:
+        rate (float): 每秒补充的令牌数
+        capacity (float): 桶容量(允许的突发量)
+        background_reserve (float): 为交互请求保留的容量比例
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.reserve = capacity * background_reserve
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self._cond = threading.Condition()
+        self._interactive_waiting = 0
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def _available(self, cost, priority):
+        if priority == BACKGROUND:
+            return self._interactive_waiting == 0 and self.tokens - cost >= self.reserve
+        return self.tokens >= cost
+
+    def try_acquire(self, cost=1, priority=INTERACTIVE):
+        """非阻塞获取令牌"""
+        with self._cond:
+            self._refill()
+            if self._available(cost, priority):
+                self.tokens -= cost
+                return True
+            return False
+
+    def acquire(self, cost=1, priority=INTERACTIVE, timeout=None):
+        """
+        阻塞获取令牌
+
+        返回:
+        bool: 超时前是否获取成功
+        """
+        cost = min(cost, self.capacity)
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        with self._cond:
+            if priority != BACKGROUND:
+                self._interactive_waiting += 1
+            try:
+                while True:
+                    self._refill()
+                    if self._available(cost, priority):
+                        self.tokens -= cost
+                        return True
+                    # 预计补足所需令牌的时间
+                    needed = cost + (self.reserve if priority == BACKGROUND else 0) - self.tokens
+                    wait = max(needed / self.rate, 0.01) if needed > 0 else 0.05
+                    if deadline is not None:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            return False
+                        wait = min(wait, remaining)
+                    self._cond.wait(wait)
+            finally:
+                if priority != BACKGROUND:
+                    self._interactive_waiting -= 1
+                    self._cond.notify_all()
+
+    def drain(self, seconds):
+        """上游提示限流时清空令牌并暂停补充一段时间"""
+        with self._cond:
+            self._refill()
+            self.tokens = min(self.tokens, 0) - seconds * self.rate
+            self.updated_at = time.monotonic()
+
+class RateLimiter:
+    """
+    按(上游, API密钥)维护令牌桶，支持多密钥轮换和限流重试的退避计算
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self._limits = {}
+        self._next_key = {}
+        self.stats = {"acquired": 0, "waited": 0, "timeouts": 0, "throttled": 0}
+
+    def configure(self, upstream, rate, capacity, background_reserve=0.2):
+        """设置上游的速率限制(对每个密钥分别生效)"""
+        with self._lock:
+            self._limits[upstream] = (rate, capacity, background_reserve)
+
+    def bucket(self, upstream, key=""):
+        """获取(上游, 密钥)对应的令牌桶"""
+        with self._lock:
+            bucket = self._buckets.get((upstream, key))
+            if bucket is None:
+                rate, capacity, reserve = self._limits.get(upstream, (5, 5, 0.2))
+                bucket = TokenBucket(rate, capacity, reserve)
+                self._buckets[(upstream, key)] = bucket
+            return bucket
+
+    def acquire(self, upstream, keys=None, cost=1, timeout=30.0):
+        """
+        获取一次调用配额，有多个密钥时优先使用有空闲配额的密钥
+
+        参数:
+        upstream (str): 上游名称，如 etherscan、binance
+        keys (list, 可选): 可轮换的API密钥
+        cost (float): 本次调用消耗的令牌(Binance为端点权重)
+        timeout (float): 最长等待时间(秒)
+
+        返回:
+        str/None: 获得配额的密钥(无密钥时为"")，超时返回None
+        """
+        keys = list(keys) if keys else [""]
+        priority = current_priority()
+
+        # 轮询起点，使各密钥负载均衡
+        with self._lock:
+            start = self._next_key.get(upstream, 0) % len(keys)
+            self._next_key[upstream] = start + 1
+        ordered = keys[start:] + keys[:start]
+
+        for key in ordered:
+            if self.bucket(upstream, key).try_acquire(cost, priority):
+                self._count("acquired")
+                return key
+
+        self._count("waited")
+        if self.bucket(upstream, ordered[0]).acquire(cost, priority, timeout):
+            self._count("acquired")
+            return ordered[0]
+        self._count("timeouts")
+        return None
+
+    def throttled(self, upstream, key, retry_after=None, attempt=0, base=1.0, cap=30.0):
+        """
+        记录一次上游限流并计算退避时间：有Retry-After时至少等待该时长，
+        只向后追加抖动；否则按带抖动的指数退避
+
+        返回:
+        float: 建议等待的秒数
+        """
+        self._count("throttled")
+        delay = parse_retry_after(retry_after)
+        if delay is not None:
+            # 提前重试必然再次被限流，抖动只用于错开同时到期的请求
+            delay += random.uniform(0, base)
+        else:
+            delay = min(cap, base * (2 ** attempt)) * random.uniform(0.5, 1.5)
+        self.bucket(upstream, key).drain(delay)
+        return delay
+
+    def _count(self, name):
+        """多个线程同时获取配额，统计计数需在锁内更新"""
+        with self._lock:
+            self.stats[name] += 1
+
+    def get_stats(self):
+        """获取配额统计"""
+        with self._lock:
+            return dict(self.stats)
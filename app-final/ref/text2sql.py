@@ -1,12 +1,57 @@
+import re
 import sqlite3
+import threading
+import time
+from collections import OrderedDict
 from typing import Dict, Any, Tuple, Optional, List
 import os
 from base_agent import BaseAgent
 
+
+class _LRUCache:
+    """Small thread-safe LRU mapping"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
 class Text2SQLAgent(BaseAgent):
     def __init__(self, name: str = "Text2SQLAgent", llm_model: str = None):
         super().__init__(name, llm_model)
         self.db_path = self.config.get('DB_PATH', 'blockchain_data.db')
+        self.sample_ttl = float(self.config.get('TEXT2SQL_SAMPLE_TTL', '300'))
+
+        # One long-lived connection: PRAGMA data_version is only comparable between
+        # calls on the same connection
+        self._conn = None
+        self._conn_lock = threading.RLock()
+        self._local_writes = 0
+
+        # Schema/sample context, keyed by schema_version (samples also refresh after sample_ttl
+        # once data_version moved)
+        self._schema_cache = None
+        self._schema_cache_key = None
+        self._schema_cached_at = 0.0
+        # normalized question + schema_version -> SQL that executed successfully
+        self._sql_cache = _LRUCache(int(self.config.get('TEXT2SQL_SQL_CACHE_SIZE', '256')))
+        # (SQL, data version) -> rows
+        self._result_cache = _LRUCache(int(self.config.get('TEXT2SQL_RESULT_CACHE_SIZE', '128')))
 
     def process(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -22,11 +67,15 @@ class Text2SQLAgent(BaseAgent):
         if not user_query:
             return {"status": "error", "message": "No query provided"}
 
-        # Get table schema and sample data for context
-        schema_data = self._get_db_schema()
+        # Reuse the SQL generated for the same question against the same schema
+        question_key = (self._normalize_question(user_query), self._pragma("schema_version"))
+        sql_query = self._sql_cache.get(question_key)
+        if sql_query is None:
+            # Get table schema and sample data for context
+            schema_data = self._get_db_schema()
 
-        # Convert user query to SQL
-        sql_query = self._convert_to_sql(user_query, schema_data)
+            # Convert user query to SQL
+            sql_query = self._convert_to_sql(user_query, schema_data)
 
         if not sql_query:
             return {
@@ -37,6 +86,7 @@ class Text2SQLAgent(BaseAgent):
         # Execute the SQL query
         try:
             results = self._execute_sql(sql_query)
+            self._sql_cache.set(question_key, sql_query)
             return {
                 "status": "success",
                 "sql_query": sql_query,
@@ -48,6 +98,7 @@ class Text2SQLAgent(BaseAgent):
             if fixed_sql and fixed_sql != sql_query:
                 try:
                     results = self._execute_sql(fixed_sql)
+                    self._sql_cache.set(question_key, fixed_sql)
                     return {
                         "status": "success",
                         "sql_query": fixed_sql,
@@ -67,14 +118,54 @@ class Text2SQLAgent(BaseAgent):
                 "message": f"Error executing SQL: {str(e)}"
             }
 
+    def _connection(self) -> sqlite3.Connection:
+        """Lazily open the long-lived connection"""
+        with self._conn_lock:
+            if self._conn is None:
+                self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            return self._conn
+
+    def _pragma(self, name: str) -> int:
+        """Read schema_version or data_version from the long-lived connection"""
+        with self._conn_lock:
+            return self._connection().execute(f"PRAGMA {name};").fetchone()[0]
+
+    def _data_version(self) -> Tuple[int, int]:
+        """
+        data_version only changes for commits made by other connections, so writes made
+        through this agent's own connection are counted separately
+        """
+        with self._conn_lock:
+            return self._pragma("data_version"), self._local_writes
+
+    @staticmethod
+    def _normalize_question(user_query: str) -> str:
+        """Lowercase, collapse whitespace and drop trailing punctuation"""
+        question = re.sub(r"\s+", " ", user_query.strip().lower())
+        return question.rstrip("?？。.!！ ")
+
     def _get_db_schema(self) -> Dict[str, Any]:
-        """Get database schema and sample data for providing context"""
-        conn = None
+        """Get database schema and sample data for providing context (cached)"""
+        with self._conn_lock:
+            schema_version = self._pragma("schema_version")
+            data_version = self._data_version()
+            cached_schema, cached_data = self._schema_cache_key or (None, None)
+            if self._schema_cache is not None and cached_schema == schema_version and (
+                    cached_data == data_version or time.time() - self._schema_cached_at < self.sample_ttl):
+                return self._schema_cache
+
+            schema_data = self._load_db_schema()
+            self._schema_cache = schema_data
+            self._schema_cache_key = (schema_version, data_version)
+            self._schema_cached_at = time.time()
+            return schema_data
+
+    def _load_db_schema(self) -> Dict[str, Any]:
+        """Read table schema and sample rows from the database"""
         schema_data = {"tables": [], "sample_data": {}}
 
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+            cursor = self._connection().cursor()
 
             # Get list of tables
             cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
@@ -113,9 +204,6 @@ class Text2SQLAgent(BaseAgent):
 
         except Exception as e:
             print(f"Error getting database schema: {str(e)}")
-        finally:
-            if conn:
-                conn.close()
 
         return schema_data
 
@@ -190,26 +278,35 @@ Original SQL command:
         return fixed_sql
 
     def _execute_sql(self, sql_query: str) -> List[Dict[str, Any]]:
-        """Execute SQL query and return results as a list of dictionaries"""
-        conn = None
-        results = []
-
-        try:
-            conn = sqlite3.connect(self.db_path)
-            conn.row_factory = sqlite3.Row  # This enables column access by name
-            cursor = conn.cursor()
-
-            cursor.execute(sql_query)
-            rows = cursor.fetchall()
-
-            # Convert rows to dictionaries
-            for row in rows:
-                results.append({key: row[key] for key in row.keys()})
-
-        except Exception as e:
-            raise e
-        finally:
-            if conn:
-                conn.close()
-
+        """
+        Execute SQL query and return results as a list of dictionaries.
+        Read-only results are cached until the database content changes.
+        """
+        is_read = (re.match(r"\s*(select|with)\b", sql_query, re.IGNORECASE) is not None
+                   and not re.search(r"\b(insert|update|delete|replace)\b", sql_query, re.IGNORECASE))
+        with self._conn_lock:
+            result_key = (re.sub(r"\s+", " ", sql_query.strip()), self._data_version()) if is_read else None
+            if result_key is not None:
+                cached = self._result_cache.get(result_key)
+                if cached is not None:
+                    return [dict(row) for row in cached]
+
+            conn = self._connection()
+            try:
+                cursor = conn.execute(sql_query)
+                rows = cursor.fetchall()
+                column_names = [description[0] for description in cursor.description] if cursor.description else []
+                if not is_read:
+                    conn.commit()
+                    self._local_writes += 1
+            except Exception:
+                # The connection is shared; a failed write must not leave an open transaction behind
+                if conn.in_transaction:
+                    conn.rollback()
+                raise
+
+        # Convert rows to dictionaries
+        results = [dict(zip(column_names, row)) for row in rows]
+        if result_key is not None:
+            self._result_cache.set(result_key, [dict(row) for row in results])
         return results
\ No newline at end of file
@@ -0,0 +1,122 @@
+import json
+import time
+from api_caller import get_db_manager
+from schema_migrations import apply_migrations
+
+ALARM_UPSERT_SQL = """
+INSERT INTO alarm_registry (alarm_id, condition, description, created_at, check_interval, cooldown, debounce,
+                            last_triggered, trigger_count, hits, suppressed, cursor, updated_at)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(alarm_id) DO UPDATE SET
+    condition = excluded.condition,
+    description = excluded.description,
+    created_at = excluded.created_at,
+    check_interval = excluded.check_interval,
+    cooldown = excluded.cooldown,
+    debounce = excluded.debounce,
+    last_triggered = excluded.last_triggered,
+    trigger_count = excluded.trigger_count,
+    hits = excluded.hits,
+    suppressed = excluded.suppressed,
+    cursor = excluded.cursor,
+    updated_at = excluded.updated_at
+"""
+
+STRATEGY_UPSERT_SQL = """
+INSERT INTO strategy_registry (strategy_id, description, rules, active, created_at, updated_at)
+VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT(strategy_id) DO UPDATE SET
+    description = excluded.description,
+    rules = excluded.rules,
+    active = excluded.active,
+    created_at = excluded.created_at,
+    updated_at = excluded.updated_at
+"""
+
+class RegistryStore:
+    """
+    警报和交易策略的持久化注册表：定义、触发状态和增量检查游标保存在SQLite中，
+    进程重启后可以恢复
+    """
+
+    def __init__(self, api_caller):
+        self.api_caller = api_caller
+        apply_migrations(get_db_manager())
+
+    def load_alarms(self):
+        """
+        读取全部警报
+
+        返回:
+        dict: 警报ID -> 警报状态字段(不含编译后的检查计划)
+        """
+        rows = self.api_caller.execute_sql("SELECT * FROM alarm_registry ORDER BY created_at")
+        if not isinstance(rows, list):
+            return {}
+        return {
+            row["alarm_id"]: {
+                "condition": row["condition"],
+                "description": row["description"] or "",
+                "created_at": row["created_at"],
+                "interval": row["check_interval"],
+                "cooldown": row["cooldown"] or 0,
+                "debounce": row["debounce"] or 1,
+                "last_triggered": row["last_triggered"],
+                "trigger_count": row["trigger_count"] or 0,
+                "hits": row["hits"] or 0,
+                "suppressed": row["suppressed"] or 0,
+                "cursor": row["cursor"] or 0
+            }
+            for row in rows
+        }
+
+    def save_alarms(self, alarms):
+        """
+        批量保存警报(定义和状态)
+
+        参数:
+        alarms (list): (警报ID, 警报数据) 列表
+        """
+        now = time.time()
+        rows = [
+            (alarm_id, data["condition"], data["description"], data["created_at"], data["interval"],
+             data["cooldown"], data["debounce"], data["last_triggered"], data["trigger_count"],
+             data["hits"], data["suppressed"], data["cursor"], now)
+            for alarm_id, data in alarms
+        ]
+        return self.api_caller.execute_many(ALARM_UPSERT_SQL, rows)
+
+    def delete_alarm(self, alarm_id):
+        """删除警报"""
+        return self.api_caller.execute_sql("DELETE FROM alarm_registry WHERE alarm_id = ?", (alarm_id,))
+
+    def load_strategies(self):
+        """
+        读取全部交易策略
+
+        返回:
+        dict: 策略ID -> 策略数据
+        """
+        rows = self.api_caller.execute_sql("SELECT * FROM strategy_registry ORDER BY created_at")
+        if not isinstance(rows, list):
+            return {}
+        return {
+            row["strategy_id"]: {
+                "description": row["description"] or "",
+                "rules": json.loads(row["rules"]),
+                "active": bool(row["active"]),
+                "created_at": row["created_at"]
+            }
+            for row in rows
+        }
+
+    def save_strategy(self, strategy_id, strategy):
+        """保存交易策略"""
+        return self.api_caller.execute_many(STRATEGY_UPSERT_SQL, [(
+            strategy_id, strategy["description"], json.dumps(strategy["rules"], ensure_ascii=False),
+            1 if strategy["active"] else 0, strategy["created_at"], time.time()
+        )])
+
+    def delete_strategy(self, strategy_id):
+        """删除交易策略"""
+        return self.api_caller.execute_sql("DELETE FROM strategy_registry WHERE strategy_id = ?", (strategy_id,))
@@ -0,0 +1,212 @@
+import time
+
+# 有时间戳的分析表，按天分桶并参与保留期清理
+TIME_PARTITIONED_TABLES = ["whale_transactions", "cex_withdrawals", "contract_activities"]
+
+# 版本化的数据库迁移：(版本号, 描述, SQL语句列表)，只能追加，不能修改已发布的版本
+MIGRATIONS = [
+    (1, "创建基础表", [
+        """
+        CREATE TABLE IF NOT EXISTS coin_info (
+            symbol TEXT PRIMARY KEY,
+            name TEXT,
+            contract TEXT,
+            price REAL,
+            market_cap REAL,
+            volume_24h REAL,
+            change_24h REAL,
+            description TEXT,
+            features TEXT,
+            last_updated INTEGER
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS whale_transactions (
+            tx_hash TEXT PRIMARY KEY,
+            from_address TEXT,
+            to_address TEXT,
+            value REAL,
+            coin TEXT,
+            block_number INTEGER,
+            timestamp INTEGER
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS cex_withdrawals (
+            tx_hash TEXT PRIMARY KEY,
+            from_address TEXT,
+            to_address TEXT,
+            value REAL,
+            timestamp INTEGER
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS contract_activities (
+            tx_hash TEXT PRIMARY KEY,
+            contract_address TEXT,
+            contract_type TEXT,
+            from_address TEXT,
+            value REAL,
+            timestamp INTEGER,
+            block_number INTEGER
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS frequent_addresses (
+            address TEXT PRIMARY KEY,
+            transaction_count INTEGER,
+            first_seen INTEGER,
+            last_seen INTEGER
+        )
+        """
+    ]),
+    (2, "为警报条件和查询的常用过滤列添加索引", [
+        "CREATE INDEX IF NOT EXISTS idx_whale_transactions_timestamp ON whale_transactions (timestamp)",
+        "CREATE INDEX IF NOT EXISTS idx_whale_transactions_value ON whale_transactions (value)",
+        "CREATE INDEX IF NOT EXISTS idx_whale_transactions_from ON whale_transactions (from_address, timestamp)",
+        "CREATE INDEX IF NOT EXISTS idx_whale_transactions_to ON whale_transactions (to_address, timestamp)",
+        "CREATE INDEX IF NOT EXISTS idx_whale_transactions_coin ON whale_transactions (coin, timestamp, value)",
+        "CREATE INDEX IF NOT EXISTS idx_cex_withdrawals_timestamp ON cex_withdrawals (timestamp)",
+        "CREATE INDEX IF NOT EXISTS idx_cex_withdrawals_value ON cex_withdrawals (value)",
+        "CREATE INDEX IF NOT EXISTS idx_cex_withdrawals_from ON cex_withdrawals (from_address, timestamp)",
+        "CREATE INDEX IF NOT EXISTS idx_cex_withdrawals_to ON cex_withdrawals (to_address, timestamp)",
+        "CREATE INDEX IF NOT EXISTS idx_contract_activities_contract ON contract_activities (contract_address, timestamp)",
+        "CREATE INDEX IF NOT EXISTS idx_contract_activities_timestamp ON contract_activities (timestamp)",
+        "CREATE INDEX IF NOT EXISTS idx_contract_activities_from ON contract_activities (from_address, timestamp)",
+        "CREATE INDEX IF NOT EXISTS idx_contract_activities_value ON contract_activities (value)",
+        "CREATE INDEX IF NOT EXISTS idx_frequent_addresses_count ON frequent_addresses (transaction_count)",
+        "CREATE INDEX IF NOT EXISTS idx_frequent_addresses_last_seen ON frequent_addresses (last_seen)"
+    ]),
+    (3, "按天分桶的时间列，用于分区查询和保留期清理", [
+        statement
+        for table in TIME_PARTITIONED_TABLES
+        for statement in (
+            f"ALTER TABLE {table} ADD COLUMN day_bucket INTEGER GENERATED ALWAYS AS (timestamp / 86400) VIRTUAL",
+            f"CREATE INDEX IF NOT EXISTS idx_{table}_day_bucket ON {table} (day_bucket)"
+        )
+    ]),
+    (4, "增量拉取的区块游标(高水位)", [
+        """
+        CREATE TABLE IF NOT EXISTS ingest_cursors (
+            stream TEXT PRIMARY KEY,
+            last_block INTEGER,
+            last_tx_hash TEXT,
+            block_hashes TEXT,
+            updated_at INTEGER
+        )
+        """
+    ]),
+    (5, "持久化的警报与交易策略注册表", [
+        """
+        CREATE TABLE IF NOT EXISTS alarm_registry (
+            alarm_id TEXT PRIMARY KEY,
+            condition TEXT NOT NULL,
+            description TEXT,
+            created_at REAL,
+            check_interval REAL,
+            cooldown REAL,
+            debounce INTEGER,
+            last_triggered REAL,
+            trigger_count INTEGER DEFAULT 0,
+            hits INTEGER DEFAULT 0,
+            suppressed INTEGER DEFAULT 0,
+            cursor INTEGER DEFAULT 0,
+            updated_at REAL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS strategy_registry (
+            strategy_id TEXT PRIMARY KEY,
+            description TEXT,
+            rules TEXT NOT NULL,
+            active INTEGER DEFAULT 1,
+            created_at INTEGER,
+            updated_at REAL
+        )
+        """
+    ])
+]
+
+def _ensure_version_table(conn):
+    """创建schema_version表"""
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INTEGER PRIMARY KEY,
+        description TEXT,
+        applied_at INTEGER
+    )
+    """)
+
+def get_schema_version(db):
+    """获取当前已应用的最高版本号"""
+    with db.writer() as conn:
+        _ensure_version_table(conn)
+        row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    return row[0] or 0
+
+def apply_migrations(db, migrations=None):
+    """
+    依次应用尚未执行的迁移，每个版本在一个事务内完成并记录到schema_version
+
+    参数:
+    db: SQLiteConnectionManager
+    migrations (list, 可选): 迁移列表，默认使用MIGRATIONS
+
+    返回:
+    list: 本次应用的版本号
+    """
+    migrations = migrations if migrations is not None else MIGRATIONS
+    applied = []
+    with db.writer() as conn:
+        _ensure_version_table(conn)
+        conn.commit()
+        current = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()[0] or 0
+
+        for version, description, statements in sorted(migrations, key=lambda m: m[0]):
+            if version <= current:
+                continue
+            try:
+                conn.execute("BEGIN")
+                for statement in statements:
+                    conn.execute(statement)
+                conn.execute(
+                    "INSERT INTO schema_version (version, description, applied_at) VALUES (?, ?, ?)",
+                    (version, description, int(time.time()))
+                )
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            applied.append(version)
+            print(f"✅ 已应用数据库迁移 v{version}: {description}")
+    return applied
+
+def prune_expired_rows(db, retention_days, now=None):
+    """
+    删除超出保留期的分析数据
+
+    参数:
+    db: SQLiteConnectionManager
+    retention_days (float): 保留天数，<=0表示不清理
+    now (float, 可选): 当前时间戳
+
+    返回:
+    dict: 表名 -> 删除行数
+    """
+    if retention_days <= 0:
+        return {}
+
+    now = now if now is not None else time.time()
+    cutoff = int(now - retention_days * 86400)
+    deleted = {}
+    with db.writer() as conn:
+        for table in TIME_PARTITIONED_TABLES:
+            # 先按天分桶索引裁剪整天，再精确删除边界当天的旧数据
+            cursor = conn.execute(
+                f"DELETE FROM {table} WHERE day_bucket < ? OR (day_bucket = ? AND timestamp < ?)",
+                (cutoff // 86400, cutoff // 86400, cutoff)
+            )
+            deleted[table] = cursor.rowcount
+        cursor = conn.execute("DELETE FROM frequent_addresses WHERE last_seen < ?", (cutoff,))
+        deleted["frequent_addresses"] = cursor.rowcount
+    return deleted
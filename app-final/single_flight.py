@@ -0,0 +1,58 @@
+import threading
+
+class _Call:
+    """一次正在进行中的调用"""
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """
+    单飞(single-flight)保护：同一个key的并发调用只真正执行一次，
+    其余调用方等待并共享同一个结果或异常
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn, *args, **kwargs):
+        """
+        执行fn，若相同key的调用正在进行中则等待其结果
+
+        参数:
+        key: 去重键(需可哈希)
+        fn: 实际执行的函数
+
+        返回:
+        fn的返回值
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+
+    def in_flight(self, key):
+        """判断相同key的调用是否正在进行中"""
+        with self._lock:
+            return key in self._calls
@@ -0,0 +1,57 @@
+import threading
+import time
+
+class SnapshotCache:
+    """
+    带新鲜度的市场信息快照缓存，每类数据(gas/价格、交易、鲸鱼交易、合约活动等)有独立的TTL
+    """
+
+    def __init__(self, ttls):
+        """
+        参数:
+        ttls (dict): 数据类别 -> TTL(秒)
+        """
+        self.ttls = dict(ttls)
+        self._lock = threading.Lock()
+        self._data = {}
+        self._fetched_at = {}
+
+    def stale_families(self, families=None, now=None):
+        """返回已过期或尚未获取的数据类别"""
+        now = now if now is not None else time.time()
+        families = families if families is not None else list(self.ttls.keys())
+        with self._lock:
+            return [
+                family for family in families
+                if family not in self._fetched_at
+                or now - self._fetched_at[family] >= self.ttls.get(family, 0)
+            ]
+
+    def is_fresh(self):
+        """判断所有数据类别是否都在TTL内"""
+        return not self.stale_families()
+
+    def update(self, values, now=None):
+        """写入新获取的数据，出错的数据源保留旧值且不刷新时间戳"""
+        now = now if now is not None else time.time()
+        with self._lock:
+            for family, value in values.items():
+                if isinstance(value, dict) and "error" in value and family in self._data:
+                    continue
+                self._data[family] = value
+                if not (isinstance(value, dict) and "error" in value):
+                    self._fetched_at[family] = now
+
+    def snapshot(self):
+        """返回当前完整快照(浅拷贝)"""
+        with self._lock:
+            snapshot = dict(self._data)
+            snapshot["timestamp"] = max(self._fetched_at.values()) if self._fetched_at else 0
+            snapshot["fetched_at"] = dict(self._fetched_at)
+        return snapshot
+
+    def age(self, family):
+        """返回某类数据的年龄(秒)，未获取过返回None"""
+        with self._lock:
+            fetched_at = self._fetched_at.get(family)
+        return time.time() - fetched_at if fetched_at is not None else None
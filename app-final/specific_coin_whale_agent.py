@@ -1,4 +1,21 @@
 from base_agent import BaseAgent
+import json
+
+# ERC-20 transfer(address,uint256) 函数选择器
+ERC20_TRANSFER_SELECTOR = "0xa9059cbb"
+
+def decode_erc20_transfer(tx_input):
+    """解码ERC-20 transfer调用数据，返回(接收地址, 原始金额)，格式不符时返回None"""
+    tx_input = (tx_input or "").lower()
+    # 4字节选择器后依次是32字节的地址参数和32字节的uint256金额
+    if not tx_input.startswith(ERC20_TRANSFER_SELECTOR) or len(tx_input) < 10 + 128:
+        return None
+    try:
+        recipient = "0x" + tx_input[10 + 24:10 + 64]
+        amount = int(tx_input[10 + 64:10 + 128], 16)
+    except ValueError:
+        return None
+    return recipient, amount
 
 class SpecificCoinWhaleAgent(BaseAgent):
     def __init__(self):
@@ -6,6 +23,8 @@ class SpecificCoinWhaleAgent(BaseAgent):
         self.data_clean_agent = None
         self.latest_info = {}
         self.tracked_coins = ["ETH", "USDT", "USDC"]  # 默认跟踪的币种
+        # 代币转账按解码后的代币数量判断是否为大额交易
+        self.token_whale_threshold = float(self.config.get("WHALE_TOKEN_THRESHOLD", "1000000"))
     
     def set_data_clean_agent(self, agent):
         """设置DataClean Agent"""
@@ -95,7 +114,7 @@ class SpecificCoinWhaleAgent(BaseAgent):
         请返回你的分析结果，格式为<output>分析结果</output>
         """
         
-        analysis_result = self.call_llm(analysis_prompt)
+        analysis_result = self.call_llm(analysis_prompt, use_cache=False)
         extracted_analysis = self.extract_output(analysis_result)
         
         return {
@@ -115,8 +134,10 @@ class SpecificCoinWhaleAgent(BaseAgent):
         whale_txs = info.get("whale_activity", {}).get("whale_transactions", [])
         
         # 过滤出我们关注的币种的交易
-        # 实际应用中，这里可能需要更复杂的逻辑来识别特定代币的交易
-        filtered_txs = []
+        # 先用确定性规则识别币种，只有无法识别的交易才批量交给LLM
+        token_contracts = self._build_token_contract_table(info)
+        tx_rows = []
+        unresolved = []
         for tx in whale_txs:
             tx_data = {
                 "from": tx.get("from", ""),
@@ -126,27 +147,117 @@ class SpecificCoinWhaleAgent(BaseAgent):
                 "blockNumber": tx.get("blockNumber", ""),
                 "timeStamp": tx.get("timeStamp", ""),
             }
-            
-            # 使用LLM判断这笔交易的币种
-            prompt = f"""
-            根据以下交易信息，判断这可能是哪种加密货币的交易:
-            
-            发送方: {tx_data['from']}
-            接收方: {tx_data['to']}
-            金额: {float(tx_data['value']) / 1e18 if tx_data['value'].isdigit() else tx_data['value']}
-            
-            请从以下选项中选择一个: {', '.join(self.tracked_coins)}
-            
-            请只返回币种符号，格式为<output>币种符号</output>
-            """
-            
-            result = self.call_llm(prompt)
-            coin = self.extract_output(result)
-            
+            coin = self._detect_coin_fast(tx, token_contracts)
+            tx_rows.append((tx_data, coin))
+            if coin is None:
+                unresolved.append(tx_data)
+        
+        llm_coins = self._classify_coins_batch(unresolved) if unresolved else []
+        llm_iter = iter(llm_coins)
+        
+        filtered_txs = self._extract_token_transfers(info, token_contracts)
+        for tx_data, coin in tx_rows:
+            if coin is None:
+                coin = next(llm_iter, None)
             if coin in self.tracked_coins:
                 tx_data["detected_coin"] = coin
                 filtered_txs.append(tx_data)
         
         whale_data["whale_transactions"] = filtered_txs
         
-        return whale_data 
\ No newline at end of file
+        return whale_data
+    
+    def _extract_token_transfers(self, info, token_contracts):
+        """从ERC-20转账中解码金额，保留已知代币合约上的大额转账"""
+        decimals = self._build_token_decimals_table(info)
+        token_txs = []
+        for tx in info.get("whale_activity", {}).get("token_transfers", []):
+            contract = (tx.get("to") or "").lower()
+            coin = self._detect_coin_fast(tx, token_contracts)
+            decoded = decode_erc20_transfer(tx.get("input"))
+            if coin not in self.tracked_coins or decoded is None or contract not in decimals:
+                continue
+            recipient, amount = decoded
+            if amount / 10 ** decimals[contract] < self.token_whale_threshold:
+                continue
+            token_txs.append({
+                "from": tx.get("from", ""),
+                "to": recipient,
+                # 换算为18位精度，入库时与ETH一样除以1e18即为代币数量
+                "value": str(amount * 10 ** 18 // 10 ** decimals[contract]),
+                "hash": tx.get("hash", ""),
+                "blockNumber": tx.get("blockNumber", ""),
+                "timeStamp": tx.get("timeStamp", ""),
+                "detected_coin": coin,
+            })
+        return token_txs
+    
+    def _build_token_decimals_table(self, info):
+        """根据币种信息构建 合约地址 -> 代币精度 的映射，未提供精度的代币不参与解码"""
+        decimals = {}
+        coin_info = info.get("coin_info", {})
+        if not isinstance(coin_info, dict):
+            return decimals
+        for token in coin_info.get("top_tokens", []):
+            contract = token.get("contract", "")
+            if contract and isinstance(token.get("decimals"), int):
+                decimals[contract.lower()] = token["decimals"]
+        return decimals
+    
+    def _build_token_contract_table(self, info):
+        """根据币种信息构建 合约地址 -> 币种符号 的映射"""
+        token_contracts = {}
+        coin_info = info.get("coin_info", {})
+        if not isinstance(coin_info, dict):
+            return token_contracts
+        for token in coin_info.get("top_tokens", []):
+            contract = token.get("contract", "")
+            if contract:
+                token_contracts[contract.lower()] = token.get("symbol", "")
+        return token_contracts
+    
+    def _detect_coin_fast(self, tx, token_contracts):
+        """用确定性规则识别交易币种，无法识别时返回None"""
+        to_addr = (tx.get("to") or "").lower()
+        tx_input = (tx.get("input") or "0x").lower()
+        
+        # 调用已知代币合约的ERC-20 transfer
+        if to_addr in token_contracts and tx_input.startswith(ERC20_TRANSFER_SELECTOR):
+            return token_contracts[to_addr]
+        
+        # 无调用数据且value>0的原生ETH转账
+        value = str(tx.get("value", "0"))
+        if tx_input in ("", "0x") and value.isdigit() and int(value) > 0:
+            return "ETH"
+        
+        return None
+    
+    def _classify_coins_batch(self, tx_list):
+        """一次LLM调用批量判断多笔交易的币种，返回与输入顺序一致的币种列表"""
+        tx_lines = []
+        for i, tx_data in enumerate(tx_list):
+            amount = float(tx_data['value']) / 1e18 if tx_data['value'].isdigit() else tx_data['value']
+            tx_lines.append(f"{i}. 发送方: {tx_data['from']}, 接收方: {tx_data['to']}, 金额: {amount}")
+        
+        prompt = f"""
+        根据以下交易信息，判断每笔交易可能是哪种加密货币的交易:
+        
+        {chr(10).join(tx_lines)}
+        
+        每笔交易请从以下选项中选择一个: {', '.join(self.tracked_coins)}
+        
+        请按交易编号顺序返回一个JSON数组，只包含币种符号，数组长度必须为{len(tx_list)}，格式为<output>["币种符号", ...]</output>
+        """
+        
+        result = self.call_llm(prompt)
+        try:
+            coins = json.loads(self.extract_output(result, tag="output"))
+        except (json.JSONDecodeError, TypeError):
+            self.log_action("警告", "批量币种识别结果解析失败")
+            return []
+        
+        if not isinstance(coins, list) or len(coins) != len(tx_list):
+            self.log_action("警告", f"批量币种识别结果数量不匹配: 期望 {len(tx_list)}")
+            return []
+        
+        return [str(coin).strip() for coin in coins]
@@ -0,0 +1,162 @@
+import os
+import pathlib
+import queue
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+class SQLiteConnectionManager:
+    """
+    SQLite连接管理器：一个串行化的写连接 + 有界的只读连接池，
+    启用WAL模式，使读查询(警报检查、Web查询)不会被数据写入阻塞
+    """
+
+    def __init__(self, db_path, busy_timeout_ms=5000, mmap_size=268435456, cache_size_kb=20000, max_readers=8):
+        """
+        参数:
+        db_path (str): 数据库文件路径
+        busy_timeout_ms (int): 锁等待超时(毫秒)
+        mmap_size (int): 内存映射大小(字节)
+        cache_size_kb (int): 每个连接的页缓存大小(KB)
+        max_readers (int): 只读连接数上限，全部借出时最多等待busy_timeout_ms毫秒
+        """
+        self.db_path = db_path
+        self.busy_timeout_ms = busy_timeout_ms
+        self.mmap_size = mmap_size
+        self.cache_size_kb = cache_size_kb
+        self.max_readers = max(1, int(max_readers))
+        self._write_lock = threading.RLock()
+        self._writer = None
+        # 只读连接不绑定线程：Web请求线程和各线程池不断创建新线程，按线程缓存会无限增长
+        self._idle_readers = queue.LifoQueue()
+        self._readers_lock = threading.Lock()
+        self._readers = []
+        self._version_conn = None
+        self._version_lock = threading.Lock()
+
+        dir_name = os.path.dirname(db_path)
+        if dir_name and not os.path.exists(dir_name):
+            os.makedirs(dir_name)
+
+        # 先创建写连接：它负责建库并切换到WAL模式，只读连接依赖于此
+        self._get_writer()
+
+    def _configure(self, conn):
+        """设置连接级别的PRAGMA"""
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+        conn.execute(f"PRAGMA mmap_size={int(self.mmap_size)}")
+        conn.execute(f"PRAGMA cache_size=-{int(self.cache_size_kb)}")
+
+    def _get_writer(self):
+        """获取(必要时创建)写连接"""
+        with self._write_lock:
+            if self._writer is None:
+                conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=self.busy_timeout_ms / 1000)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+                self._configure(conn)
+                self._writer = conn
+            return self._writer
+
+    @contextmanager
+    def writer(self, on_commit=None):
+        """
+        独占使用写连接，退出时提交，出错时回滚
+
+        参数:
+        on_commit (callable, 可选): 提交成功后仍持有写锁时调用，多个写入者的回调按提交顺序执行
+        """
+        with self._write_lock:
+            conn = self._get_writer()
+            try:
+                yield conn
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            if on_commit is not None:
+                on_commit()
+
+    def _open_reader(self):
+        """创建只读连接"""
+        uri = pathlib.Path(os.path.abspath(self.db_path)).as_uri() + "?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False,
+                               timeout=self.busy_timeout_ms / 1000, isolation_level=None)
+        self._configure(conn)
+        return conn
+
+    @contextmanager
+    def reader(self):
+        """借出一个只读连接，退出时归还到连接池；等待超时抛出sqlite3.OperationalError"""
+        try:
+            conn = self._idle_readers.get_nowait()
+        except queue.Empty:
+            conn = None
+            with self._readers_lock:
+                if len(self._readers) < self.max_readers:
+                    conn = self._open_reader()
+                    self._readers.append(conn)
+            if conn is None:
+                # 与SQLite锁等待使用相同的超时，避免连接泄漏时请求线程永久挂起
+                try:
+                    conn = self._idle_readers.get(timeout=self.busy_timeout_ms / 1000)
+                except queue.Empty:
+                    raise sqlite3.OperationalError(
+                        f"等待只读连接超时: {self.max_readers}个只读连接在{self.busy_timeout_ms}毫秒内均未归还") from None
+        try:
+            yield conn
+        finally:
+            with self._readers_lock:
+                # 连接池已关闭时不再归还
+                if conn in self._readers:
+                    self._idle_readers.put(conn)
+                    conn = None
+            if conn is not None:
+                conn.close()
+
+    def reader_count(self):
+        """已创建的只读连接数"""
+        with self._readers_lock:
+            return len(self._readers)
+
+    def data_version(self):
+        """
+        数据库内容的版本号：任何连接(包括本进程的写连接和其他进程)提交写入后都会变化，
+        用于缓存失效。使用专用连接，保证前后两次读取的值可以比较
+        """
+        with self._version_lock:
+            if self._version_conn is None:
+                self._version_conn = sqlite3.connect(self.db_path, check_same_thread=False,
+                                                     timeout=self.busy_timeout_ms / 1000)
+            return self._version_conn.execute("PRAGMA data_version").fetchone()[0]
+
+    @staticmethod
+    def is_read_query(query):
+        """判断SQL是否为只读查询"""
+        statement = query.strip().upper()
+        if statement.startswith(("SELECT", "EXPLAIN")):
+            return True
+        if statement.startswith("WITH"):
+            return not re.search(r"\b(INSERT|UPDATE|DELETE|REPLACE)\b", statement)
+        # 不带赋值的PRAGMA(如 PRAGMA table_info)是只读的
+        return statement.startswith("PRAGMA") and "=" not in statement
+
+    def close_all(self):
+        """关闭所有连接"""
+        with self._readers_lock:
+            for conn in self._readers:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+            self._readers = []
+            self._idle_readers = queue.LifoQueue()
+        with self._version_lock:
+            if self._version_conn is not None:
+                self._version_conn.close()
+                self._version_conn = None
+        with self._write_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
@@ -245,6 +245,18 @@ const predefinedConnections = [
 // 图表相关变量
 let width, height, svg, link, node, messages;
 let interactionHistory = [];
+// 等待结果的任务: job_id -> 回调
+let pendingJobs = {};
+// 提交请求的HTTP响应返回前到达的任务事件，登记任务后补放
+let earlyChunks = {};
+let earlyFinishedJobs = {};
+// 任务处理阶段(job.progress.stage)的显示文字
+const jobStageLabels = {
+  parsed: "已解析请求...",
+  routed: "已转发给中央代理...",
+  agent_result: "已收到代理结果...",
+  formatting: "正在生成回复...",
+};
 let agentRelations = [];
 let activeDataFlows = [];
 
@@ -319,17 +331,98 @@ function initializeSocket() {
     try {
       // 只有用户已交互后才处理消息
       if (userInteractionStarted) {
-        const interaction = typeof data === "string" ? JSON.parse(data) : data;
-        processInteraction(interaction);
+        const payload = typeof data === "string" ? JSON.parse(data) : data;
+        // 拦截器按帧批量推送，一帧是事件数组
+        const interactions = Array.isArray(payload) ? payload : [payload];
+        interactions.forEach((interaction) => processInteraction(interaction));
       }
     } catch (e) {
       console.error("处理消息出错:", e);
     }
   });
 
+  // 任务状态更新：任务结束时交给提交方的回调处理
+  socket.on("job_update", (job) => {
+    const callback = pendingJobs[job.job_id];
+    if (!callback) {
+      if (["succeeded", "failed", "cancelled"].includes(job.status)) {
+        earlyFinishedJobs[job.job_id] = job;
+      }
+      return;
+    }
+    if (job.status === "running") {
+      const responseLog = document.getElementById("responseLog");
+      if (responseLog && !responseLog.querySelector(".response-content")) {
+        const stage = job.progress ? jobStageLabels[job.progress.stage] : null;
+        responseLog.innerHTML = `<div class="loading">${stage || "正在处理请求..."}</div>`;
+      }
+      return;
+    }
+    if (["succeeded", "failed", "cancelled"].includes(job.status)) {
+      delete pendingJobs[job.job_id];
+      callback(job);
+    }
+  });
+
+  // 流式回复：逐段追加到响应区域，不属于本页面待处理任务的片段先缓存，不改动响应区域
+  socket.on("response_chunk", (data) => {
+    if (!pendingJobs[data.stream_id]) {
+      (earlyChunks[data.stream_id] = earlyChunks[data.stream_id] || []).push(data.chunk);
+      return;
+    }
+    appendResponseChunk(data.stream_id, data.chunk);
+  });
+
+  // 流式回复结束：用完整回复替换拼接内容
+  socket.on("response_done", (data) => {
+    if (!pendingJobs[data.stream_id]) {
+      // 任务登记时由job_update回调显示完整回复
+      delete earlyChunks[data.stream_id];
+      return;
+    }
+    const responseLog = document.getElementById("responseLog");
+    if (!responseLog || !data.formatted_response) return;
+    const content = responseLog.querySelector(
+      `.response-content[data-stream-id="${data.stream_id}"]`
+    );
+    if (content) {
+      content.innerHTML = data.formatted_response;
+    }
+  });
+
   window.socket = socket;
 }
 
+// 把流式回复片段追加到响应区域
+function appendResponseChunk(streamId, chunk) {
+  const responseLog = document.getElementById("responseLog");
+  if (!responseLog) return;
+  let content = responseLog.querySelector(
+    `.response-content[data-stream-id="${streamId}"]`
+  );
+  if (!content) {
+    responseLog.innerHTML = "";
+    content = document.createElement("div");
+    content.className = "response-content";
+    content.dataset.streamId = streamId;
+    responseLog.appendChild(content);
+  }
+  content.textContent += chunk;
+}
+
+// 登记待处理任务，并补放登记前已到达的回复片段和结束状态
+function registerPendingJob(jobId, callback) {
+  pendingJobs[jobId] = callback;
+  (earlyChunks[jobId] || []).forEach((chunk) => appendResponseChunk(jobId, chunk));
+  delete earlyChunks[jobId];
+  const finished = earlyFinishedJobs[jobId];
+  if (finished) {
+    delete earlyFinishedJobs[jobId];
+    delete pendingJobs[jobId];
+    callback(finished);
+  }
+}
+
 // 初始化D3可视化图
 function initializeGraph() {
   // 获取容器尺寸
@@ -831,37 +924,56 @@ function handleRequestSubmission() {
     headers: {
       "Content-Type": "application/json",
     },
-    body: JSON.stringify({ message: requestContent }),
+    // 附带Socket.IO会话ID，任务状态和回复只推送给本页面
+    body: JSON.stringify({
+      message: requestContent,
+      socket_id: window.socket ? window.socket.id : null,
+    }),
   })
     .then((response) => response.json())
     .then((data) => {
-      // 清除加载状态
-      responseLog.innerHTML = "";
-
-      // 处理响应
       if (data.error) {
         responseLog.innerHTML = `<div class="error">${data.error}</div>`;
-      } else if (data.formatted_response) {
-        responseLog.innerHTML = `<div class="response-content">${data.formatted_response}</div>`;
-      } else {
-        responseLog.innerHTML = `<pre>${JSON.stringify(data, null, 2)}</pre>`;
+        return;
       }
 
-      // 让中央代理向其他代理发送消息的动画
-      setTimeout(() => {
-        const targetAgents = [
-          "InfoProcessAgent",
-          "AlarmAgent",
-          "AutoTradeAgent",
-          "DataCleanAgent",
-        ];
-        targetAgents.forEach((targetId) => {
-          const targetNode = agents.find((a) => a.id === targetId);
-          if (targetNode) {
-            animateDataFlow(centralNode, targetNode, centralNode.color);
+      // 请求已进入任务队列，结果通过job_update事件返回
+      responseLog.innerHTML = `<div class="loading">请求已排队 (${data.job_id})...</div>`;
+      registerPendingJob(data.job_id, (job) => {
+        const streamed = responseLog.querySelector(
+          `.response-content[data-stream-id="${job.job_id}"]`
+        );
+        const result = job.result || {};
+
+        // 处理响应
+        if (job.status === "cancelled") {
+          responseLog.innerHTML = `<div class="error">请求已取消</div>`;
+        } else if (job.status === "failed") {
+          responseLog.innerHTML = `<div class="error">请求处理失败: ${job.error}</div>`;
+        } else if (result.formatted_response) {
+          if (!streamed) {
+            responseLog.innerHTML = `<div class="response-content">${result.formatted_response}</div>`;
           }
-        });
-      }, 500);
+        } else {
+          responseLog.innerHTML = `<pre>${JSON.stringify(result, null, 2)}</pre>`;
+        }
+
+        // 让中央代理向其他代理发送消息的动画
+        setTimeout(() => {
+          const targetAgents = [
+            "InfoProcessAgent",
+            "AlarmAgent",
+            "AutoTradeAgent",
+            "DataCleanAgent",
+          ];
+          targetAgents.forEach((targetId) => {
+            const targetNode = agents.find((a) => a.id === targetId);
+            if (targetNode) {
+              animateDataFlow(centralNode, targetNode, centralNode.color);
+            }
+          });
+        }, 500);
+      });
     })
     .catch((error) => {
       responseLog.innerHTML = `<div class="error">请求处理失败: ${error.message}</div>`;
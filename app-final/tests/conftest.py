@@ -0,0 +1,26 @@
+import os
+import sys
+
+import pytest
+
+# 模块以扁平方式放在app-final/下，测试直接按模块名导入
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def app_env(tmp_path, monkeypatch):
+    """在临时目录中使用独立的配置和数据库构建代理"""
+    import api_caller
+    import async_agent
+    import transport
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(api_caller, "_shared_config", {"DEBUG_MODE": "False", "LLM_CACHE_ENABLED": "False"})
+    monkeypatch.setattr(api_caller, "_db_managers", {})
+    monkeypatch.setattr(api_caller, "_shared_api_caller", None)
+    monkeypatch.setattr(transport, "_transport", None)
+    monkeypatch.setattr(async_agent, "_runtime", None)
+    yield tmp_path
+    if async_agent._runtime is not None:
+        async_agent._runtime.close()
+    for manager in api_caller._db_managers.values():
+        manager.close_all()
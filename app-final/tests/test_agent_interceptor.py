@@ -0,0 +1,45 @@
+import json
+
+from agent_interceptor import AgentInterceptor
+
+
+def make_interceptor(frames):
+    interceptor = AgentInterceptor(batch_interval=0.05)
+    interceptor.delay_time = 0
+    interceptor.set_broadcast_func(frames.append)
+    return interceptor
+
+
+def test_message_is_snapshotted_at_enqueue():
+    frames = []
+    interceptor = make_interceptor(frames)
+    message = {"type": "info_update", "content": {"price": 1}}
+    interceptor.intercept_message("A", "B", message)
+    # 调用方在分发前修改原消息
+    message["content"]["price"] = 2
+    assert interceptor.flush()
+    assert json.loads(interceptor.get_messages()[0]["content"])["content"]["price"] == 1
+    assert json.loads(frames[0])[0]["content"] == interceptor.get_messages()[0]["content"]
+
+
+def test_api_response_is_snapshotted_at_enqueue():
+    interceptor = make_interceptor([])
+    response = {"result": [1]}
+    interceptor.intercept_api_response("A", "blockchain", response)
+    response["result"].append(2)
+    assert interceptor.flush()
+    assert json.loads(interceptor.get_api_calls()[0]["content"]["response"]) == {"result": [1]}
+
+
+def test_uncopyable_content_is_formatted():
+    class Uncopyable:
+        def __deepcopy__(self, memo):
+            raise TypeError("no copy")
+
+        def __str__(self):
+            return "uncopyable"
+
+    interceptor = make_interceptor([])
+    interceptor.intercept_message("A", "B", Uncopyable())
+    assert interceptor.flush()
+    assert interceptor.get_messages()[0]["content"] == "uncopyable"
@@ -0,0 +1,193 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+from alarm_engine import (AlarmScheduler, _PredicateParser, _tokenize, build_group_query, compile_condition,
+                          compile_predicate)
+
+ROWS = [
+    ("0x1", "0xa", "0xb", 5000.0, "ETH", 1, 100),
+    ("0x2", "0xa", "0xc", 10.0, "USDT", 2, 200),
+    ("0x3", "0xd", None, 2000.0, "USDC", 3, 300),
+    ("0x4", "0xe", "0xb", None, "ETH", 4, 400),
+    # REAL列中存入了无法转换为数值的文本
+    ("0x5", "0xf", "100", "n/a", "1", 5, 500),
+]
+COLUMNS = ("tx_hash", "from_address", "to_address", "value", "coin", "block_number", "timestamp")
+TYPES = ("TEXT PRIMARY KEY", "TEXT", "TEXT", "REAL", "TEXT", "INTEGER", "INTEGER")
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    columns = ", ".join(f"{column} {type_}" for column, type_ in zip(COLUMNS, TYPES))
+    conn.execute(f"CREATE TABLE whale_transactions ({columns})")
+    conn.executemany("INSERT INTO whale_transactions VALUES (?, ?, ?, ?, ?, ?, ?)", ROWS)
+    return conn
+
+
+@pytest.mark.parametrize("where", [
+    "value > 1000",
+    "w.value >= 2000 AND coin = 'ETH'",
+    "coin IN ('USDT', 'USDC') OR value > 4000",
+    "coin NOT IN ('ETH')",
+    "to_address IS NULL",
+    "NOT (value < 100) AND to_address IS NOT NULL",
+    "value != 10",
+    "value > 1000 OR value < 100",
+    "to_address = from_address OR value > block_number",
+    "NOT (value > 1000)",
+    "coin NOT IN ('ETH') OR NOT value < 100",
+    "NOT (value > 1000 OR to_address IS NULL)",
+])
+def test_predicate_matches_sql(conn, where):
+    condition = f"SELECT * FROM whale_transactions w WHERE {where}"
+    plan = compile_condition(condition)
+    assert plan["incremental"] and plan["predicate"] is not None
+
+    expected = {row[0] for row in conn.execute(plan["hash_sql"], (0, len(ROWS)))}
+    actual = {row[0] for row in ROWS if plan["predicate"](dict(zip(COLUMNS, row)))}
+    assert actual == expected
+
+
+@pytest.mark.parametrize("where", [
+    "value > '1000'",
+    "coin = 1",
+    "to_address > 50",
+    "coin IN ('ETH', 1)",
+    "value IN (1, '2')",
+    "value > coin",
+])
+def test_mixed_type_comparisons_use_sql(where):
+    condition = f"SELECT * FROM whale_transactions WHERE {where}"
+    plan = compile_condition(condition)
+    # SQLite按列的亲和性转换后再比较，这类条件仍增量检查，但由SQL求值
+    assert plan["incremental"] and plan["predicate"] is None
+
+
+def test_incremental_sql_only_scans_rowid_range(conn):
+    plan = compile_condition("SELECT * FROM whale_transactions WHERE value > 1000 ORDER BY timestamp;")
+    assert plan["table"] == "whale_transactions"
+    assert len(conn.execute(plan["sql"], (0, 4)).fetchall()) == 2
+    assert [row[0] for row in conn.execute(plan["hash_sql"], (1, 4))] == ["0x3"]
+
+
+@pytest.mark.parametrize("condition", [
+    "SELECT COUNT(*) FROM whale_transactions WHERE value > 1000",
+    "SELECT * FROM whale_transactions WHERE value > 1000 LIMIT 1 OFFSET 2",
+    "SELECT * FROM whale_transactions WHERE value > 1000 LIMIT 0",
+    "SELECT coin FROM whale_transactions GROUP BY coin HAVING SUM(value) > 1000",
+    "SELECT * FROM whale_transactions w JOIN cex_withdrawals c ON w.tx_hash = c.tx_hash",
+    "SELECT * FROM coin_info WHERE price > 1",
+    "SELECT * FROM whale_transactions WHERE value > (SELECT AVG(value) FROM whale_transactions)",
+])
+def test_non_incremental_conditions_use_full_count(conn, condition):
+    plan = compile_condition(condition)
+    assert not plan["incremental"]
+    assert plan["predicate"] is None
+    assert plan["sql"].startswith("SELECT COUNT(*) as count FROM (")
+
+
+def test_trailing_limit_keeps_incremental_plan(conn):
+    # CentralAgent的默认警报条件
+    plan = compile_condition("SELECT * FROM whale_transactions WHERE value > 10000 LIMIT 1")
+    assert plan["incremental"] and plan["predicate"] is not None
+    assert "LIMIT" not in plan["sql"].upper()
+    assert compile_condition("select * from whale_transactions w where w.value > 1000 limit 5;")["incremental"]
+
+
+@pytest.mark.parametrize("where", [
+    "abs(value) > 1",
+    "value LIKE '1%'",
+    "day_bucket = 1",
+    "other.value > 1",
+    "value >",
+    "(value > 1",
+    "value NOT > 1",
+])
+def test_unsupported_where_falls_back_to_sql(where):
+    assert compile_predicate(where, "whale_transactions", "w") is None
+
+
+def test_generated_column_keeps_incremental_sql(conn):
+    plan = compile_condition("SELECT * FROM whale_transactions WHERE day_bucket = 1")
+    assert plan["incremental"]
+    assert plan["predicate"] is None
+
+
+def test_empty_where_matches_every_row():
+    assert compile_predicate(None, "whale_transactions")({"value": None})
+
+
+def test_parser_rejects_trailing_tokens():
+    with pytest.raises(ValueError):
+        _PredicateParser(_tokenize("value > 1 value"), {"value": "numeric"}).parse()
+
+
+def test_group_query_returns_one_count_per_slot(conn):
+    plans = [compile_condition("SELECT * FROM whale_transactions WHERE value > 1000"),
+             compile_condition("SELECT * FROM whale_transactions WHERE coin = 'ETH'")]
+    rows = conn.execute(build_group_query(plans), (0, 4, 2, 4)).fetchall()
+    assert dict(rows) == {0: 2, 1: 1}
+
+
+def test_scheduler_pops_due_alarms_in_time_order():
+    scheduler = AlarmScheduler()
+    now = time.time()
+    scheduler.schedule("late", {}, now + 60)
+    scheduler.schedule("b", {}, now - 1)
+    scheduler.schedule("a", {}, now - 2)
+    assert [alarm_id for alarm_id, _ in scheduler.pop_due(timeout=0)] == ["a", "b"]
+    assert len(scheduler) == 1
+    scheduler.clear()
+    assert len(scheduler) == 0
+
+
+def test_scheduler_waits_only_until_next_due():
+    scheduler = AlarmScheduler()
+    scheduler.schedule("soon", {}, time.time() + 0.1)
+    started = time.time()
+    assert [alarm_id for alarm_id, _ in scheduler.pop_due(timeout=5)] == ["soon"]
+    assert time.time() - started < 1
+
+
+def test_scheduling_earlier_alarm_wakes_waiter():
+    scheduler = AlarmScheduler()
+    scheduler.schedule("late", {}, time.time() + 60)
+    result = []
+    waiter = threading.Thread(target=lambda: result.extend(scheduler.pop_due(timeout=5)))
+    started = time.time()
+    waiter.start()
+    time.sleep(0.05)
+    scheduler.schedule("now", {}, time.time())
+    waiter.join()
+    assert [alarm_id for alarm_id, _ in result] == ["now"]
+    assert time.time() - started < 1
+
+
+def test_wake_returns_without_due_alarms():
+    scheduler = AlarmScheduler()
+    waiter = threading.Thread(target=scheduler.pop_due, kwargs={"timeout": 5})
+    started = time.time()
+    waiter.start()
+    time.sleep(0.05)
+    scheduler.wake()
+    waiter.join()
+    assert time.time() - started < 1
+
+
+def test_alarms_are_checked_at_their_own_interval(app_env):
+    from alarm_agent import AlarmAgent
+    agent = AlarmAgent()
+    checks = []
+    agent._check_alarm = lambda alarm_id, alarm_data: checks.append(alarm_id)
+    agent.set_alarm({"id": "fast", "condition": "SELECT * FROM coin_info", "interval": 0.1})
+    agent.set_alarm({"id": "slow", "condition": "SELECT * FROM coin_info", "interval": 60})
+    time.sleep(0.55)
+    # 替换后旧的调度条目被丢弃，不会重复检查
+    agent.set_alarm({"id": "slow", "condition": "SELECT * FROM coin_info", "interval": 60})
+    time.sleep(0.2)
+    agent.stop_monitoring()
+    assert checks.count("fast") >= 4
+    assert checks.count("slow") == 2
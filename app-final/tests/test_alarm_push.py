@@ -0,0 +1,68 @@
+import time
+
+from alarm_agent import AlarmAgent
+from data_clean_agent import DataCleanAgent
+
+
+def whale_batch(*hashes, value="5000000000000000000000"):
+    return {"type": "whale_activities",
+            "data": {"whale_transactions": [{"hash": tx_hash, "from": "0xa", "to": "0xb", "value": value,
+                                              "blockNumber": "1", "timeStamp": "1650000000"}
+                                             for tx_hash in hashes]}}
+
+
+def start_alarm(clean):
+    alarm = AlarmAgent()
+    alarm.set_agents(None, clean)
+    return alarm
+
+
+def wait_swept(alarm, alarm_id, timeout=5):
+    deadline = time.time() + timeout
+    while not alarm.monitoring_tasks[alarm_id]["swept"]:
+        assert time.time() < deadline, "补查未完成"
+        time.sleep(0.01)
+
+
+def test_only_new_rows_are_published(app_env):
+    clean = DataCleanAgent()
+    published = []
+    clean.subscribe_inserts(lambda table, rows: published.append([row["tx_hash"] for row in rows]))
+
+    clean.process_data(whale_batch("0x1", "0x2"))
+    clean.process_data(whale_batch("0x1", "0x2", "0x3"))
+
+    assert published == [["0x1", "0x2"], ["0x3"]]
+
+
+def test_replayed_batch_triggers_once(app_env):
+    clean = DataCleanAgent()
+    alarm = start_alarm(clean)
+    alarm.set_alarm({"id": "big", "condition": "SELECT * FROM whale_transactions WHERE value > 1000"})
+    wait_swept(alarm, "big")
+
+    clean.process_data(whale_batch("0x1", "0x2"))
+    clean.process_data(whale_batch("0x1", "0x2"))
+
+    assert alarm.monitoring_tasks["big"]["trigger_count"] == 1
+    alarm.stop_monitoring()
+
+
+def test_replay_after_restart_does_not_retrigger(app_env):
+    clean = DataCleanAgent()
+    alarm = start_alarm(clean)
+    alarm.set_alarm({"id": "big", "condition": "SELECT * FROM whale_transactions WHERE value > 1000"})
+    wait_swept(alarm, "big")
+    clean.process_data(whale_batch("0x1", "0x2"))
+    alarm.stop_monitoring()
+    clean._insert_subscribers.clear()
+
+    restarted = start_alarm(clean)
+    restarted.resume_monitoring()
+    wait_swept(restarted, "big")
+    clean.process_data(whale_batch("0x1", "0x2"))
+    assert restarted.monitoring_tasks["big"]["trigger_count"] == 1
+
+    clean.process_data(whale_batch("0x3"))
+    assert restarted.monitoring_tasks["big"]["trigger_count"] == 2
+    restarted.stop_monitoring()
@@ -0,0 +1,55 @@
+import api_caller
+import pytest
+
+
+class FakeResponse:
+    status_code = 200
+    headers = {}
+
+    def __init__(self, data):
+        self.data = data
+
+    def json(self):
+        return self.data
+
+
+class FakeSession:
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.calls = 0
+
+    def get(self, url, params=None, timeout=None):
+        self.calls += 1
+        return FakeResponse(self.responses.pop(0))
+
+
+@pytest.fixture
+def caller(app_env, monkeypatch):
+    api_caller._shared_config.update({"BLOCKCHAIN_API_BASE": "https://api.example.com/api",
+                                      "BLOCKCHAIN_API_KEY": "key"})
+    monkeypatch.setattr(api_caller, "_shared_rate_limiter", None)
+    return api_caller.get_api_caller()
+
+
+@pytest.mark.parametrize("error", [
+    {"status": "0", "message": "NOTOK", "result": "Invalid API Key"},
+    {"status": "0", "message": "NOTOK", "result": "Error! Invalid address format"},
+])
+def test_status_zero_errors_are_not_cached(caller, monkeypatch, error):
+    ok = {"status": "1", "message": "OK", "result": []}
+    session = FakeSession([error, ok])
+    monkeypatch.setattr(api_caller, "get_http_session", lambda url: session)
+    params = {"module": "account", "action": "txlist"}
+    assert caller.call_blockchain_api("txlist", params) == error
+    assert caller.call_blockchain_api("txlist", params) == ok
+    assert session.calls == 2
+
+
+def test_empty_result_is_cached(caller, monkeypatch):
+    empty = {"status": "0", "message": "No transactions found", "result": []}
+    session = FakeSession([empty])
+    monkeypatch.setattr(api_caller, "get_http_session", lambda url: session)
+    params = {"module": "account", "action": "txlist"}
+    assert caller.call_blockchain_api("txlist", params) == empty
+    assert caller.call_blockchain_api("txlist", params) == empty
+    assert session.calls == 1
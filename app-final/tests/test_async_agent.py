@@ -0,0 +1,85 @@
+import asyncio
+import json
+import time
+
+import async_agent
+import pytest
+from transport import InProcessTransport
+
+
+class RecordingAgent:
+    is_async = False
+
+    def __init__(self):
+        self.name = "DataCleanAgent"
+        self.messages = []
+
+    def receive_message(self, message):
+        self.messages.append(message)
+        return {"status": "success"}
+
+
+@pytest.fixture
+def runtime(app_env):
+    return async_agent.get_runtime()
+
+
+def coin_info_update(*symbols):
+    return {"coin_info": {"top_tokens": [{"symbol": symbol, "name": symbol.lower()} for symbol in symbols],
+                          "price_info": {}}}
+
+
+def test_import_does_not_require_httpx():
+    import async_api_caller
+    assert not hasattr(async_api_caller, "httpx")
+
+
+def test_blockchain_calls_go_through_sync_caller(runtime):
+    caller = runtime.get_api_caller()
+    calls = []
+    caller.sync_caller.call_blockchain_api = lambda endpoint, params: calls.append((endpoint, params)) or {"status": "1"}
+    assert runtime.run(caller.call_blockchain_api("txlist", {"module": "account"})) == {"status": "1"}
+    assert calls == [("txlist", {"module": "account"})]
+
+
+def test_basic_coin_info_agent_enriches_coins_concurrently(runtime):
+    from basic_coin_info_agent import BasicCoinInfoAgent
+
+    async def fake_llm(prompt, use_cache=True):
+        await asyncio.sleep(0.2)
+        return "<o>" + json.dumps({"description": "d", "features": "f"}) + "</o>"
+
+    runtime.get_api_caller().call_llm_api = fake_llm
+    agent = BasicCoinInfoAgent()
+    data_clean = RecordingAgent()
+    agent.set_data_clean_agent(data_clean)
+
+    started = time.time()
+    result = InProcessTransport().send(agent, {"type": "info_update", "content": coin_info_update("ETH", "USDT", "USDC", "LINK")})
+    assert result["status"] == "success"
+    assert time.time() - started < 0.5
+
+    coins = {coin["symbol"]: coin for coin in data_clean.messages[0]["content"]["data"]["coins"]}
+    assert coins["ETH"]["description"] == "d"
+    assert "description" not in coins["LINK"]
+    # 同步调用方仍可以查询
+    assert InProcessTransport().send(agent, {"type": "get_coin_info", "content": {"coin": "USDT"}})["status"] == "success"
+
+
+def test_sync_base_methods_are_not_overridden(runtime):
+    from basic_coin_info_agent import BasicCoinInfoAgent
+    agent = BasicCoinInfoAgent()
+    assert not asyncio.iscoroutinefunction(agent.send_message)
+    assert not asyncio.iscoroutinefunction(agent.call_llm)
+
+
+def test_handler_errors_propagate_to_sync_caller(runtime):
+    class FailingAgent(async_agent.AsyncBaseAgent):
+        async def receive_message(self, message):
+            raise ValueError("boom")
+
+        def process(self, data=None):
+            return None
+
+    with pytest.raises(ValueError):
+        FailingAgent("Failing").receive_message_sync({"type": "x"})
@@ -0,0 +1,66 @@
+from block_cursor import BlockCursorStore, fetch_incremental, merge_window
+
+
+class MemoryCursorStore(BlockCursorStore):
+    def __init__(self):
+        self.cursors = {}
+
+    def get(self, stream):
+        return self.cursors.get(stream)
+
+    def save(self, stream, last_block, last_tx_hash, block_hashes):
+        self.cursors[stream] = {"last_block": last_block, "last_tx_hash": last_tx_hash,
+                                "block_hashes": set(block_hashes)}
+        return {"affected_rows": 1}
+
+
+class FakeApiCaller:
+    def __init__(self, txs):
+        self.txs = txs
+
+    def call_blockchain_api(self, endpoint, params):
+        start = int(params["startblock"])
+        txs = [tx for tx in self.txs if int(tx["blockNumber"]) >= start]
+        txs.sort(key=lambda tx: int(tx["blockNumber"]), reverse=params["sort"] == "desc")
+        offset = int(params["offset"])
+        page = int(params["page"])
+        return {"status": "1", "message": "OK", "result": txs[(page - 1) * offset:page * offset]}
+
+
+def tx(block, tx_hash):
+    return {"blockNumber": str(block), "hash": tx_hash}
+
+
+def test_fetch_does_not_move_cursor_until_committed():
+    store = MemoryCursorStore()
+    api = FakeApiCaller([tx(1, "a"), tx(2, "b")])
+
+    response, pending = fetch_incremental(api, store, "s", "txlist", {})
+    assert [t["hash"] for t in response["result"]] == ["b", "a"]
+    assert store.get("s") is None
+
+    # 未确认时下次重新拉取同一批交易
+    response, pending = fetch_incremental(api, store, "s", "txlist", {})
+    assert [t["hash"] for t in response["result"]] == ["b", "a"]
+
+    store.commit(pending)
+    assert store.get("s")["last_block"] == 2
+
+    api.txs.append(tx(2, "c"))
+    response, pending = fetch_incremental(api, store, "s", "txlist", {})
+    assert [t["hash"] for t in response["result"]] == ["c"]
+    assert pending["block_hashes"] == {"b", "c"}
+
+
+def test_fetch_without_new_transactions_has_no_pending_cursor():
+    store = MemoryCursorStore()
+    store.save("s", 2, "b", {"b"})
+    response, pending = fetch_incremental(FakeApiCaller([tx(2, "b")]), store, "s", "txlist", {})
+    assert response["result"] == []
+    assert pending is None
+    assert store.commit(pending) == {"affected_rows": 0}
+
+
+def test_merge_window_dedupes_and_bounds_size():
+    window = merge_window([tx(2, "b"), tx(1, "a")], [tx(3, "c"), tx(2, "b")], size=2)
+    assert [t["hash"] for t in window] == ["c", "b"]
@@ -0,0 +1,88 @@
+import sqlite3
+
+import pytest
+from fast_router import FastRouter
+
+ADDRESS = "0x" + "ab" * 20
+
+
+@pytest.fixture
+def router():
+    return FastRouter(threshold=0.8)
+
+
+@pytest.mark.parametrize("query", [
+    "买入 1 ETH",
+    "不要买ETH",
+    f"转账 1 ETH 给 {ADDRESS}",
+    "提币 2 ETH",
+    "我想买卖分析一下ETH",
+])
+def test_trade_operation_never_skips_llm(router, query):
+    route = router.route(query)
+    assert route["request_type"] == "trade_operation"
+    assert not router.is_confident(route)
+
+
+@pytest.mark.parametrize("query, action", [
+    ("买入 1 ETH", "buy"),
+    ("卖出 2 BTC", "sell"),
+    ("不要买ETH", None),
+    ("别卖出BTC", None),
+    ("don't sell ETH", None),
+    (f"转账 1 ETH 给 {ADDRESS}", None),
+    ("提币 2 ETH", None),
+    ("我想买卖分析一下ETH", None),
+    ("先卖出BTC再买入ETH", None),
+])
+def test_trade_action_requires_explicit_non_negated_keyword(router, query, action):
+    assert router.route(query)["parameters"].get("action") == action
+    assert router.extract_slot("trade_operation", "action", query) == action
+
+
+def test_sql_stops_at_non_sql_text(router):
+    route = router.route("select * from whale_transactions where value>1000 的警报")
+    assert route["request_type"] == "set_alarm"
+    assert route["parameters"]["condition"] == "select * from whale_transactions where value>1000"
+
+
+def test_sql_keeps_quoted_literals(router):
+    sql = "select * from coin_info where name = '以太坊'"
+    assert router.extract_entities(f"{sql}，帮我查一下")["sql"] == sql
+
+
+def test_sql_rejected_by_validator_is_not_a_confident_slot():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE whale_transactions (value REAL)")
+
+    def validator(sql):
+        try:
+            conn.execute(f"EXPLAIN {sql}")
+            return True
+        except sqlite3.Error:
+            return False
+
+    router = FastRouter(threshold=0.8, sql_validator=validator)
+    assert router.route("select * from whale_transactions where value > 1000")["request_type"] == "sql_query"
+    route = router.route("select * from whale_transactions where value > 1000 please alert me")
+    assert "condition" not in route["parameters"]
+    assert not (route["request_type"] == "sql_query" and router.is_confident(route))
+
+
+def test_unbalanced_quotes_are_not_sql(router):
+    assert router.extract_entities("select * from coin_info where name = 'ETH")["sql"] is None
+
+
+def test_single_ticker_routes_to_coin_info(router):
+    route = router.route("ETH")
+    assert route["request_type"] == "coin_info"
+    assert route["parameters"] == {"coin": "ETH"}
+    assert router.is_confident(route)
+
+
+def test_stats_count_llm_fallback_for_trades(router):
+    router.route("买入 1 ETH")
+    router.route("ETH")
+    stats = router.get_stats()
+    assert stats["fast_path"] == 1
+    assert stats["llm_fallback"] == 1
@@ -0,0 +1,60 @@
+from frequency_window import SlidingWindowCounter
+
+
+def add(counter, tx_hash, timestamp, *addresses):
+    return counter.add(tx_hash, timestamp, [(address, {"hash": tx_hash}) for address in addresses])
+
+
+def test_duplicate_hashes_are_counted_once():
+    counter = SlidingWindowCounter(window_seconds=100)
+    assert add(counter, "a", 10, "x", "y")
+    assert not add(counter, "a", 10, "x", "y")
+    assert not add(counter, "", 10, "x")
+    assert counter.count("x") == 1
+    assert counter.count("y") == 1
+
+
+def test_events_expire_relative_to_latest_timestamp():
+    counter = SlidingWindowCounter(window_seconds=100)
+    add(counter, "a", 10, "x")
+    add(counter, "b", 50, "x", "y")
+    assert counter.count("x") == 2
+
+    add(counter, "c", 130, "y")
+    assert counter.count("x") == 1
+    assert counter.count("y") == 2
+    assert [record["hash"] for record in counter.recent("x")] == ["b"]
+
+    # 早于窗口的交易直接忽略
+    assert not add(counter, "d", 20, "x")
+    add(counter, "e", 300, "z")
+    assert counter.count("x") == 0
+    assert len(counter) == 1
+
+
+def test_recent_is_bounded_and_newest_first():
+    counter = SlidingWindowCounter(window_seconds=1000, max_recent_per_address=3)
+    for i in range(5):
+        add(counter, f"t{i}", i, "x")
+    assert counter.count("x") == 5
+    assert [record["hash"] for record in counter.recent("x")] == ["t4", "t3", "t2"]
+    assert [record["hash"] for record in counter.recent("x", limit=1)] == ["t4"]
+
+
+def test_top_orders_by_count_and_skips_stale_entries():
+    counter = SlidingWindowCounter(window_seconds=100)
+    add(counter, "a", 1, "x")
+    add(counter, "b", 2, "x", "y")
+    add(counter, "c", 3, "x", "y", "z")
+    assert counter.top() == ["x", "y", "z"]
+    assert counter.top(min_count=2) == ["x", "y"]
+    assert counter.top(limit=1) == ["x"]
+    # 重复查询结果一致
+    assert counter.top(min_count=2) == ["x", "y"]
+
+    # x的两笔交易过期后排名随之变化
+    add(counter, "d", 102.5, "y")
+    assert counter.count("x") == 1
+    assert counter.top(min_count=2) == ["y"]
+    top = counter.top()
+    assert top[0] == "y" and sorted(top[1:]) == ["x", "z"]
@@ -0,0 +1,86 @@
+import threading
+import time
+
+import pytest
+
+
+@pytest.fixture
+def agent(app_env):
+    from info_process_agent import InfoProcessAgent
+    return InfoProcessAgent()
+
+
+def test_forced_refresh_does_not_join_plain_refresh(agent):
+    calls = []
+    started = threading.Event()
+
+    def fake_refresh(force):
+        calls.append(force)
+        started.set()
+        time.sleep(0.2)
+        return {"status": "success", "force": force}
+
+    agent._do_refresh = fake_refresh
+    plain = threading.Thread(target=agent._refresh, kwargs={"force": False})
+    plain.start()
+    started.wait(1)
+    assert agent.update_info() == {"status": "success", "force": True}
+    plain.join()
+    # 普通刷新结束后才开始强制刷新，两者不重叠
+    assert calls == [False, True]
+
+
+def test_concurrent_plain_refreshes_are_coalesced(agent):
+    calls = []
+
+    def fake_refresh(force):
+        calls.append(force)
+        time.sleep(0.2)
+        return {"status": "success"}
+
+    agent._do_refresh = fake_refresh
+    threads = [threading.Thread(target=agent._refresh) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert calls == [False]
+
+
+class SlowAgent:
+    is_async = False
+
+    def __init__(self, name, fail=False):
+        self.name = name
+        self.fail = fail
+        self.messages = []
+
+    def receive_message(self, message):
+        time.sleep(0.2)
+        if self.fail:
+            raise RuntimeError("down")
+        self.messages.append(message["type"])
+        return {"status": "success"}
+
+
+def test_snapshot_is_distributed_concurrently(agent):
+    targets = [SlowAgent(f"Agent{i}") for i in range(4)]
+    for target in targets:
+        agent.register_agent(target)
+    started = time.time()
+    assert agent._distribute({"market_info": {}}) is True
+    assert time.time() - started < 0.5
+    assert all(target.messages == ["info_update"] for target in targets)
+
+
+def test_failed_delivery_is_reported(agent):
+    agent.register_agent(SlowAgent("Ok"))
+    agent.register_agent(SlowAgent("Broken", fail=True))
+    assert agent._distribute({}) is False
+
+
+def test_sync_callers_reach_agent_through_runtime(agent):
+    from transport import InProcessTransport
+    agent._do_refresh = lambda force: {"status": "success", "force": force}
+    result = InProcessTransport().send(agent, {"type": "request_info_update", "content": {}})
+    assert result == {"status": "success", "force": True}
@@ -0,0 +1,137 @@
+import threading
+import time
+
+import pytest
+from job_engine import JobEngine
+
+
+def wait_for(engine, job_id, status, timeout=2.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = engine.get(job_id)
+        if job["status"] == status:
+            return job
+        time.sleep(0.01)
+    pytest.fail(f"{job_id} did not reach {status}: {engine.get(job_id)}")
+
+
+@pytest.fixture
+def engine():
+    engine = JobEngine(max_workers=1, max_queue=1)
+    yield engine
+    engine.shutdown(wait=True)
+
+
+def blocking_job(started, release):
+    def run(job):
+        started.set()
+        release.wait(2)
+        return "done"
+    return run
+
+
+def test_cancel_queued_job_never_runs(engine):
+    started, release = threading.Event(), threading.Event()
+    first = engine.submit(blocking_job(started, release))["job_id"]
+    started.wait(1)
+    ran = []
+    second = engine.submit(lambda job: ran.append(job.id))["job_id"]
+
+    assert engine.cancel(second)["status"] == "success"
+    assert engine.get(second)["status"] == "cancelled"
+    release.set()
+    assert wait_for(engine, first, "succeeded")["result"] == "done"
+    assert ran == []
+    assert engine.get_stats()["cancelled"] == 1
+
+
+def test_cancel_running_job_stops_at_checkpoint(engine):
+    started = threading.Event()
+    steps = []
+
+    def run(job):
+        started.set()
+        for step in range(100):
+            job.check_cancelled()
+            steps.append(step)
+            time.sleep(0.01)
+        return "finished"
+
+    job_id = engine.submit(run)["job_id"]
+    started.wait(1)
+    assert engine.cancel(job_id)["status"] == "success"
+    job = wait_for(engine, job_id, "cancelled")
+    assert job["result"] is None
+    assert len(steps) < 100
+
+
+def test_result_is_dropped_when_cancelled_after_last_checkpoint(engine):
+    started, release = threading.Event(), threading.Event()
+    job_id = engine.submit(blocking_job(started, release))["job_id"]
+    started.wait(1)
+    engine.cancel(job_id)
+    release.set()
+    assert wait_for(engine, job_id, "cancelled")["result"] is None
+
+
+def test_cancel_finished_or_unknown_job_is_an_error(engine):
+    job_id = engine.submit(lambda job: 1)["job_id"]
+    wait_for(engine, job_id, "succeeded")
+    assert engine.cancel(job_id)["status"] == "error"
+    assert engine.cancel("job-missing")["status"] == "error"
+
+
+def test_full_queue_rejects_submissions(engine):
+    started, release = threading.Event(), threading.Event()
+    engine.submit(blocking_job(started, release))
+    started.wait(1)
+    engine.submit(lambda job: None)
+    assert engine.submit(lambda job: None)["status"] == "error"
+    assert engine.get_stats()["rejected"] == 1
+    release.set()
+
+
+def test_notify_reports_status_transitions():
+    events = []
+    engine = JobEngine(max_workers=1, notify=lambda event, payload, owner: events.append((payload["status"], owner)))
+    job_id = engine.submit(lambda job: 1, owner="sid-1")["job_id"]
+    wait_for(engine, job_id, "succeeded")
+    engine.shutdown(wait=True)
+    # 提交线程和工作线程分别推送当时的状态，只有工作线程内的顺序是确定的
+    assert len(events) == 3
+    assert ("running", "sid-1") in events and events[-1] == ("succeeded", "sid-1")
+
+
+def test_cancel_is_rejected_after_side_effects_start(engine):
+    started, release = threading.Event(), threading.Event()
+
+    def run(job):
+        job.disable_cancel()
+        started.set()
+        release.wait(2)
+        return "placed"
+
+    job_id = engine.submit(run)["job_id"]
+    started.wait(1)
+    assert engine.cancel(job_id)["status"] == "error"
+    release.set()
+    job = wait_for(engine, job_id, "succeeded")
+    assert job["result"] == "placed" and job["cancellable"] is False
+
+
+def test_disable_cancel_raises_when_already_cancelled(engine):
+    started, release = threading.Event(), threading.Event()
+    effects = []
+
+    def run(job):
+        started.set()
+        release.wait(2)
+        job.disable_cancel()
+        effects.append(job.id)
+
+    job_id = engine.submit(run)["job_id"]
+    started.wait(1)
+    engine.cancel(job_id)
+    release.set()
+    wait_for(engine, job_id, "cancelled")
+    assert effects == []
@@ -0,0 +1,128 @@
+from types import SimpleNamespace
+
+import api_caller
+import llm_cache
+import pytest
+from llm_cache import LLMCache
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(llm_cache.time, "time", clock.time)
+    return clock
+
+
+def disk_keys(cache):
+    return {row[0] for row in cache._disk.execute("SELECT response FROM llm_cache")}
+
+
+def test_whitespace_variants_share_an_entry():
+    cache = LLMCache()
+    cache.set("分析  ETH\n价格 ", "m", "r")
+    assert cache.get(" 分析 ETH 价格", "m") == "r"
+    assert cache.get("分析 ETH 价格", "other-model") is None
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LLMCache(max_entries=2, ttl=0)
+    cache.set("a", "m", "A")
+    cache.set("b", "m", "B")
+    assert cache.get("a", "m") == "A"
+    cache.set("c", "m", "C")
+    assert cache.get("b", "m") is None
+    assert cache.get("a", "m") == "A" and cache.get("c", "m") == "C"
+    assert cache.get_stats()["evictions"] == 1
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = LLMCache(ttl=10)
+    cache.set("a", "m", "A")
+    clock.now += 9
+    assert cache.get("a", "m") == "A"
+    clock.now += 1
+    assert cache.get("a", "m") is None
+    assert cache.get_stats()["memory_entries"] == 0
+
+
+def test_disk_tier_survives_new_instance(tmp_path, clock):
+    db_path = str(tmp_path / "cache" / "llm.db")
+    LLMCache(db_path=db_path, ttl=10).set("a", "m", "A")
+
+    restarted = LLMCache(db_path=db_path, ttl=10)
+    assert restarted.get("a", "m") == "A"
+    # 磁盘命中后回填内存层
+    assert restarted.get_stats()["memory_entries"] == 1
+    assert restarted.get_stats()["disk_hits"] == 1
+
+    clock.now += 10
+    assert LLMCache(db_path=db_path, ttl=10).get("a", "m") is None
+
+
+def test_prune_disk_drops_expired_and_oldest_entries(tmp_path, clock):
+    cache = LLMCache(db_path=str(tmp_path / "llm.db"), ttl=100, max_disk_entries=2)
+    for name in ("old", "a", "b", "c"):
+        cache.set(name, "m", name)
+        clock.now += 30
+    # 此时old已过期，其余三条中最早的a超出容量
+    cache._prune_disk(clock.now)
+    assert disk_keys(cache) == {"b", "c"}
+
+
+def test_disk_is_pruned_periodically(tmp_path):
+    cache = LLMCache(db_path=str(tmp_path / "llm.db"), ttl=0, max_disk_entries=10)
+    for i in range(100):
+        cache.set(f"p{i}", "m", str(i))
+    assert len(disk_keys(cache)) == 10
+
+
+class RecordingCache(LLMCache):
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+
+    def get(self, prompt, model):
+        self.calls.append("get")
+        return super().get(prompt, model)
+
+    def set(self, prompt, model, response):
+        self.calls.append("set")
+        super().set(prompt, model, response)
+
+
+@pytest.fixture
+def caller(app_env):
+    caller = api_caller.get_api_caller()
+    caller.llm_cache = RecordingCache()
+    caller.requests = []
+
+    def create(model, messages):
+        caller.requests.append(messages[0]["content"])
+        message = SimpleNamespace(content=f"回复{len(caller.requests)}")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+    caller.openai_client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    return caller
+
+
+def test_cached_call_is_served_from_cache(caller):
+    assert caller.call_llm_api("p") == "回复1"
+    assert caller.call_llm_api("p") == "回复1"
+    assert caller.requests == ["p"]
+
+
+def test_use_cache_false_skips_lookup_and_store(caller):
+    caller.llm_cache.set("p", caller.config.get("MODEL"), "旧回复")
+    caller.llm_cache.calls.clear()
+    assert caller.call_llm_api("p", use_cache=False) == "回复1"
+    assert caller.call_llm_api("q", use_cache=False) == "回复2"
+    assert caller.llm_cache.calls == []
+    assert caller.llm_cache.get("q", caller.config.get("MODEL")) is None
@@ -0,0 +1,44 @@
+import threading
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+from rate_limiter import RateLimiter, parse_retry_after
+
+
+def test_retry_after_accepts_seconds_and_http_date():
+    assert parse_retry_after("5") == 5.0
+    retry_at = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=30), usegmt=True)
+    assert 25 <= parse_retry_after(retry_at) <= 30
+    past = format_datetime(datetime.now(timezone.utc) - timedelta(seconds=30), usegmt=True)
+    assert parse_retry_after(past) == 0.0
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after(None) is None
+
+
+def test_unparseable_retry_after_falls_back_to_backoff():
+    limiter = RateLimiter()
+    delay = limiter.throttled("binance", "", "soon", attempt=2)
+    assert 2.0 <= delay <= 6.0
+    assert limiter.get_stats()["throttled"] == 1
+
+
+def test_retry_after_is_a_lower_bound():
+    limiter = RateLimiter()
+    delays = [limiter.throttled("binance", "", "5", attempt=3) for _ in range(200)]
+    assert all(5.0 <= delay <= 6.0 for delay in delays)
+
+
+def test_stats_are_exact_under_concurrency():
+    limiter = RateLimiter()
+    limiter.configure("etherscan", rate=1, capacity=100000)
+
+    def worker():
+        for _ in range(1000):
+            limiter.acquire("etherscan", keys=["a", "b"], timeout=0)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert limiter.get_stats()["acquired"] == 8000
@@ -0,0 +1,98 @@
+import time
+
+import api_caller
+from alarm_agent import AlarmAgent
+from auto_trade_agent import AutoTradeAgent
+from data_clean_agent import DataCleanAgent
+from registry_store import RegistryStore
+
+CONDITION = "SELECT * FROM whale_transactions WHERE value > 1000"
+
+
+class PollingOnly:
+    """只转发消息的DataCleanAgent代理(如远程代理)，警报只能周期性检查"""
+
+    def __init__(self, agent):
+        self.name = agent.name
+        self.agent = agent
+        self.is_async = False
+
+    def receive_message(self, message):
+        return self.agent.receive_message(message)
+
+
+def whale_batch(*hashes):
+    return {"type": "whale_activities",
+            "data": {"whale_transactions": [{"hash": tx_hash, "from": "0xa", "to": "0xb",
+                                              "value": "5000000000000000000000", "blockNumber": "1",
+                                              "timeStamp": "1650000000"} for tx_hash in hashes]}}
+
+
+def start_alarm(clean):
+    alarm = AlarmAgent()
+    alarm.set_agents(None, PollingOnly(clean))
+    return alarm
+
+
+def wait_until(predicate, timeout=5):
+    deadline = time.time() + timeout
+    while not predicate():
+        assert time.time() < deadline, "等待超时"
+        time.sleep(0.02)
+
+
+def test_alarm_round_trip(app_env):
+    store = RegistryStore(api_caller.get_api_caller())
+    alarm = {"condition": CONDITION, "description": "大额", "created_at": 1.0, "interval": 30.0,
+             "cooldown": 60.0, "debounce": 2, "last_triggered": 5.0, "trigger_count": 3, "hits": 1,
+             "suppressed": 4, "cursor": 42}
+    store.save_alarms([("big", alarm)])
+    assert store.load_alarms() == {"big": alarm}
+
+    store.delete_alarm("big")
+    assert store.load_alarms() == {}
+
+
+def test_restart_resumes_from_persisted_cursor(app_env):
+    clean = DataCleanAgent()
+    clean.process_data(whale_batch("0x1"))
+    alarm = start_alarm(clean)
+    alarm.set_alarm({"id": "big", "condition": CONDITION, "interval": 0.05, "cooldown": 0})
+    wait_until(lambda: alarm.monitoring_tasks["big"]["trigger_count"] == 1)
+    alarm.stop_monitoring()
+
+    # 停止期间写入的新行在重启后补查，已检查过的行不会再次触发
+    clean.process_data(whale_batch("0x2"))
+    restarted = start_alarm(clean)
+    assert restarted.resume_monitoring()["status"] == "success"
+    task = restarted.monitoring_tasks["big"]
+    assert task["interval"] == 0.05
+    wait_until(lambda: task["trigger_count"] == 2)
+    time.sleep(0.2)
+    restarted.stop_monitoring()
+    assert task["trigger_count"] == 2
+    assert RegistryStore(api_caller.get_api_caller()).load_alarms()["big"]["cursor"] == task["cursor"] > 0
+
+
+def test_removed_alarm_is_not_restored(app_env):
+    clean = DataCleanAgent()
+    alarm = start_alarm(clean)
+    alarm.set_alarm({"id": "big", "condition": CONDITION})
+    alarm.remove_alarm({"id": "big"})
+    alarm.stop_monitoring()
+
+    restarted = start_alarm(clean)
+    assert restarted.resume_monitoring() == {"status": "success", "message": "没有需要恢复的警报"}
+    assert restarted.list_alarms()["alarms"] == []
+
+
+def test_strategies_survive_restart(app_env):
+    agent = AutoTradeAgent()
+    rules = [{"condition": "price > 1", "action": "sell"}]
+    agent.add_strategy({"id": "s1", "description": "止盈", "rules": rules, "created_at": 1})
+    agent.add_strategy({"id": "s2", "description": "止损", "rules": rules, "created_at": 2})
+    agent.remove_strategy({"id": "s2"})
+
+    restarted = AutoTradeAgent()
+    restarted._ensure_loaded()
+    assert restarted.strategies == {"s1": {"description": "止盈", "rules": rules, "active": True, "created_at": 1}}
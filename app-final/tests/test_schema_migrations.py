@@ -0,0 +1,57 @@
+import pytest
+from sqlite_pool import SQLiteConnectionManager
+from schema_migrations import MIGRATIONS, apply_migrations, get_schema_version, prune_expired_rows
+
+
+@pytest.fixture
+def db(tmp_path):
+    manager = SQLiteConnectionManager(str(tmp_path / "test.db"))
+    yield manager
+    manager.close_all()
+
+
+def table_names(db):
+    with db.reader() as conn:
+        return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+
+def test_apply_migrations_creates_all_versions(db):
+    applied = apply_migrations(db)
+    assert applied == [version for version, _, _ in MIGRATIONS]
+    assert get_schema_version(db) == MIGRATIONS[-1][0]
+    assert {"whale_transactions", "ingest_cursors", "alarm_registry", "strategy_registry"} <= table_names(db)
+
+
+def test_apply_migrations_is_idempotent(db):
+    apply_migrations(db)
+    assert apply_migrations(db) == []
+
+
+def test_failed_migration_rolls_back(db):
+    migrations = [
+        (1, "ok", ["CREATE TABLE a (x INTEGER)"]),
+        (2, "broken", ["CREATE TABLE b (x INTEGER)", "NOT VALID SQL"])
+    ]
+    with pytest.raises(Exception):
+        apply_migrations(db, migrations)
+    assert get_schema_version(db) == 1
+    assert "b" not in table_names(db)
+
+
+def test_prune_expired_rows_uses_retention_cutoff(db):
+    apply_migrations(db)
+    now = 100 * 86400
+    with db.writer() as conn:
+        conn.executemany(
+            "INSERT INTO whale_transactions (tx_hash, value, timestamp) VALUES (?, ?, ?)",
+            [("old", 1, now - 3 * 86400), ("edge", 1, now - 86400 - 10), ("new", 1, now - 10)]
+        )
+    deleted = prune_expired_rows(db, 1, now=now)
+    assert deleted["whale_transactions"] == 2
+    with db.reader() as conn:
+        assert [row[0] for row in conn.execute("SELECT tx_hash FROM whale_transactions")] == ["new"]
+
+
+def test_prune_disabled_for_non_positive_retention(db):
+    apply_migrations(db)
+    assert prune_expired_rows(db, 0) == {}
@@ -0,0 +1,59 @@
+import pytest
+from specific_coin_whale_agent import SpecificCoinWhaleAgent, decode_erc20_transfer
+
+USDT = "0xdac17f958d2ee523a2206206994597c13d831ec7"
+RECIPIENT = "0xabcdef123456789012345678901234567890abcd"
+
+
+def transfer_input(amount):
+    return "0xa9059cbb" + RECIPIENT[2:].rjust(64, "0") + format(amount, "064x")
+
+
+def snapshot(*txs):
+    return {
+        "coin_info": {"top_tokens": [{"symbol": "USDT", "contract": USDT, "decimals": 6}]},
+        "whale_activity": {"whale_transactions": [], "token_transfers": list(txs)},
+    }
+
+
+def token_tx(amount, contract=USDT):
+    return {"hash": "0x01", "from": "0xsender", "to": contract, "value": "0",
+            "blockNumber": "1", "timeStamp": "2", "input": transfer_input(amount)}
+
+
+@pytest.fixture
+def agent(app_env):
+    agent = SpecificCoinWhaleAgent()
+    # 代币转账不应交给LLM识别
+    agent.call_llm = lambda *args, **kwargs: pytest.fail("unexpected LLM call")
+    return agent
+
+
+def test_decode_real_transfer_payload():
+    payload = ("0xa9059cbb000000000000000000000000abcdef123456789012345678901234567890abcd"
+               "00000000000000000000000000000000000000000000000000000000000f4240")
+    assert decode_erc20_transfer(payload) == (RECIPIENT, 1000000)
+    assert decode_erc20_transfer(payload[:-2]) is None
+    assert decode_erc20_transfer("0x") is None
+
+
+def test_large_token_transfer_is_a_whale(agent):
+    whale_txs = agent._extract_whale_data(snapshot(token_tx(2000000 * 10 ** 6)))["whale_transactions"]
+    assert whale_txs == [{"from": "0xsender", "to": RECIPIENT, "value": str(2000000 * 10 ** 18),
+                          "hash": "0x01", "blockNumber": "1", "timeStamp": "2", "detected_coin": "USDT"}]
+
+
+def test_small_or_unknown_token_transfers_are_dropped(agent):
+    info = snapshot(token_tx(10 * 10 ** 6), token_tx(2000000 * 10 ** 6, contract="0x" + "11" * 20))
+    assert agent._extract_whale_data(info)["whale_transactions"] == []
+
+
+def test_fetch_keeps_zero_value_token_transfers(app_env):
+    from info_process_agent import InfoProcessAgent
+    agent = InfoProcessAgent()
+    native = {"hash": "0x02", "value": str(5000 * 10 ** 18), "input": "0x"}
+    small = {"hash": "0x03", "value": str(10 ** 18), "input": "0x"}
+    agent._fetch_window = lambda stream, params: {"status": "1", "result": [token_tx(1), native, small]}
+    activity = agent._fetch_whale_activity()
+    assert activity["whale_transactions"] == [native]
+    assert [tx["input"] for tx in activity["token_transfers"]] == [transfer_input(1)]
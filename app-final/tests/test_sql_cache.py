@@ -0,0 +1,74 @@
+import api_caller
+import pytest
+from central_agent import CentralAgent
+from data_clean_agent import DataCleanAgent
+
+QUESTION = {"original_query": "有多少笔鲸鱼交易？", "parameters": {"sql": "SELECT COUNT(*) AS n FROM whale_transactions"}}
+
+
+def whale_batch(*hashes):
+    return {"type": "whale_activities",
+            "data": {"whale_transactions": [{"hash": tx_hash, "from": "0xa", "to": "0xb",
+                                              "value": "5000000000000000000000", "blockNumber": "1",
+                                              "timeStamp": "1650000000"} for tx_hash in hashes]}}
+
+
+@pytest.fixture
+def agents(app_env, monkeypatch):
+    monkeypatch.setattr(api_caller, "_shared_fast_router", None)
+    clean = DataCleanAgent()
+    central = CentralAgent()
+    central.register_agents({"data_clean_agent": clean})
+    explanations = []
+    central.call_llm = lambda prompt, use_cache=True: explanations.append(prompt) or "<o>解释</o>"
+    return central, clean, explanations
+
+
+def test_data_version_moves_on_commit(app_env):
+    db = api_caller.get_db_manager()
+    before = db.data_version()
+    assert db.data_version() == before
+    with db.writer() as conn:
+        conn.execute("CREATE TABLE IF NOT EXISTS t (x INTEGER)")
+        conn.execute("INSERT INTO t VALUES (1)")
+    assert db.data_version() != before
+
+
+def test_repeated_question_is_served_from_cache(agents):
+    central, clean, explanations = agents
+    clean.process_data(whale_batch("0x1"))
+
+    first = central._handle_sql_query_request(QUESTION)
+    assert first["result"] == [{"n": 1}]
+    second = central._handle_sql_query_request(dict(QUESTION, original_query="有多少笔鲸鱼交易"))
+    assert second["cached"] is True
+    assert second["result"] == [{"n": 1}]
+    assert len(explanations) == 1
+
+
+def test_insert_invalidates_result_cache(agents):
+    central, clean, explanations = agents
+    clean.process_data(whale_batch("0x1"))
+    central._handle_sql_query_request(QUESTION)
+
+    clean.process_data(whale_batch("0x2"))
+    result = central._handle_sql_query_request(QUESTION)
+    assert "cached" not in result
+    assert result["result"] == [{"n": 2}]
+    assert len(explanations) == 2
+
+
+def test_question_cache_skips_slot_resolution(agents):
+    central, clean, _ = agents
+    central._handle_sql_query_request(QUESTION)
+    central._resolve_slot = lambda *args: pytest.fail("SQL should come from the question cache")
+    clean.process_data(whale_batch("0x1"))
+    assert central._handle_sql_query_request({"original_query": "有多少笔鲸鱼交易"})["result"] == [{"n": 1}]
+
+
+def test_failed_query_is_not_cached(agents):
+    central, _, explanations = agents
+    bad = {"original_query": "坏查询", "parameters": {"sql": "SELECT * FROM missing_table"}}
+    assert central._handle_sql_query_request(bad)["status"] == "error"
+    assert central.sql_cache.get("坏查询") is None
+    assert explanations == []
@@ -0,0 +1,77 @@
+import sqlite3
+import threading
+
+import pytest
+from sqlite_pool import SQLiteConnectionManager
+
+
+def make_manager(tmp_path, max_readers=2):
+    manager = SQLiteConnectionManager(str(tmp_path / "test.db"), max_readers=max_readers)
+    with manager.writer() as conn:
+        conn.execute("CREATE TABLE t (x INTEGER)")
+        conn.execute("INSERT INTO t VALUES (1)")
+    return manager
+
+
+def test_reader_sees_committed_rows(tmp_path):
+    manager = make_manager(tmp_path)
+    with manager.reader() as conn:
+        assert conn.execute("SELECT x FROM t").fetchall() == [(1,)]
+    manager.close_all()
+
+
+def test_readers_are_reused_across_threads(tmp_path):
+    manager = make_manager(tmp_path, max_readers=2)
+
+    def query():
+        with manager.reader() as conn:
+            conn.execute("SELECT COUNT(*) FROM t").fetchone()
+
+    for _ in range(20):
+        thread = threading.Thread(target=query)
+        thread.start()
+        thread.join()
+
+    assert manager.reader_count() == 1
+    manager.close_all()
+
+
+def test_reader_pool_is_bounded(tmp_path):
+    manager = make_manager(tmp_path, max_readers=2)
+    barrier = threading.Barrier(4)
+    release = threading.Event()
+
+    def query():
+        barrier.wait()
+        with manager.reader() as conn:
+            conn.execute("SELECT x FROM t").fetchall()
+            release.wait(1)
+
+    threads = [threading.Thread(target=query) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert manager.reader_count() <= 2
+    manager.close_all()
+
+
+def test_close_all_drops_checked_out_reader(tmp_path):
+    manager = make_manager(tmp_path)
+    with manager.reader():
+        manager.close_all()
+    assert manager.reader_count() == 0
+
+
+def test_reader_wait_times_out_when_pool_is_exhausted(tmp_path):
+    manager = SQLiteConnectionManager(str(tmp_path / "test.db"), busy_timeout_ms=100, max_readers=1)
+    with manager.reader():
+        with pytest.raises(sqlite3.OperationalError, match="只读连接"):
+            with manager.reader():
+                pass
+    # 归还后可以再次借出
+    with manager.reader() as conn:
+        assert conn.execute("SELECT 1").fetchone() == (1,)
+    manager.close_all()
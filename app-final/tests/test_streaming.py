@@ -0,0 +1,90 @@
+from types import SimpleNamespace
+
+import api_caller
+import pytest
+
+
+@pytest.fixture
+def user_agent(app_env, monkeypatch):
+    monkeypatch.setattr(api_caller, "_shared_fast_router", None)
+    from user_agent import UserAgent
+    return UserAgent()
+
+
+def fake_stream(chunks):
+    def call_llm_stream(prompt):
+        yield from chunks
+    return call_llm_stream
+
+
+@pytest.mark.parametrize("chunks", [
+    ["<o>你好，世界</o>"],
+    ["前言<", "o>你好", "，世界<", "/o", ">尾部"],
+    ["<o", ">你", "好，世", "界</", "o>"],
+])
+def test_stream_output_handles_split_tags(user_agent, chunks):
+    assert "".join(user_agent.stream_output(iter(chunks))) == "你好，世界"
+
+
+def test_stream_output_without_end_tag_flushes_text(user_agent):
+    assert "".join(user_agent.stream_output(iter(["<o>部分", "回复"]))) == "部分回复"
+
+
+def test_stream_output_keeps_angle_brackets_in_text(user_agent):
+    assert "".join(user_agent.stream_output(iter(["<o>1 <", " 2</o>"]))) == "1 < 2"
+
+
+def test_format_response_streams_chunks(user_agent):
+    user_agent.call_llm_stream = fake_stream(["<o>ETH", "价格", "上涨</", "o>"])
+    user_agent.call_llm = lambda *args, **kwargs: pytest.fail("unexpected non-streaming call")
+    chunks = []
+    result = user_agent._format_response({"price": 1}, "ETH价格", on_chunk=chunks.append)
+    assert result["status"] == "success"
+    assert "".join(chunks) == "ETH价格上涨"
+    assert result["formatted_response"] == "ETH价格上涨"
+
+
+def test_format_response_without_callback_does_not_stream(user_agent):
+    user_agent.call_llm_stream = lambda prompt: pytest.fail("unexpected streaming call")
+    user_agent.call_llm = lambda *args, **kwargs: "<o>完成</o>"
+    assert user_agent._format_response({}, "q")["formatted_response"] == "完成"
+
+
+def test_process_user_request_reports_stages(user_agent):
+    user_agent._parse_user_query = lambda query: {"request_type": "price_query"}
+    user_agent.central_agent = object()
+    user_agent.send_message = lambda target, message: {"status": "success", "data": {}}
+    user_agent._format_response = lambda result, query, on_chunk=None: {"status": "success"}
+    stages = []
+    user_agent.process_user_request("ETH价格", on_progress=lambda stage, detail=None: stages.append(stage))
+    assert stages == ["parsed", "routed", "agent_result", "formatting"]
+
+
+def test_cancelled_request_is_not_routed(user_agent):
+    from job_engine import JobCancelled
+
+    def cancelled(stage, detail=None):
+        raise JobCancelled("job-1")
+
+    user_agent._parse_user_query = lambda query: {"request_type": "trade"}
+    user_agent.central_agent = object()
+    user_agent.send_message = lambda target, message: pytest.fail("cancelled request must not reach central agent")
+    with pytest.raises(JobCancelled):
+        user_agent.process_user_request("买入ETH", on_progress=cancelled)
+
+
+def test_api_caller_streams_deltas_and_reports_errors(app_env):
+    def delta(text):
+        return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+
+    caller = api_caller.get_api_caller()
+    create = lambda **kwargs: iter([delta("<o>a"), SimpleNamespace(choices=[]), delta(None), delta("b</o>")])
+    caller.openai_client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    assert list(caller.call_llm_stream("p")) == ["<o>a", "b</o>"]
+
+    def fail(**kwargs):
+        raise RuntimeError("down")
+
+    caller.openai_client.chat.completions.create = fail
+    chunks = list(caller.call_llm_stream("p"))
+    assert len(chunks) == 1 and "down" in chunks[0]
@@ -0,0 +1,139 @@
+import threading
+import time
+import uuid
+
+import pytest
+import transport
+from transport import InProcessTransport, RemoteAgent, ZmqTransport, run_broker, serve_agent
+
+
+class EchoAgent:
+    is_async = False
+
+    def __init__(self, name, peer=None):
+        self.name = name
+        self.config = {}
+        self.peer = peer
+
+    def receive_message(self, message):
+        if message["type"] == "fail":
+            raise ValueError("boom")
+        if message["type"] == "slow":
+            time.sleep(message["content"])
+        if message["type"] == "ask_peer" and message["content"] > 0:
+            # 处理过程中回调另一个远程代理
+            return self.peer.receive_message({"type": "ask_peer", "content": message["content"] - 1})
+        return {"status": "success", "agent": self.name, "content": message["content"]}
+
+
+class FakeTransport:
+    def __init__(self):
+        self.requests = []
+
+    def request(self, service, message):
+        self.requests.append((service, message))
+        return {"status": "success", "service": service}
+
+
+def test_in_process_transport_calls_agent_directly():
+    result = InProcessTransport().send(EchoAgent("A"), {"type": "echo", "content": 1})
+    assert result == {"status": "success", "agent": "A", "content": 1}
+
+
+def test_in_process_transport_propagates_errors():
+    with pytest.raises(ValueError):
+        InProcessTransport().send(EchoAgent("A"), {"type": "fail", "content": None})
+
+
+def test_remote_agent_routes_through_transport():
+    fake = FakeTransport()
+    remote = RemoteAgent("DataCleanAgent", fake)
+    assert InProcessTransport().send(remote, {"type": "sql_query"}) == {"status": "success", "service": "DataCleanAgent"}
+    assert fake.requests == [("DataCleanAgent", {"type": "sql_query"})]
+
+
+@pytest.fixture
+def broker(monkeypatch):
+    pytest.importorskip("zmq")
+    monkeypatch.setattr(transport, "_transport", InProcessTransport())
+    suffix = uuid.uuid4().hex
+    frontend, backend = f"inproc://front-{suffix}", f"inproc://back-{suffix}"
+    threading.Thread(target=run_broker, args=(frontend, backend), daemon=True).start()
+    stop = threading.Event()
+
+    def serve(agent, **kwargs):
+        threading.Thread(target=serve_agent, args=(agent, backend), kwargs=dict(kwargs, stop_event=stop),
+                         daemon=True).start()
+
+    yield frontend, serve
+    stop.set()
+
+
+def test_remote_round_trip(broker):
+    frontend, serve = broker
+    serve(EchoAgent("A"))
+    remote = RemoteAgent("A", ZmqTransport(frontend, timeout=5))
+    assert remote.receive_message({"type": "echo", "content": "hi"}) == {"status": "success", "agent": "A", "content": "hi"}
+
+
+def test_remote_errors_are_returned(broker):
+    frontend, serve = broker
+    serve(EchoAgent("A"))
+    result = RemoteAgent("A", ZmqTransport(frontend, timeout=5)).receive_message({"type": "fail", "content": None})
+    assert result["status"] == "error"
+    assert "boom" in result["message"]
+
+
+def test_slow_handler_gets_reply_timeout(broker):
+    frontend, serve = broker
+    serve(EchoAgent("A"), reply_timeout=0.2)
+    remote = RemoteAgent("A", ZmqTransport(frontend, timeout=5))
+    started = time.time()
+    result = remote.receive_message({"type": "slow", "content": 1.0})
+    assert result["status"] == "error"
+    assert time.time() - started < 1.0
+    # 超时的请求不影响后续请求
+    assert remote.receive_message({"type": "echo", "content": 2})["content"] == 2
+
+
+def test_client_timeout_without_worker(broker):
+    frontend, _ = broker
+    result = RemoteAgent("Missing", ZmqTransport(frontend, timeout=0.2)).receive_message({"type": "echo", "content": 1})
+    assert result["status"] == "error"
+
+
+def test_callback_into_remote_agent_does_not_deadlock(broker):
+    frontend, serve = broker
+    zmq_transport = ZmqTransport(frontend, timeout=5)
+    serve(EchoAgent("A", peer=RemoteAgent("B", zmq_transport)))
+    serve(EchoAgent("B", peer=RemoteAgent("A", zmq_transport)))
+    # A -> B -> A: A在处理第一条消息时仍能处理回调
+    result = RemoteAgent("A", zmq_transport).receive_message({"type": "ask_peer", "content": 2})
+    assert result == {"status": "success", "agent": "A", "content": 0}
+
+
+def test_concurrent_requests_are_handled_in_parallel(broker):
+    frontend, serve = broker
+    serve(EchoAgent("A"), max_workers=4)
+    results = []
+
+    def call():
+        results.append(RemoteAgent("A", ZmqTransport(frontend, timeout=5)).receive_message({"type": "slow", "content": 0.3}))
+
+    threads = [threading.Thread(target=call) for _ in range(4)]
+    started = time.time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(results) == 4 and all(result["status"] == "success" for result in results)
+    assert time.time() - started < 1.0
+
+
+def test_worker_builds_only_served_agent(app_env, monkeypatch):
+    pytest.importorskip("zmq")
+    import main
+    monkeypatch.setattr(transport, "_transport", ZmqTransport("inproc://unused", timeout=0.1))
+    agents = main.initialize_agents(serve_key="data_clean_agent")
+    local = [key for key, agent in agents.items() if not isinstance(agent, RemoteAgent)]
+    assert local == ["data_clean_agent"]
@@ -0,0 +1,272 @@
+import json
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import zmq
+except ImportError:
+    zmq = None
+
+READY = b"READY"
+REPLY = b"REPLY"
+
+def _encode(message):
+    """序列化消息，不可序列化的字段转为字符串"""
+    return json.dumps(message, ensure_ascii=False, default=str).encode("utf-8")
+
+def _decode(payload):
+    return json.loads(payload.decode("utf-8"))
+
+class InProcessTransport:
+    """进程内传输：直接调用目标代理(默认)"""
+
+    def send(self, target_agent, message):
+        """
+        把消息交给目标代理并返回处理结果
+
+        参数:
+        target_agent: 目标代理或RemoteAgent代理对象
+        message (dict): MCP消息
+        """
+        if isinstance(target_agent, RemoteAgent):
+            return target_agent.receive_message(message)
+        # 异步代理：投递到其邮箱并在异步运行时中等待结果
+        if getattr(target_agent, "is_async", False):
+            return target_agent.receive_message_sync(message)
+        return target_agent.receive_message(message)
+
+class ZmqTransport(InProcessTransport):
+    """
+    基于ZeroMQ代理(broker)的传输：本进程的代理仍直接调用，
+    RemoteAgent代表的代理通过broker转发给运行在其他进程中的worker
+    """
+
+    def __init__(self, frontend, timeout=120.0):
+        """
+        参数:
+        frontend (str): broker前端地址，如 tcp://127.0.0.1:5555
+        timeout (float): 远程调用超时(秒)
+        """
+        if zmq is None:
+            raise ImportError("使用ZeroMQ传输需要安装pyzmq")
+        self.frontend = frontend
+        self.timeout = timeout
+        self.context = zmq.Context.instance()
+        self._local = threading.local()
+
+    def _socket(self):
+        """每个线程一个REQ套接字"""
+        sock = getattr(self._local, "socket", None)
+        if sock is None:
+            sock = self.context.socket(zmq.REQ)
+            sock.setsockopt(zmq.LINGER, 0)
+            sock.connect(self.frontend)
+            self._local.socket = sock
+        return sock
+
+    def request(self, service, message):
+        """
+        通过broker调用远程代理
+
+        参数:
+        service (str): 代理名称
+        message (dict): MCP消息
+        """
+        sock = self._socket()
+        sock.send_multipart([service.encode("utf-8"), _encode(message)])
+        if sock.poll(int(self.timeout * 1000)) == 0:
+            # REQ套接字超时后状态不可用，丢弃后下次重建
+            sock.close()
+            self._local.socket = None
+            return {"status": "error", "message": f"远程代理 {service} 响应超时"}
+        return _decode(sock.recv_multipart()[-1])
+
+class RemoteAgent:
+    """运行在其他进程中的代理的本地代理对象，只支持消息通信"""
+
+    is_async = False
+
+    def __init__(self, name, transport):
+        """
+        参数:
+        name (str): 远程代理名称(与其BaseAgent.name一致)
+        transport (ZmqTransport): 传输
+        """
+        self.name = name
+        self.transport = transport
+
+    def receive_message(self, message):
+        return self.transport.request(self.name, message)
+
+def run_broker(frontend_bind, backend_bind):
+    """
+    运行broker：客户端(REQ)连接前端，worker(DEALER)连接后端并按代理名称注册，
+    请求按代理名称排队，分发给空闲的worker
+
+    参数:
+    frontend_bind (str): 前端绑定地址，如 tcp://*:5555
+    backend_bind (str): 后端绑定地址，如 tcp://*:5556
+    """
+    if zmq is None:
+        raise ImportError("运行broker需要安装pyzmq")
+    context = zmq.Context.instance()
+    frontend = context.socket(zmq.ROUTER)
+    frontend.bind(frontend_bind)
+    backend = context.socket(zmq.ROUTER)
+    backend.bind(backend_bind)
+
+    idle_workers = {}  # 代理名称 -> deque(worker身份)
+    pending = {}  # 代理名称 -> deque((客户端身份, 消息))
+    worker_service = {}  # worker身份 -> 代理名称
+
+    poller = zmq.Poller()
+    poller.register(frontend, zmq.POLLIN)
+    poller.register(backend, zmq.POLLIN)
+    print(f"✅ Agent broker已启动: frontend={frontend_bind}, backend={backend_bind}")
+
+    def dispatch(service):
+        workers = idle_workers.get(service)
+        queue = pending.get(service)
+        while workers and queue:
+            client, payload = queue.popleft()
+            backend.send_multipart([workers.popleft(), b"", client, b"", payload])
+
+    while True:
+        events = dict(poller.poll())
+        if backend in events:
+            frames = backend.recv_multipart()
+            worker, command = frames[0], frames[2]
+            if command == READY:
+                service = frames[3].decode("utf-8")
+                worker_service[worker] = service
+            elif command == REPLY:
+                client, payload = frames[3], frames[5]
+                frontend.send_multipart([client, b"", payload])
+                service = worker_service.get(worker)
+            else:
+                continue
+            if service is not None:
+                idle_workers.setdefault(service, deque()).append(worker)
+                dispatch(service)
+
+        if frontend in events:
+            client, _, service, payload = frontend.recv_multipart()
+            service = service.decode("utf-8")
+            pending.setdefault(service, deque()).append((client, payload))
+            dispatch(service)
+
+def serve_agent(agent, backend_connect, max_workers=4, reply_timeout=120.0, stop_event=None):
+    """
+    在当前进程中把代理注册到broker并处理远程消息(阻塞)
+
+    消息在有界线程池中处理，处理过程中回调其他远程代理或等待LLM不会阻塞后续消息；
+    worker向broker登记max_workers份处理能力，超过reply_timeout仍未完成的请求先回复超时错误
+
+    参数:
+    agent: 本地代理实例
+    backend_connect (str): broker后端地址，如 tcp://127.0.0.1:5556
+    max_workers (int): 同时处理的消息数
+    reply_timeout (float): 单条消息的回复超时(秒)
+    stop_event (threading.Event, 可选): 设置后停止服务
+    """
+    if zmq is None:
+        raise ImportError("运行worker需要安装pyzmq")
+    context = zmq.Context.instance()
+    sock = context.socket(zmq.DEALER)
+    sock.setsockopt(zmq.LINGER, 0)
+    sock.setsockopt(zmq.IDENTITY, f"{agent.name}-{uuid.uuid4().hex[:8]}".encode("utf-8"))
+    sock.connect(backend_connect)
+    # 每次READY在broker中登记一份处理能力，每次REPLY归还一份
+    for _ in range(max_workers):
+        sock.send_multipart([b"", READY, agent.name.encode("utf-8")])
+    print(f"✅ 代理 {agent.name} 已注册到broker: {backend_connect}")
+
+    transport = get_transport()
+    debug = agent.config.get("DEBUG_MODE") == "True"
+
+    def handle(message):
+        started = time.time()
+        try:
+            result = transport.send(agent, message)
+        except Exception as e:
+            result = {"status": "error", "message": f"远程代理处理消息失败: {str(e)}"}
+        if debug:
+            print(f"🔄 [{agent.name}] 处理远程消息耗时 {time.time() - started:.2f}s")
+        return result
+
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"serve-{agent.name}")
+    in_flight = {}  # future -> (客户端身份, 截止时间)
+    try:
+        while stop_event is None or not stop_event.is_set():
+            if sock.poll(50):
+                _, client, _, payload = sock.recv_multipart()
+                try:
+                    future = executor.submit(handle, _decode(payload))
+                except Exception as e:
+                    sock.send_multipart([b"", REPLY, client, b"", _encode(
+                        {"status": "error", "message": f"远程代理处理消息失败: {str(e)}"})])
+                    continue
+                in_flight[future] = (client, time.time() + reply_timeout)
+
+            # 套接字只在本线程使用，回复由本线程发送
+            now = time.time()
+            for future, (client, deadline) in list(in_flight.items()):
+                if future.done():
+                    result = future.result()
+                elif now >= deadline:
+                    # 处理线程无法中断，结果丢弃
+                    result = {"status": "error", "message": f"远程代理 {agent.name} 处理超时"}
+                else:
+                    continue
+                del in_flight[future]
+                sock.send_multipart([b"", REPLY, client, b"", _encode(result)])
+    finally:
+        executor.shutdown(wait=False)
+        sock.close()
+
+def serve_agents_in_background(agents, backend_connect, **kwargs):
+    """
+    在后台线程中把多个本地代理注册到broker，使其他worker进程可以通过RemoteAgent调用它们
+
+    参数:
+    agents (list): 本地代理实例
+    backend_connect (str): broker后端地址
+    kwargs: 传给serve_agent的参数
+    """
+    threads = []
+    for agent in agents:
+        thread = threading.Thread(target=serve_agent, args=(agent, backend_connect), kwargs=kwargs,
+                                  name=f"serve-{agent.name}", daemon=True)
+        thread.start()
+        threads.append(thread)
+    return threads
+
+_transport = None
+_transport_lock = threading.Lock()
+
+def get_transport():
+    """根据AGENT_TRANSPORT配置获取进程级共享的传输"""
+    global _transport
+    with _transport_lock:
+        if _transport is None:
+            from api_caller import load_config
+            config = load_config()
+            if config.get("AGENT_TRANSPORT", "inprocess") == "zmq":
+                _transport = ZmqTransport(
+                    config.get("AGENT_BROKER_FRONTEND", "tcp://127.0.0.1:5555"),
+                    timeout=float(config.get("AGENT_RPC_TIMEOUT", "120"))
+                )
+            else:
+                _transport = InProcessTransport()
+        return _transport
+
+def get_remote_agent_keys():
+    """REMOTE_AGENTS配置中列出的、由独立worker进程运行的代理键名"""
+    from api_caller import load_config
+    config = load_config()
+    if config.get("AGENT_TRANSPORT", "inprocess") != "zmq":
+        return set()
+    return {key.strip() for key in config.get("REMOTE_AGENTS", "").split(",") if key.strip()}
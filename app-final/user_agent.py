@@ -1,4 +1,7 @@
 from base_agent import BaseAgent
+from api_caller import get_fast_router
+from intent_schema import build_extraction_prompt, build_followup_prompt, validate_slots, fill_slot
+from job_engine import JobCancelled
 import json
 import traceback
 
@@ -6,6 +9,7 @@ class UserAgent(BaseAgent):
     def __init__(self):
         super().__init__(name="UserAgent")
         self.central_agent = None
+        self.fast_router = get_fast_router()
     
     def set_central_agent(self, agent):
         """设置Central Agent"""
@@ -17,24 +21,41 @@ class UserAgent(BaseAgent):
             return self.process_system_response(message["content"])
         return {"status": "error", "message": "未支持的消息类型"}
     
-    def process_user_request(self, user_query):
-        """处理用户请求"""
+    def process_user_request(self, user_query, on_chunk=None, on_progress=None):
+        """
+        处理用户请求
+
+        参数:
+        user_query (str): 用户的自然语言请求
+        on_chunk (callable, 可选): 流式输出回调，每生成一段回复文本调用一次
+        on_progress (callable, 可选): on_progress(stage, detail)，在解析完成(parsed)、
+            转发中央代理前(routed)、收到代理结果(agent_result)和开始格式化(formatting)时调用；
+            可抛出JobCancelled中止处理
+        """
+        report = on_progress or (lambda stage, detail=None: None)
         # 使用LLM解析用户自然语言请求
         try:
             structured_request = self._parse_user_query(user_query)
             
             if not structured_request:
                 return {"status": "error", "message": "无法解析用户请求"}
+            report("parsed", {"request_type": structured_request.get("request_type")})
             
             # 如果有中央代理，将请求转发给它
             if self.central_agent:
+                # 中央代理可能执行交易等操作，调用方在此之后不应再取消
+                report("routed", {"request_type": structured_request.get("request_type")})
                 message = self.create_mcp_message("user_request", structured_request)
                 result = self.send_message(self.central_agent, message)
+                report("agent_result", {"status": result.get("status") if isinstance(result, dict) else None})
                 
                 # 处理结果
-                return self._format_response(result, user_query)
+                report("formatting")
+                return self._format_response(result, user_query, on_chunk=on_chunk)
             
             return {"status": "error", "message": "未连接到中央代理"}
+        except JobCancelled:
+            raise
         except Exception as e:
             error_detail = traceback.format_exc()
             print(f"处理用户请求时发生错误: {str(e)}\n{error_detail}")
@@ -56,32 +77,21 @@ class UserAgent(BaseAgent):
         return {"status": "error", "message": "未支持的任务类型"}
     
     def _parse_user_query(self, user_query):
-        """解析用户查询为结构化请求"""
-        # 使用LLM理解用户意图
-        understanding_prompt = f"""
-        请分析以下用户请求，理解用户的意图，并将其转换为系统可以理解的结构化格式。
-        你只需要识别请求类型和提取参数，不需要判断请求是否可以执行。
-        
-        用户请求:
-        {user_query}
-        
-        请识别以下信息:
-        1. 请求类型: 用户想要执行什么操作? (例如:market_analysis, coin_info, whale_analysis, contract_analysis, transaction_analysis, set_alarm, trade_operation, sql_query等)
-        2. 关键参数: 请求中包含的重要参数(如币种、地址、数量、金额等)
-        
-        即使请求可能无法执行(如购买比特币)，也要正确分类为trade_operation，不要自行判断是否可行。
+        """解析用户查询为结构化请求(规则路由足够确定时不调用LLM，否则一次LLM调用完成意图识别和参数提取)"""
+        route = self.fast_router.route(user_query)
+        if self.fast_router.is_confident(route):
+            self.log_action("快速路由命中", f"{route['request_type']} (置信度 {route['confidence']})")
+            structured_request = {
+                "request_type": route["request_type"],
+                "parameters": route["parameters"],
+                "additional_info": "",
+                "routed_by": "fast_router",
+                "confidence": route["confidence"]
+            }
+            return self._complete_slots(structured_request, user_query)
         
-        请以JSON格式返回，格式为<o>
-        {{
-            "request_type": "操作类型",
-            "parameters": {{
-                "参数1": "值1",
-                "参数2": "值2"
-            }},
-            "additional_info": "附加信息"
-        }}
-        </o>
-        """
+        understanding_prompt = build_extraction_prompt(user_query)
+        structured_json = ""
         
         try:
             result = self.call_llm(understanding_prompt)
@@ -89,10 +99,8 @@ class UserAgent(BaseAgent):
             
             # 尝试解析JSON
             structured_request = json.loads(structured_json)
-            
-            # 添加原始查询
-            structured_request["original_query"] = user_query
-            return structured_request
+            if not isinstance(structured_request, dict):
+                raise json.JSONDecodeError("顶层不是JSON对象", structured_json, 0)
         except json.JSONDecodeError as e:
             print(f"JSON解析错误: {e}, 原始返回: {structured_json}")
             # 如果JSON解析失败，则返回简单结构
@@ -114,9 +122,32 @@ class UserAgent(BaseAgent):
                 "additional_info": "",
                 "original_query": user_query
             }
+        
+        return self._complete_slots(structured_request, user_query)
+    
+    def _complete_slots(self, structured_request, user_query):
+        """校验参数，缺失的必填参数先用规则提取，仍缺失时才单独询问LLM"""
+        request_type = str(structured_request.get("request_type", "unknown")).strip()
+        parameters, missing = validate_slots(request_type, structured_request.get("parameters"))
+        
+        for slot_name in missing:
+            value = fill_slot(request_type, slot_name, self.fast_router.extract_slot(request_type, slot_name, user_query))
+            if value is None:
+                followup = self.call_llm(build_followup_prompt(request_type, slot_name, user_query))
+                value = fill_slot(request_type, slot_name, self.extract_output(followup))
+            if value is not None:
+                parameters[slot_name] = value
+            else:
+                self.log_action("无法补全参数", slot_name)
+        
+        structured_request["request_type"] = request_type
+        structured_request["parameters"] = parameters
+        # 添加原始查询
+        structured_request["original_query"] = user_query
+        return structured_request
     
-    def _format_response(self, result, original_query):
-        """格式化响应"""
+    def _format_response(self, result, original_query, on_chunk=None):
+        """格式化响应，提供on_chunk时以流式方式生成并实时回调<o>标签内的文本"""
         try:
             # 使用LLM生成自然语言响应
             format_prompt = f"""
@@ -128,7 +159,19 @@ class UserAgent(BaseAgent):
             请生成一个友好、信息丰富的回复，格式为<o>回复内容</o>
             """
             
-            llm_response = self.call_llm(format_prompt)
+            if on_chunk is None:
+                llm_response = self.call_llm(format_prompt, use_cache=False)
+            else:
+                parts = []
+                
+                def collect():
+                    for chunk in self.call_llm_stream(format_prompt):
+                        parts.append(chunk)
+                        yield chunk
+                
+                for text in self.stream_output(collect()):
+                    on_chunk(text)
+                llm_response = "".join(parts)
             formatted_response = self.extract_output(llm_response)
             
             return {